@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from . import authentication  # noqa: F401  (connects the auth state invalidation)
+        from .search import install_search_index
+        post_migrate.connect(install_search_index, sender=self)
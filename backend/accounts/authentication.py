@@ -0,0 +1,123 @@
+"""
+Stateless JWT authentication.
+
+Tokens issued by ``issue_tokens`` carry the user fields most requests
+need (``CLAIM_FIELDS``) plus ``ver``, the user's ``token_version``.
+``ClaimsJWTAuthentication`` builds ``request.user`` from those claims with
+``User.from_db``; every other field is deferred and loaded on first access,
+so endpoints that only need the id and name never query the user table.
+
+Each request still checks the token against a small per-user state (token
+version, active flag and a digest of the claimed fields) kept in the
+cache and rebuilt with one query on a miss; user saves drop it. Bumping
+``token_version`` (``revoke_tokens``) rejects every older token. Tokens
+whose claims went stale after a profile edit fall back to loading the row.
+Decoded tokens are memoised in a per-process LRU so repeat requests skip
+signature verification.
+
+Board roles are not put in the token: they change far more often than a
+3-day access token lives, and kanban.access already caches them per user.
+"""
+import hashlib
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+CLAIM_FIELDS = ('username', 'first_name', 'last_name', 'avatar')
+VERSION_CLAIM = 'ver'
+TOKEN_CACHE_SIZE = 1024
+STATE_TIMEOUT = 300
+
+User = get_user_model()
+
+
+def _state_key(user_id):
+    return f'accounts:auth:{user_id}'
+
+
+def claims_digest(values):
+    return hashlib.md5('\x1f'.join(str(value or '') for value in values).encode()).hexdigest()
+
+
+def issue_tokens(user):
+    """A refresh token whose access tokens carry the stateless-auth claims."""
+    refresh = RefreshToken.for_user(user)
+    for name in CLAIM_FIELDS:
+        value = getattr(user, name)
+        refresh[name] = getattr(value, 'name', value) or ''
+    refresh[VERSION_CLAIM] = user.token_version
+    return refresh
+
+
+def revoke_tokens(user):
+    """Invalidate every token issued to ``user`` so far."""
+    User.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    cache.delete(_state_key(user.pk))
+
+
+def auth_state(user_id):
+    """(token_version, is_active, claims digest) for ``user_id``, or None."""
+    key = _state_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        row = User.objects.filter(pk=user_id).values_list('token_version', 'is_active', *CLAIM_FIELDS).first()
+        if row is None:
+            return None
+        state = (row[0], row[1], claims_digest(row[2:]))
+        cache.set(key, state, STATE_TIMEOUT)
+    return state
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _decode(raw_token):
+    return JWTAuthentication().get_validated_token(raw_token)
+
+
+def user_from_claims(token):
+    # Only claimed fields are loaded, so saving this user never writes back others
+    values = {'id': token[api_settings.USER_ID_CLAIM]}
+    values.update((name, token[name]) for name in CLAIM_FIELDS)
+    fields = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    return User.from_db(router.db_for_read(User), fields, [values[name] for name in fields])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        token = _decode(raw_token)
+        try:
+            token.check_exp(current_time=aware_utcnow())
+        except TokenError as exc:
+            raise InvalidToken({'detail': exc.args[0]})
+        return token
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token or api_settings.USER_ID_CLAIM not in validated_token:
+            # Issued before claims were added: load the user as usual
+            return super().get_user(validated_token)
+        state = auth_state(validated_token[api_settings.USER_ID_CLAIM])
+        if state is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        version, is_active, digest = state
+        if not is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if validated_token[VERSION_CLAIM] != version:
+            raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+        if claims_digest(validated_token.get(name) for name in CLAIM_FIELDS) != digest:
+            return super().get_user(validated_token)
+        return user_from_claims(validated_token)
+
+
+@receiver(post_save, sender=User)
+def forget_auth_state(sender, instance, **kwargs):
+    cache.delete(_state_key(instance.pk))
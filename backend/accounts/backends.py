@@ -0,0 +1,32 @@
+"""
+Log in by email with a single query.
+
+``EmailBackend`` looks the user up through the ``UPPER(email)`` index and
+checks the password on the row it fetched, instead of resolving the email
+to a username and letting ``ModelBackend`` load the user again.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models.functions import Upper
+
+# Emails aren't unique; at most this many accounts sharing one are tried
+MAX_EMAIL_MATCHES = 5
+
+
+def users_by_email(email):
+    return get_user_model().objects.alias(email_upper=Upper('email')).filter(email_upper=email.upper())
+
+
+class EmailBackend(ModelBackend):
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if not email or password is None:
+            return None
+        candidates = list(users_by_email(email).order_by('pk')[:MAX_EMAIL_MATCHES])
+        if not candidates:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            get_user_model()().set_password(password)
+            return None
+        for user in candidates:
+            if user.check_password(password) and self.user_can_authenticate(user):
+                return user
+        return None
@@ -0,0 +1,16 @@
+"""
+Password hashers with a configurable work factor.
+
+The default PBKDF2 iteration count costs tens of milliseconds per signup
+and login; load-test and CI environments can lower it with
+``PASSWORD_HASH_ITERATIONS``. Hashes keep the ``pbkdf2_sha256`` prefix, so
+switching the setting back makes Django rehash passwords on the next login.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', None) or hashers.PBKDF2PasswordHasher.iterations
@@ -0,0 +1,67 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts.search import search_users
+
+FIRST_NAMES = [
+    'james', 'mary', 'robert', 'patricia', 'john', 'jennifer', 'michael', 'linda', 'david', 'elizabeth',
+    'william', 'barbara', 'richard', 'susan', 'joseph', 'jessica', 'thomas', 'sarah', 'charles', 'karen',
+    'amir', 'chen', 'fatima', 'hiroshi', 'ines', 'kwame', 'lucia', 'mateo', 'noor', 'olga', 'priya', 'sven',
+]
+LAST_NAMES = [
+    'smith', 'johnson', 'williams', 'brown', 'jones', 'garcia', 'miller', 'davis', 'rodriguez', 'martinez',
+    'hernandez', 'lopez', 'gonzalez', 'wilson', 'anderson', 'thomas', 'taylor', 'moore', 'jackson', 'martin',
+    'nakamura', 'okafor', 'petrov', 'rossi', 'schmidt', 'silva', 'tanaka', 'wang', 'yilmaz', 'zhang',
+]
+
+
+class Command(BaseCommand):
+    help = "Seed benchmark users (if needed) and time user search queries against the search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help='Make sure at least this many users exist.')
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        rng = random.Random(42)
+        existing = User.objects.count()
+        missing = max(options['users'] - existing, 0)
+        if missing:
+            self.stdout.write(f'Seeding {missing} users...')
+        for start in range(existing, existing + missing, options['batch_size']):
+            stop = min(start + options['batch_size'], existing + missing)
+            users = []
+            for n in range(start, stop):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                users.append(User(
+                    username=f'bench{n}', first_name=first.title(), last_name=last.title(),
+                    email=f'{first}.{last}{n}@example.com', password='!',
+                ))
+            User.objects.bulk_create(users)
+
+        queries = []
+        for _ in range(options['queries']):
+            name = rng.choice(FIRST_NAMES + LAST_NAMES)
+            queries.append(name[:rng.randint(1, len(name))])
+            if rng.random() < 0.3:
+                queries[-1] = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)[:3]}'
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            search_users(query, exclude_user_id=0)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p50 = statistics.median(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'{User.objects.count()} users, {len(timings)} queries: '
+            f'p50 {p50:.1f} ms, p95 {p95:.1f} ms, max {timings[-1]:.1f} ms'
+        )
+        if p95 > 50:
+            self.stdout.write(self.style.WARNING('p95 is above the 50 ms target.'))
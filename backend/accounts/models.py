@@ -1,5 +1,14 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Upper
 
 class CustomUser(AbstractUser):
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    # Carried in access tokens; bumping it revokes every token issued before
+    token_version = models.PositiveIntegerField(default=0)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Case-insensitive login lookup (see accounts.backends.EmailBackend)
+            models.Index(Upper('email'), name='accounts_user_email_upper_idx'),
+        ]
@@ -0,0 +1,148 @@
+"""
+Indexed user search for the board member picker.
+
+PostgreSQL gets pg_trgm GIN indexes on UPPER(first_name / last_name /
+email), which serve the ``icontains`` lookups Django emits, plus
+``text_pattern_ops`` btree indexes for short prefix terms. SQLite gets an
+FTS5 table kept in sync with the user table by triggers and queried with
+prefix terms. Both are vendor specific, so they are created from
+``post_migrate`` rather than declared on the model.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Q
+
+FTS_TABLE = 'accounts_user_fts'
+SEARCH_FIELDS = ('first_name', 'last_name', 'email')
+# Columns the member picker renders
+RESULT_FIELDS = ('id', 'first_name', 'last_name', 'email', 'avatar')
+MAX_TERMS = 4
+# pg_trgm needs three characters to use the GIN index; shorter terms match prefixes only
+MIN_TRIGRAM_LENGTH = 3
+# Matches are fetched unordered (so the LIMIT stops the index scan early)
+# and this many candidates per result are ranked in Python
+CANDIDATES_PER_RESULT = 10
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    return TERM_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def _postgres_statements(table, quote):
+    yield 'CREATE EXTENSION IF NOT EXISTS pg_trgm'
+    for field in SEARCH_FIELDS:
+        column = quote(field)
+        yield (
+            f'CREATE INDEX IF NOT EXISTS {table}_{field}_trgm '
+            f'ON {quote(table)} USING gin (UPPER({column}) gin_trgm_ops)'
+        )
+        yield (
+            f'CREATE INDEX IF NOT EXISTS {table}_{field}_prefix '
+            f'ON {quote(table)} (UPPER({column}) text_pattern_ops)'
+        )
+
+
+def _sqlite_statements(table):
+    columns = ', '.join(SEARCH_FIELDS)
+    new_values = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+    old_values = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+    yield (
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({columns}, "
+        f"content='{table}', content_rowid='id', prefix='1 2 3')"
+    )
+    yield (
+        f'CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END'
+    )
+    yield (
+        f'CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN '
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+    )
+    yield (
+        f'CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {columns} ON {table} BEGIN '
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f'INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END'
+    )
+    yield f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+
+def install_search_index(using='default', **kwargs):
+    connection = connections[using]
+    table = get_user_model()._meta.db_table
+    with connection.cursor() as cursor:
+        if table not in connection.introspection.table_names(cursor):
+            return
+        if connection.vendor == 'postgresql':
+            for statement in _postgres_statements(table, connection.ops.quote_name):
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            if cursor.fetchone() is None:
+                for statement in _sqlite_statements(table):
+                    cursor.execute(statement)
+
+
+def _sqlite_search(terms, exclude_user_id, board_id, limit):
+    from kanban.models import BoardMembership
+
+    User = get_user_model()
+    match = ' '.join(f'"{term}"*' for term in terms)
+    sql = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid != %s'
+    params = [match, exclude_user_id]
+    if board_id:
+        sql += f' AND rowid NOT IN (SELECT user_id FROM {BoardMembership._meta.db_table} WHERE board_id = %s)'
+        params.append(board_id)
+    sql += ' LIMIT %s'
+    params.append(limit)
+    with connections[User.objects.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        ids = [row[0] for row in cursor.fetchall()]
+    return list(User.objects.filter(pk__in=ids).only(*RESULT_FIELDS))
+
+
+def _term_filter(term):
+    lookup = 'icontains' if len(term) >= MIN_TRIGRAM_LENGTH else 'istartswith'
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f'{field}__{lookup}': term})
+    return condition
+
+
+def _rank(user, terms):
+    # Names starting with the first term come first, then other name matches, then email-only matches
+    first, last = user.first_name.lower(), user.last_name.lower()
+    if first.startswith(terms[0]) or last.startswith(terms[0]):
+        score = 0
+    elif any(term in first or term in last for term in terms):
+        score = 1
+    else:
+        score = 2
+    return (score, first, last, user.pk)
+
+
+def search_users(query, exclude_user_id, board_id=None, limit=20):
+    """
+    Users matching every term of ``query`` (name prefixes rank first),
+    excluding ``exclude_user_id`` and, with ``board_id``, that board's members.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    User = get_user_model()
+    candidates = limit * CANDIDATES_PER_RESULT
+    if connections[User.objects.db].vendor == 'sqlite':
+        users = _sqlite_search(terms, exclude_user_id, board_id, candidates)
+    else:
+        from kanban.models import BoardMembership
+
+        users = User.objects.exclude(pk=exclude_user_id).only(*RESULT_FIELDS)
+        for term in terms:
+            users = users.filter(_term_filter(term))
+        if board_id:
+            users = users.exclude(pk__in=BoardMembership.objects.filter(board_id=board_id).values('user_id'))
+        users = list(users[:candidates])
+    return sorted(users, key=lambda user: _rank(user, terms))[:limit]
@@ -1,12 +1,18 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from kanban.images import avatar_url
+
 User = get_user_model()
 
 class UserProfileSerializer(serializers.ModelSerializer):
     avatar = serializers.ImageField(required=False, allow_null=True)
+    avatar_thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'first_name', 'last_name', 'email', 'avatar']
+        fields = ['id', 'first_name', 'last_name', 'email', 'avatar', 'avatar_thumbnail']
         read_only_fields = ['email']
+
+    def get_avatar_thumbnail(self, obj):
+        return avatar_url(obj, 'md')
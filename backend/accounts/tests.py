@@ -1,3 +1,183 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from kanban.models import Board, BoardMembership
+from kanban.throttling import LocalBucketStore
+
+from .authentication import issue_tokens
+from .search import search_users
+
+User = get_user_model()
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pass')
+        self.ada = User.objects.create_user(
+            username='ada', email='ada@example.com', password='pass', first_name='Ada', last_name='Lovelace',
+        )
+        self.adam = User.objects.create_user(
+            username='adam', email='adam@example.com', password='pass', first_name='Adam', last_name='Smith',
+        )
+        self.grace = User.objects.create_user(
+            username='grace', email='grace@navy.mil', password='pass', first_name='Grace', last_name='Hopper',
+        )
+        self.board = Board.objects.create(title='Board', created_by=self.owner)
+        BoardMembership.objects.create(board=self.board, user=self.owner, role='owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_prefix_and_multi_term_matching(self):
+        self.assertEqual({u.pk for u in search_users('ad', self.owner.pk)}, {self.ada.pk, self.adam.pk})
+        self.assertEqual([u.pk for u in search_users('ada love', self.owner.pk)], [self.ada.pk])
+        self.assertEqual([u.pk for u in search_users('navy', self.owner.pk)], [self.grace.pk])
+        self.assertEqual(search_users('   ', self.owner.pk), [])
+
+    def test_index_follows_profile_updates(self):
+        self.grace.last_name = 'Brewster'
+        self.grace.save()
+        self.assertEqual(search_users('hopper', self.owner.pk), [])
+        self.assertEqual([u.pk for u in search_users('brew', self.owner.pk)], [self.grace.pk])
+
+    def test_board_members_drop_out_of_cached_results(self):
+        url = f'/api/accounts/search-users/?q=ada&board={self.board.pk}'
+        self.assertEqual({row['id'] for row in self.client.get(url).data}, {self.ada.pk, self.adam.pk})
+        BoardMembership.objects.create(board=self.board, user=self.ada)
+        self.assertEqual([row['id'] for row in self.client.get(url).data], [self.adam.pk])
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='ada', email='ada@example.com', password='pass', first_name='Ada', last_name='Lovelace',
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(self.user).access_token}')
+
+    def user_queries(self, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, **kwargs)
+        return response, [q['sql'] for q in ctx.captured_queries if 'accounts_customuser' in q['sql']]
+
+    def test_requests_skip_the_user_query(self):
+        self.client.get('/api/notifications/')
+        response, queries = self.user_queries('get', '/api/notifications/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_profile_edit_issues_fresh_claims(self):
+        response = self.client.patch('/api/accounts/profile/', {'first_name': 'Augusta'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        fresh_token = response.data['access_token']
+        # The old token still works, falling back to loading the row
+        response, queries = self.user_queries('get', '/api/notifications/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(queries)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {fresh_token}')
+        self.client.get('/api/notifications/')
+        _, queries = self.user_queries('get', '/api/notifications/')
+        self.assertEqual(queries, [])
+
+    def test_logout_revokes_tokens(self):
+        self.assertEqual(self.client.post('/api/accounts/logout/').status_code, 204)
+        self.assertEqual(self.client.get('/api/notifications/').status_code, 401)
+        self.user.is_active = False
+        self.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(User.objects.get(pk=self.user.pk)).access_token}')
+        self.assertEqual(self.client.get('/api/notifications/').status_code, 401)
+
+
+class SignupLoginTests(TestCase):
+    def signup(self, email):
+        return self.client.post('/api/accounts/signup/', {
+            'first_name': 'Ada', 'last_name': 'Lovelace', 'email': email,
+            'password': 'pass', 'confirmPassword': 'pass',
+        }, format='json')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_usernames_are_allocated_in_one_query(self):
+        User.objects.create_user(username='ada', email='x@example.com')
+        User.objects.create_user(username='ada1', email='y@example.com')
+        User.objects.create_user(username='adam', email='z@example.com')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.signup('ada@example.com').status_code, 201)
+        selects = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.assertTrue(User.objects.filter(username='ada2', email='ada@example.com').exists())
+
+    def test_login_by_email_fetches_the_user_once(self):
+        self.signup('Ada@Example.com')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/accounts/login/', {'email': 'ada@example.COM', 'password': 'pass'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([q for q in ctx.captured_queries if 'accounts_customuser' in q['sql']]), 1)
+        response = self.client.post('/api/accounts/login/', {'email': 'ada@example.com', 'password': 'nope'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'login': '2/hour', 'user_search': '1/hour'},
+})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('kanban.throttling._store', LocalBucketStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def test_login_is_limited_per_ip(self):
+        for _ in range(2):
+            response = self.client.post('/api/accounts/login/', {'email': 'a@example.com', 'password': 'x'}, format='json')
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/accounts/login/', {'email': 'a@example.com', 'password': 'x'}, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response.headers['Retry-After']), 1800)
+        other = APIClient(REMOTE_ADDR='10.0.0.2')
+        response = other.post('/api/accounts/login/', {'email': 'a@example.com', 'password': 'x'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_forwarded_for_header_does_not_reset_the_bucket(self):
+        for i in range(3):
+            response = self.client.post(
+                '/api/accounts/login/', {'email': 'a@example.com', 'password': 'x'}, format='json',
+                HTTP_X_FORWARDED_FOR=f'203.0.113.{i}',
+            )
+        self.assertEqual(response.status_code, 429)
+
+    def test_forwarded_for_is_used_behind_a_proxy(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            for i in range(3):
+                response = self.client.post(
+                    '/api/accounts/login/', {'email': 'a@example.com', 'password': 'x'}, format='json',
+                    HTTP_X_FORWARDED_FOR=f'spoofed, 203.0.113.{i}',
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_prune_keeps_partly_drained_buckets(self):
+        store = LocalBucketStore(max_keys=2)
+        rate = 3 / 3600
+        for _ in range(2):
+            self.assertEqual(store.consume('drained', 3, rate), 0)
+        # Overflowing the store prunes; 'drained' still owes two tokens
+        for key in ('b', 'c'):
+            store.consume(key, 3, rate)
+        self.assertEqual(store.consume('drained', 3, rate), 0)
+        self.assertGreater(store.consume('drained', 3, rate), 0)
+
+    def test_search_is_limited_per_user(self):
+        for username in ('ada', 'grace'):
+            self.client.force_authenticate(User.objects.create_user(username=username, email=f'{username}@example.com'))
+            self.assertEqual(self.client.get('/api/accounts/search-users/', {'q': 'x'}).status_code, 200)
+        self.assertEqual(self.client.get('/api/accounts/search-users/', {'q': 'x'}).status_code, 429)
@@ -1,16 +1,56 @@
-from rest_framework.decorators import api_view
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import get_user_model, authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import issue_tokens, revoke_tokens
+from .search import search_users
 from .serializers import UserProfileSerializer
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
+from kanban.access import board_roles, has_role
+from kanban.cache import board_generations
+from kanban.images import avatar_url, generate_derivatives
 from kanban.models import Board, BoardMembership
+from kanban.tasks import enqueue
+from kanban.throttling import IPBucketThrottle, UserBucketThrottle
+
+USERNAME_ATTEMPTS = 3
+
+
+def allocate_username(base):
+    """
+    First free name in ``base``, ``base1``, ``base2``... found with one
+    query over the names sharing the prefix; the unique constraint catches
+    races.
+    """
+    suffix = r'(|[1-9][0-9]*)'
+    names = get_user_model().objects.filter(
+        username__startswith=base, username__regex=rf'^{re.escape(base)}{suffix}$',
+    ).values_list('username', flat=True)
+    taken = {int(name[len(base):] or 0) for name in names}
+    counter = 0
+    while counter in taken:
+        counter += 1
+    return f'{base}{counter}' if counter else base
+
+
+class SignupThrottle(IPBucketThrottle):
+    scope = 'signup'
+
+
+class LoginThrottle(IPBucketThrottle):
+    scope = 'login'
+
 
 # --- SIGNUP ---
 @api_view(['POST'])
+@throttle_classes([SignupThrottle])
 def signup(request):
     User = get_user_model()
     first_name = request.data.get('first_name', '')
@@ -27,36 +67,33 @@ def signup(request):
     # ... rest of your validation
 
     username_base = email.split('@')[0]
-    username = username_base
-    counter = 1
-    while User.objects.filter(username=username).exists():
-        username = f"{username_base}{counter}"
-        counter += 1
-    user = User.objects.create_user(
-        username=username,
-        email=email,
-        password=password,
-        first_name=first_name,
-        last_name=last_name
-    )
+    user = User(email=email, first_name=first_name, last_name=last_name)
+    # Hash once, outside the retry loop
+    user.set_password(password)
+    for attempt in range(USERNAME_ATTEMPTS):
+        user.username = allocate_username(username_base)
+        try:
+            with transaction.atomic():
+                user.save()
+            break
+        except IntegrityError:
+            # Taken by a concurrent signup between the lookup and the insert
+            if attempt == USERNAME_ATTEMPTS - 1:
+                raise
     return Response({'message': 'User created successfully!'}, status=status.HTTP_201_CREATED)
 
 
 # --- LOGIN ---
 @api_view(['POST'])
+@throttle_classes([LoginThrottle])
 def login(request):
     email = request.data.get('email', '')
     password = request.data.get('password', '')
-    User = get_user_model()
 
-    try:
-        user = User.objects.get(email=email)
-    except User.DoesNotExist:
-        return Response({'error': 'Invalid email or password.'}, status=status.HTTP_400_BAD_REQUEST)
-
-    user = authenticate(request, username=user.username, password=password)
+    # accounts.backends.EmailBackend: one indexed, case-insensitive fetch
+    user = authenticate(request, email=email, password=password)
     if user is not None:
-        refresh = RefreshToken.for_user(user)
+        refresh = issue_tokens(user)
         return Response({
             'access_token': str(refresh.access_token),
             'refresh_token': str(refresh),
@@ -85,43 +122,56 @@ class ProfileView(APIView):
             data['avatar'] = request.FILES['avatar']
         serializer = UserProfileSerializer(request.user, data=data, partial=True)
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
+            user = serializer.save()
+            if 'avatar' in request.FILES and user.avatar:
+                enqueue(generate_derivatives, user.avatar.name, 'avatar', idempotency_key=f'derivatives:{user.avatar.name}')
+            # The access token carries the name and avatar; hand out one with the new values
+            return Response({**serializer.data, 'access_token': str(issue_tokens(user).access_token)})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+# --- LOGOUT ---
+class LogoutView(APIView):
+    """Access tokens are stateless, so logging out revokes all of the user's tokens."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        revoke_tokens(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 # --- SEARCH USERS FOR ADDING TO BOARD ---
 class UserSearchAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [UserBucketThrottle]
+    throttle_scope = 'user_search'
 
     def get(self, request):
         query = request.GET.get('q', '').strip()
         board_id = request.GET.get('board')
-        User = get_user_model()
-        users = User.objects.all().exclude(id=request.user.id)
-
-        if query:
-            users = users.filter(
-                Q(first_name__icontains=query) |
-                Q(last_name__icontains=query) |
-                Q(email__icontains=query)
-            )
-
-        if board_id:
-            from kanban.models import BoardMembership
-            board_members = BoardMembership.objects.filter(board_id=board_id).values_list('user_id', flat=True)
-            users = users.exclude(id__in=board_members)
-
-        users = users.order_by('first_name', 'last_name')[:20]
-        return Response([
-            {
-                "id": u.id,
-                "first_name": u.first_name,
-                "last_name": u.last_name,
-                "email": u.email,
-                # Fix: always return avatar as URL or empty string
-                "avatar": u.avatar.url if getattr(u, 'avatar', None) and hasattr(u.avatar, 'url') else "",
-            } for u in users
-        ])
+        if board_id and not board_id.isdigit():
+            return Response({'error': 'Invalid board id.'}, status=status.HTTP_400_BAD_REQUEST)
+        if board_id and not has_role(request, int(board_id)):
+            return Response({'error': 'Board not found.'}, status=status.HTTP_404_NOT_FOUND)
+        # Typing sends the same prefixes repeatedly; cache briefly. The board's
+        # generation is part of the key so newly added members drop out at once.
+        generation = board_generations([int(board_id)])[int(board_id)] if board_id else 0
+        digest = hashlib.md5(query.lower().encode()).hexdigest()
+        key = f'user-search:{request.user.pk}:{board_id}:{generation}:{digest}'
+        results = cache.get(key)
+        if results is None:
+            results = [
+                {
+                    "id": u.id,
+                    "first_name": u.first_name,
+                    "last_name": u.last_name,
+                    "email": u.email,
+                    # Fix: always return avatar as URL or empty string
+                    "avatar": u.avatar.url if getattr(u, 'avatar', None) and hasattr(u.avatar, 'url') else "",
+                    "avatar_thumbnail": avatar_url(u),
+                } for u in search_users(query, request.user.pk, board_id=board_id)
+            ]
+            cache.set(key, results, settings.USER_SEARCH_CACHE_TIMEOUT)
+        return Response(results)
 
 
 # --- ADD USER TO BOARD ---
@@ -143,11 +193,10 @@ class AddBoardMemberAPIView(APIView):
             return Response({'error': 'Board not found.'}, status=404)
 
         # Only allow owners or admins to add members!
-        try:
-            bm = BoardMembership.objects.get(board=board, user=request.user)
-        except BoardMembership.DoesNotExist:
+        acting_role = board_roles(request).get(board.pk)
+        if acting_role is None:
             return Response({'error': 'Not a board member.'}, status=403)
-        if bm.role not in ['owner', 'admin']:
+        if acting_role not in ['owner', 'admin']:
             return Response({'error': 'Only board owner or admin can add members.'}, status=403)
 
         User = get_user_model()
@@ -165,13 +214,8 @@ class AddBoardMemberAPIView(APIView):
         BoardMembership.objects.create(board=board, user=user, role=role)
         
         # Emit board_joined notification
-        from kanban.models import Notification
-        Notification.objects.create(
-            user=user,
-            message=f'You joined the board "{board.title}"',
-            type='board_joined',
-            board=board
-        )
+        from kanban.notifications import notify_users
+        notify_users([user.pk], f'You joined the board "{board.title}"', 'board_joined', board_id=board.pk)
         return Response({'success': True, 'message': 'User added to board.'})
 
 class UpdateBoardMemberRoleAPIView(APIView):
@@ -191,12 +235,11 @@ class UpdateBoardMemberRoleAPIView(APIView):
             return Response({"error": "Board does not exist."}, status=status.HTTP_404_NOT_FOUND)
 
         # Only owner or admin can change roles
-        try:
-            acting_membership = BoardMembership.objects.get(board=board, user=request.user)
-        except BoardMembership.DoesNotExist:
+        acting_role = board_roles(request).get(board.pk)
+        if acting_role is None:
             return Response({"error": "Not a board member."}, status=status.HTTP_403_FORBIDDEN)
 
-        if acting_membership.role not in ["owner", "admin"]:
+        if acting_role not in ["owner", "admin"]:
             return Response({"error": "Only owner or admin can change roles."}, status=status.HTTP_403_FORBIDDEN)
 
         # You cannot demote the only owner!
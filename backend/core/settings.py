@@ -3,6 +3,8 @@ import os
 import json
 from datetime import timedelta
 
+from corsheaders.defaults import default_headers
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -67,12 +69,48 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'core.urls'
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_EXPOSE_HEADERS = ['Link']
+CORS_ALLOW_HEADERS = (*default_headers, 'upload-offset')
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'accounts.authentication.ClaimsJWTAuthentication',
+    ),
+    # Token-bucket budgets (kanban.throttling): burst of N, refilled at N per period
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '10/min',
+        'signup': '5/min',
+        'user_search': '120/min',
+        'uploads': '60/min',
+        'upload_chunks': '600/min',
+        **config.get('THROTTLE_RATES', {}),
+    },
+    # Proxies in front of the app that append to X-Forwarded-For; throttles key on the
+    # address the nearest of them saw. 0 uses REMOTE_ADDR and ignores the header, which
+    # clients can set to anything
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', config.get('NUM_PROXIES', 0))),
 }
+# kanban.throttling.LocalBucketStore keeps buckets per process;
+# kanban.throttling.CacheBucketStore shares them through the cache
+KANBAN_THROTTLE_STORE = config.get('KANBAN_THROTTLE_STORE', 'kanban.throttling.LocalBucketStore')
+
+# Collection endpoints return at most KANBAN_MAX_PAGE_SIZE rows per request
+KANBAN_PAGE_SIZE = int(os.environ.get('KANBAN_PAGE_SIZE', config.get('KANBAN_PAGE_SIZE', 100)))
+KANBAN_MAX_PAGE_SIZE = int(os.environ.get('KANBAN_MAX_PAGE_SIZE', config.get('KANBAN_MAX_PAGE_SIZE', 500)))
+
+# Fan-out for board change events (kanban.events); swap for a shared broker with multiple workers
+KANBAN_EVENT_BROKER = config.get('KANBAN_EVENT_BROKER', 'kanban.events.InMemoryBroker')
+
+# Run deferred side effects (kanban.tasks) on a thread of the web process after commit. Set to
+# false and run `python manage.py run_tasks` alongside the web process to move them out of it.
+KANBAN_TASKS_EAGER = os.environ.get('KANBAN_TASKS_EAGER', str(config.get('KANBAN_TASKS_EAGER', True))).lower() == 'true'
+
+# Tests only: run tasks synchronously on commit instead of storing them
+KANBAN_TASKS_INLINE = False
+
+# Board/list/card copies touching more cards and checklist items than this run as a
+# background CopyJob on the task queue instead of inside the request (kanban.copying)
+KANBAN_COPY_INLINE_LIMIT = int(config.get('KANBAN_COPY_INLINE_LIMIT', 500))
 
 TEMPLATES = [
     {
@@ -130,6 +168,56 @@ else:
     }
 
 
+# Cache (board snapshots, summaries). Local memory by default; use "file" or "db" to share
+# it between worker processes ("db" needs `python manage.py createcachetable`).
+CACHE_BACKEND = config.get('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config.get('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+        }
+    }
+elif CACHE_BACKEND == 'db':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': config.get('CACHE_LOCATION', 'kanban_cache'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'kanban',
+        }
+    }
+
+KANBAN_BOARD_CACHE_TIMEOUT = int(config.get('KANBAN_BOARD_CACHE_TIMEOUT', 300))
+# Member-picker search results (requests repeat as the user types)
+USER_SEARCH_CACHE_TIMEOUT = int(config.get('USER_SEARCH_CACHE_TIMEOUT', 30))
+# Per-user board roles used for authorization; membership changes drop the
+# entry, but with a per-process cache other workers see them only on expiry
+KANBAN_ACCESS_CACHE_TIMEOUT = int(config.get('KANBAN_ACCESS_CACHE_TIMEOUT', 60))
+
+
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.EmailBackend',
+    # Username login for the admin site
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+PASSWORD_HASHERS = [
+    'accounts.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# PBKDF2 work factor; leave unset in production (Django's default applies).
+# Load-test environments can lower it to take hashing off the hot path.
+PASSWORD_HASH_ITERATIONS = int(config.get('PASSWORD_HASH_ITERATIONS', 0)) or None
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -177,3 +265,20 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Uploads: resumable upload sessions append to files in KANBAN_UPLOAD_TEMP_DIR
+# until complete; sizes are checked before any bytes are accepted
+KANBAN_UPLOAD_TEMP_DIR = config.get('KANBAN_UPLOAD_TEMP_DIR', str(BASE_DIR / 'uploads'))
+KANBAN_MAX_UPLOAD_SIZE = int(config.get('KANBAN_MAX_UPLOAD_SIZE', 100 * 1024 * 1024))
+KANBAN_MAX_UPLOAD_CHUNK = int(config.get('KANBAN_MAX_UPLOAD_CHUNK', 8 * 1024 * 1024))
+# Total bytes a user may have in attachments and open uploads (None = unlimited)
+KANBAN_USER_UPLOAD_QUOTA = config.get('KANBAN_USER_UPLOAD_QUOTA')
+
+# Downloads: let the front proxy send file bytes. 'nginx' answers with
+# X-Accel-Redirect to KANBAN_SENDFILE_URL + name (an `internal` location
+# aliased to MEDIA_ROOT); 'apache' answers with X-Sendfile and the file path
+KANBAN_SENDFILE_BACKEND = config.get('KANBAN_SENDFILE_BACKEND')
+KANBAN_SENDFILE_URL = config.get('KANBAN_SENDFILE_URL', '/protected-media/')
+# Attachment links carry a signed token for one attachment instead of the
+# access token (links can't send headers); it expires after this many seconds
+KANBAN_DOWNLOAD_TOKEN_TTL = int(config.get('KANBAN_DOWNLOAD_TOKEN_TTL', 15 * 60))
@@ -1,13 +1,24 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from kanban.views import public_media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/accounts/', include('accounts.urls')),
     path('api/', include('kanban.urls')),
 ]
 
+MEDIA_PREFIX = settings.MEDIA_URL.lstrip('/')
+
 if settings.DEBUG:
+    # Derivatives fall back to their original until generated
+    urlpatterns += [re_path(r'^%s(?P<path>derivatives/.+)$' % MEDIA_PREFIX, public_media)]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+else:
+    # Public media only; attachments go through /api/attachments/<id>/download/
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.+)$' % MEDIA_PREFIX, public_media, name='public-media'),
+    ]
@@ -0,0 +1,166 @@
+"""
+Board-level authorization shared by the kanban and accounts views.
+
+``board_roles(request)`` maps board id -> role for every board the user
+belongs to, archived boards excluded. It costs one indexed query, is
+memoised on the request and cached across requests for
+``KANBAN_ACCESS_CACHE_TIMEOUT`` seconds; membership saves and deletes and
+archiving a board drop the cached entries. With a per-process
+cache (locmem) other workers may keep a removed member's access until the
+timeout, so keep it short or configure a shared cache.
+
+Objects are checked against the board they belong to. Views mix in
+``BoardAccessMixin``: ``get_board_object`` loads an object and its board
+id in a single query and runs the ``IsBoardMember`` object check;
+``check_parent`` resolves a parent id (for creates) with one indexed lookup.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import Http404
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import BasePermission
+
+from .models import Attachment, Board, BoardMembership, Card, Checklist, ChecklistItem, Comment, Label, List
+
+ROLE_RANK = {'member': 1, 'admin': 2, 'owner': 3}
+
+# Lookup from each model to its board id
+BOARD_PATHS = {
+    Board: 'id',
+    List: 'board_id',
+    Label: 'board_id',
+    Card: 'list__board_id',
+    Checklist: 'card__list__board_id',
+    Comment: 'card__list__board_id',
+    Attachment: 'card__list__board_id',
+    ChecklistItem: 'checklist__card__list__board_id',
+}
+
+
+def _cache_key(user_id):
+    return f'kanban:access:{user_id}'
+
+
+def board_roles(request):
+    roles = getattr(request, '_kanban_board_roles', None)
+    if roles is None:
+        user = request.user
+        key = _cache_key(user.pk)
+        roles = cache.get(key)
+        if roles is None:
+            memberships = BoardMembership.objects.filter(user=user, board__archived_at=None)
+            roles = dict(memberships.values_list('board_id', 'role'))
+            cache.set(key, roles, getattr(settings, 'KANBAN_ACCESS_CACHE_TIMEOUT', 60))
+        request._kanban_board_roles = roles
+    return roles
+
+
+def board_ids(request):
+    return list(board_roles(request))
+
+
+def has_role(request, board_id, minimum='member'):
+    role = board_roles(request).get(board_id)
+    return role is not None and ROLE_RANK[role] >= ROLE_RANK[minimum]
+
+
+def check_board(request, board_id, minimum='member'):
+    """404 for boards the user can't see, 403 when their role is too low."""
+    role = board_roles(request).get(board_id)
+    if role is None:
+        raise Http404
+    if ROLE_RANK[role] < ROLE_RANK[minimum]:
+        raise PermissionDenied(f'Requires the {minimum} role on this board.')
+
+
+def check_archived_board(request, board_id, minimum='member'):
+    """check_board for an archived board, which board_roles leaves out."""
+    role = (
+        BoardMembership.objects.filter(user=request.user, board_id=board_id, board__archived_at__isnull=False)
+        .values_list('role', flat=True).first()
+    )
+    if role is None:
+        raise Http404
+    if ROLE_RANK[role] < ROLE_RANK[minimum]:
+        raise PermissionDenied(f'Requires the {minimum} role on this board.')
+
+
+def board_of(model, pk):
+    """Board id of ``model`` row ``pk`` (None if it doesn't exist)."""
+    try:
+        return model.objects.filter(pk=pk).values_list(BOARD_PATHS[model], flat=True).first()
+    except (TypeError, ValueError):
+        return None
+
+
+def load_with_board(queryset, **lookup):
+    """
+    Fetch one object (``queryset`` may be a model) together with its board
+    id, left on it as ``access_board_id``, in a single query. 404 if missing.
+    """
+    model = getattr(queryset, 'model', queryset)
+    if queryset is model:
+        queryset = model._default_manager.all()
+    try:
+        obj = queryset.annotate(access_board_id=F(BOARD_PATHS[model])).filter(**lookup).first()
+    except (TypeError, ValueError):
+        obj = None
+    if obj is None:
+        raise Http404
+    return obj
+
+
+class IsBoardMember(BasePermission):
+    """
+    Authenticated users only; objects passed to ``check_object_permissions``
+    must be on a board the user belongs to, with at least the role the view
+    names for the method in ``board_roles_required`` (default 'member').
+    """
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated)
+
+    def has_object_permission(self, request, view, obj):
+        board_id = getattr(obj, 'access_board_id', None)
+        if board_id is None:
+            board_id = board_of(type(obj), obj.pk)
+        check_board(request, board_id, required_role(view, request))
+        return True
+
+
+def required_role(view, request):
+    return getattr(view, 'board_roles_required', {}).get(request.method, 'member')
+
+
+class BoardAccessMixin:
+    """For APIViews using IsBoardMember: object and parent lookups with the access check."""
+    permission_classes = [IsBoardMember]
+    board_roles_required = {}
+
+    def get_board_object(self, queryset, **lookup):
+        obj = load_with_board(queryset, **lookup)
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def check_parent(self, model, pk):
+        """Check access to the board of the parent a new/moved object will belong to."""
+        board_id = board_of(model, pk)
+        if board_id is None:
+            raise Http404
+        check_board(self.request, board_id, required_role(self, self.request))
+        return board_id
+
+
+def forget_board_access(board_id):
+    """Drop the cached roles of everyone on ``board_id`` (e.g. when it's archived or restored)."""
+    user_ids = BoardMembership.objects.filter(board_id=board_id).values_list('user_id', flat=True)
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+@receiver(post_save, sender=BoardMembership)
+@receiver(post_delete, sender=BoardMembership)
+def forget_access(sender, instance, **kwargs):
+    cache.delete(_cache_key(instance.user_id))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Board, BoardMembership, List, Card, Checklist, ChecklistItem, Comment, Label, Notification
+from .models import Board, BoardMembership, List, Card, Checklist, ChecklistItem, Comment, Label, Notification, Task
 
 admin.site.register(Board)
 admin.site.register(BoardMembership)
@@ -20,3 +20,9 @@ class LabelAdmin(admin.ModelAdmin):
 admin.site.register(Label, LabelAdmin)
 
 admin.site.register(Notification)
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_after', 'last_error')
+    list_filter = ('status',)
+
+admin.site.register(Task, TaskAdmin)
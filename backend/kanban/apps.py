@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class KanbanConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'kanban'
+
+    def ready(self):
+        # Connect access and cache invalidation, search index signals; register @task functions
+        from . import access, cache, cleanup, copying, images, notifications, search  # noqa: F401
+        post_migrate.connect(search.install_search_index, sender=self)
@@ -0,0 +1,100 @@
+"""
+Archiving (soft-deleting) boards, lists and cards.
+
+Archiving sets ``archived_at`` with one UPDATE and leaves the rows in
+place. The default managers (``Model.objects``) leave archived rows out,
+so trees, listings and lookups stop showing them at once; ``all_objects``
+still sees them.
+
+- Archiving a list also archives its cards with the same timestamp, and
+  restoring the list brings back exactly those cards.
+- An archived board drops out of its members' board roles (kanban.access),
+  which hides everything on it from the board-scoped endpoints.
+- Search entries of archived cards are removed and rebuilt on restore.
+
+Deleting archives first and queues ``kanban.cleanup.purge`` to remove the
+rows and stored files in bounded batches, so a delete returns at once
+however large the tree is. The purge runs on a background thread in eager
+mode and on the ``run_tasks`` worker otherwise (kanban.tasks).
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .access import forget_board_access
+from .cache import bump_board
+from .changes import record_change, record_changes
+from .cleanup import purge
+from .events import compact, prefetch_compact, publish_board_event
+from .models import Board, Card, List, SearchEntry
+from .search import rebuild
+from .tasks import enqueue
+
+
+class ArchiveError(Exception):
+    status_code = 409
+
+
+def archive(kind, obj, board_id, event_type='board.archived'):
+    """Archive ``obj`` (a board, list or card on ``board_id``); returns the archive time."""
+    now = timezone.now()
+    with transaction.atomic():
+        if kind == 'board':
+            Board.objects.filter(pk=obj.pk).update(archived_at=now)
+            forget_board_access(obj.pk)
+            bump_board(obj.pk)
+            publish_board_event(obj.pk, event_type, {'id': obj.pk})
+        elif kind == 'list':
+            List.objects.filter(pk=obj.pk).update(archived_at=now)
+            Card.objects.filter(list_id=obj.pk).update(archived_at=now)
+            SearchEntry.objects.filter(card__list_id=obj.pk).delete()
+            record_change(board_id, 'list', 'deleted', data={'id': obj.pk})
+        else:
+            Card.objects.filter(pk=obj.pk).update(archived_at=now)
+            SearchEntry.objects.filter(card_id=obj.pk).delete()
+            record_change(board_id, 'card', 'deleted', data={'id': obj.pk})
+    return now
+
+
+def restore(kind, obj, board_id):
+    """Bring back an archived board, list or card; returns it."""
+    with transaction.atomic():
+        if kind == 'board':
+            Board.all_objects.filter(pk=obj.pk).update(archived_at=None)
+            forget_board_access(obj.pk)
+            bump_board(obj.pk)
+            publish_board_event(obj.pk, 'board.restored', {'id': obj.pk})
+            return Board.objects.get(pk=obj.pk)
+        if kind == 'list':
+            List.all_objects.filter(pk=obj.pk).update(archived_at=None)
+            Card.all_objects.filter(list_id=obj.pk, archived_at=obj.archived_at).update(archived_at=None)
+            cards = Card.objects.filter(list_id=obj.pk)
+            rebuild(cards=cards)
+            list_obj = List.objects.get(pk=obj.pk)
+            record_change(board_id, 'list', 'created', list_obj)
+            record_changes(board_id, 'card', 'created', [compact(card) for card in prefetch_compact(cards.order_by('order', 'id'))])
+            return list_obj
+        if not List.objects.filter(pk=obj.list_id).exists():
+            raise ArchiveError("The card's list is archived; restore the list first.")
+        Card.all_objects.filter(pk=obj.pk).update(archived_at=None)
+        rebuild(cards=Card.objects.filter(pk=obj.pk))
+        card = Card.objects.get(pk=obj.pk)
+        record_change(board_id, 'card', 'created', card)
+        return card
+
+
+def delete(kind, obj, board_id):
+    """Archive ``obj`` and queue its purge; the response needn't wait for the cascade."""
+    archived_at = archive(kind, obj, board_id, event_type='board.deleted')
+    # One purge per delete: after a restore, deleting again must queue a fresh one
+    enqueue(purge, kind, obj.pk, idempotency_key=f'purge-{kind}:{obj.pk}:{archived_at.timestamp()}')
+
+
+def delete_cards(card_ids):
+    """
+    Archive cards with one UPDATE and queue one purge for all of them, as
+    ``delete`` does for a single card; the caller logs the changes.
+    """
+    now = timezone.now()
+    Card.objects.filter(pk__in=card_ids).update(archived_at=now)
+    SearchEntry.objects.filter(card_id__in=card_ids).delete()
+    enqueue(purge, 'card', *sorted(card_ids))
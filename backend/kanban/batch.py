@@ -0,0 +1,261 @@
+"""
+Transactional batch writes for cards, checklists and checklist items.
+
+``POST batch/`` takes ``{"operations": [...]}`` where each operation is one of
+
+    {"op": "create", "type": "card", "ref": "c1", "data": {"list": 3, "title": "Release"}}
+    {"op": "create", "type": "checklist", "ref": "steps", "data": {"card": "$c1", "title": "Steps"}}
+    {"op": "create", "type": "checklist_item", "data": {"checklist": "$steps", "text": "Tag"}}
+    {"op": "update", "type": "checklist_item", "id": 7, "data": {"completed": true}}
+    {"op": "delete", "type": "card", "id": 9}
+
+A create names its parent by id or as ``"$<ref>"``, the ``ref`` of a create
+earlier in the batch. Updates change plain fields only (moves go through
+the move endpoints).
+
+Every operation is validated, then parents and targets are loaded with one
+query per type and their boards checked against the user's cached roles
+(kanban.access) before anything is written. Writes run in one transaction:
+creates parents-first with one bulk_create per type, then one bulk_update
+per type, then deletes children-first with one DELETE per type. Deleted
+cards are archived and purged later, like single deletes (kanban.archive),
+so they can be restored and their attachment files are removed. Either all
+operations apply or none do. Changes are logged per board and type
+(kanban.changes) and bulk-written rows are indexed for search.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Max
+from rest_framework import serializers
+
+from .access import BOARD_PATHS, board_roles
+from .archive import delete_cards
+from .changes import record_changes
+from .events import compact, prefetch_compact
+from .models import Card, Checklist, ChecklistItem, List
+from .ordering import ORDER_GAP
+from .search import index_created, reindex_cards, reindex_checklist_items
+from .serializers import CardFieldsSerializer, ChecklistFieldsSerializer, ChecklistItemFieldsSerializer
+
+MAX_OPERATIONS = 500
+
+# type -> (model, payload serializer, parent field); listed parents first
+RESOURCES = {
+    'card': (Card, CardFieldsSerializer, 'list'),
+    'checklist': (Checklist, ChecklistFieldsSerializer, 'card'),
+    'checklist_item': (ChecklistItem, ChecklistItemFieldsSerializer, 'checklist'),
+}
+PARENT_TYPES = {'card': None, 'checklist': 'card', 'checklist_item': 'checklist'}
+# Fields whose change must be reflected in the search index
+INDEXED_FIELDS = {'card': {'title', 'description'}, 'checklist_item': {'text'}}
+
+
+class BatchError(Exception):
+    def __init__(self, errors, status_code=400):
+        super().__init__(errors)
+        self.errors = errors
+        self.status_code = status_code
+
+
+def _parse(index, operation, refs):
+    if not isinstance(operation, dict):
+        raise serializers.ValidationError('Each operation must be an object.')
+    op, kind = operation.get('op'), operation.get('type')
+    if op not in ('create', 'update', 'delete'):
+        raise serializers.ValidationError({'op': 'Must be create, update or delete.'})
+    if kind not in RESOURCES:
+        raise serializers.ValidationError({'type': f'Must be one of {", ".join(RESOURCES)}.'})
+    model, payload_serializer, parent_field = RESOURCES[kind]
+    parsed = {'index': index, 'op': op, 'type': kind}
+    data = operation.get('data') or {}
+    if not isinstance(data, dict):
+        raise serializers.ValidationError({'data': 'Must be an object.'})
+
+    if op == 'create':
+        parent = data.get(parent_field)
+        if isinstance(parent, str) and parent.startswith('$'):
+            if PARENT_TYPES[kind] is None or refs.get(parent[1:]) != PARENT_TYPES[kind]:
+                raise serializers.ValidationError({parent_field: f'{parent} is not a {parent_field} created earlier.'})
+        elif not isinstance(parent, int):
+            raise serializers.ValidationError({parent_field: 'An id or "$ref" is required.'})
+        ref = operation.get('ref')
+        if ref is not None:
+            if not isinstance(ref, str) or ref in refs:
+                raise serializers.ValidationError({'ref': 'Must be a unique string.'})
+            refs[ref] = kind
+        parsed.update(parent=parent, ref=ref)
+    else:
+        if not isinstance(operation.get('id'), int):
+            raise serializers.ValidationError({'id': 'An integer id is required.'})
+        parsed['id'] = operation['id']
+        if op == 'update' and not data:
+            raise serializers.ValidationError({'data': 'Nothing to update.'})
+
+    if op != 'delete':
+        serializer = payload_serializer(data=data, partial=op == 'update')
+        serializer.is_valid(raise_exception=True)
+        parsed['data'] = serializer.validated_data
+    return parsed
+
+
+def parse_operations(operations):
+    if not isinstance(operations, list) or not operations:
+        raise BatchError({'operations': 'A non-empty list is required.'})
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError({'operations': f'At most {MAX_OPERATIONS} operations per batch.'})
+    parsed, errors, refs = [], {}, {}
+    for index, operation in enumerate(operations):
+        try:
+            parsed.append(_parse(index, operation, refs))
+        except serializers.ValidationError as exc:
+            errors[index] = exc.detail
+    if errors:
+        raise BatchError(errors)
+    return parsed
+
+
+def _load(model, ids):
+    """Rows by id, each with its board id as ``access_board_id``, in one query."""
+    return model.objects.filter(pk__in=ids).annotate(access_board_id=F(BOARD_PATHS[model])).in_bulk()
+
+
+def _resolve(request, operations):
+    """Attach ``parent_obj``/``obj`` and ``board_id`` to each operation, checking access."""
+    parent_ids, target_ids = defaultdict(set), defaultdict(set)
+    for operation in operations:
+        if operation['op'] == 'create':
+            if isinstance(operation['parent'], int):
+                parent_ids[PARENT_TYPES[operation['type']] or 'list'].add(operation['parent'])
+        else:
+            target_ids[operation['type']].add(operation['id'])
+    models = {'list': List, **{kind: resource[0] for kind, resource in RESOURCES.items()}}
+    parents = {kind: _load(models[kind], ids) for kind, ids in parent_ids.items()}
+    targets = {kind: _load(models[kind], ids) for kind, ids in target_ids.items()}
+
+    roles = board_roles(request)
+    errors, ref_boards = {}, {}
+    for operation in operations:
+        kind = operation['type']
+        if operation['op'] == 'create':
+            parent = operation['parent']
+            if isinstance(parent, int):
+                operation['parent_obj'] = parents[PARENT_TYPES[kind] or 'list'].get(parent)
+                board_id = getattr(operation['parent_obj'], 'access_board_id', None)
+            else:
+                board_id = ref_boards.get(parent[1:])
+            if operation['ref'] is not None:
+                ref_boards[operation['ref']] = board_id
+        else:
+            operation['obj'] = targets[kind].get(operation['id'])
+            board_id = getattr(operation['obj'], 'access_board_id', None)
+        # Missing objects and boards the user isn't on look the same, as elsewhere
+        if board_id not in roles:
+            errors[operation['index']] = {'detail': 'Not found.'}
+        operation['board_id'] = board_id
+    if errors:
+        raise BatchError(errors, status_code=404)
+
+
+def _next_orders(operations):
+    """Append new cards after the current last card of their list, in batch order."""
+    list_ids = {op['parent'] for op in operations if 'order' not in op['data']}
+    last = dict(
+        Card.objects.filter(list_id__in=list_ids).order_by().values('list_id')
+        .annotate(last=Max('order')).values_list('list_id', 'last')
+    )
+    for operation in operations:
+        if 'order' not in operation['data']:
+            list_id = operation['parent']
+            last[list_id] = (last.get(list_id) or 0) + ORDER_GAP
+            operation['data'] = {**operation['data'], 'order': last[list_id]}
+
+
+def _create(operations_by_type, changes):
+    created, by_ref, indexed = {}, {}, []
+    for kind, (model, _, parent_field) in RESOURCES.items():
+        operations = operations_by_type.get(kind, [])
+        if not operations:
+            continue
+        if kind == 'card':
+            _next_orders(operations)
+        objects = []
+        for operation in operations:
+            parent = operation['parent']
+            parent_obj = by_ref[parent[1:]] if isinstance(parent, str) else operation['parent_obj']
+            objects.append(model(**{parent_field: parent_obj}, **operation['data']))
+        model.objects.bulk_create(objects)
+        prefetch_compact(objects)
+        for operation, obj in zip(operations, objects):
+            created[operation['index']] = obj
+            if operation['ref'] is not None:
+                by_ref[operation['ref']] = obj
+            changes[operation['board_id'], kind, 'created'].append(compact(obj))
+            if kind in INDEXED_FIELDS:
+                indexed.append((obj, operation['board_id']))
+    index_created(indexed)
+    return created
+
+
+def _update(operations_by_type, changes):
+    for kind, (model, _, _) in RESOURCES.items():
+        operations = operations_by_type.get(kind, [])
+        if not operations:
+            continue
+        objects, fields = {}, set()
+        for operation in operations:
+            obj = operation['obj']
+            for name, value in operation['data'].items():
+                setattr(obj, name, value)
+            objects[obj.pk] = (obj, operation['board_id'])
+            fields.update(operation['data'])
+        model.objects.bulk_update([obj for obj, _ in objects.values()], sorted(fields))
+        prefetch_compact(obj for obj, _ in objects.values())
+        for obj, board_id in objects.values():
+            changes[board_id, kind, 'updated'].append(compact(obj))
+        if fields & INDEXED_FIELDS.get(kind, set()):
+            if kind == 'card':
+                reindex_cards(list(objects))
+            else:
+                reindex_checklist_items([obj for obj, _ in objects.values()])
+
+
+def _delete(operations_by_type, changes):
+    for kind in reversed(RESOURCES):
+        operations = operations_by_type.get(kind, [])
+        if not operations:
+            continue
+        ids = {operation['id']: operation['board_id'] for operation in operations}
+        if kind == 'card':
+            delete_cards(list(ids))
+        else:
+            RESOURCES[kind][0].objects.filter(pk__in=ids).delete()
+        for object_id, board_id in ids.items():
+            changes[board_id, kind, 'deleted'].append({'id': object_id})
+
+
+def run_batch(request, operations):
+    """Validate, authorise and apply ``operations``; returns one result per operation."""
+    operations = parse_operations(operations)
+    _resolve(request, operations)
+    grouped = defaultdict(lambda: defaultdict(list))
+    for operation in operations:
+        grouped[operation['op']][operation['type']].append(operation)
+    changes = defaultdict(list)
+    with transaction.atomic():
+        created = _create(grouped['create'], changes)
+        _update(grouped['update'], changes)
+        _delete(grouped['delete'], changes)
+        for (board_id, kind, action), rows in changes.items():
+            record_changes(board_id, kind, action, rows)
+
+    results = []
+    for operation in operations:
+        if operation['op'] == 'create':
+            obj = created[operation['index']]
+            results.append({'status': 201, 'ref': operation['ref'], 'data': compact(obj)})
+        elif operation['op'] == 'update':
+            results.append({'status': 200, 'data': compact(operation['obj'])})
+        else:
+            results.append({'status': 204, 'id': operation['id']})
+    return results
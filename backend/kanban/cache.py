@@ -0,0 +1,141 @@
+"""
+Cached board snapshots and board summaries.
+
+A serialized board tree is stored under a key built from the board id,
+``Board.version`` (bumped by every recorded change, see kanban.changes)
+and a per-board generation counter kept in the cache. Writes that don't
+go through the change log (nested serializer writes, attachments,
+memberships, assignee/label sets) bump the generation from model
+signals, so a stale snapshot is never served; old keys simply expire.
+Snapshots also show members and comment authors, so a profile edit
+bumps every board the user is a member of or has commented on.
+Deletes are covered by the change log's version bump; there are no
+delete signal receivers so Django can keep fast-deleting cascades.
+
+The key doubles as the response ETag, letting ``BoardAPI.get`` answer
+``If-None-Match`` with 304 before touching the serializer.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Board, BoardMembership, List, Card, Checklist, ChecklistItem, Comment, Label, Attachment
+from .queries import board_id_for
+
+
+def _timeout():
+    return getattr(settings, 'KANBAN_BOARD_CACHE_TIMEOUT', 300)
+
+
+def _generation_key(board_id):
+    return f'kanban:board-gen:{board_id}'
+
+
+def board_generations(board_ids):
+    keys = {_generation_key(board_id): board_id for board_id in board_ids}
+    found = cache.get_many(keys)
+    missing = {key: board_id for key, board_id in keys.items() if key not in found}
+    for key in missing:
+        # Seed with a fresh token rather than 0 so an evicted counter can't
+        # collide with a snapshot cached under an earlier generation
+        cache.add(key, time.time_ns(), None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return {board_id: found.get(key, 0) for key, board_id in keys.items()}
+
+
+def bump_board(board_id):
+    if board_id is None:
+        return
+    key = _generation_key(board_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def etag_for(key):
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = [value.strip().removeprefix('W/') for value in header.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+def board_snapshot_key(board):
+    generation = board_generations([board.pk])[board.pk]
+    return f'kanban:board:{board.pk}:{board.version}:{generation}'
+
+
+def get_board_snapshot(key, build):
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, _timeout())
+    return data
+
+
+def board_summary_key(user):
+    # One indexed query: the user's boards and their versions
+    versions = sorted(BoardMembership.objects.filter(user=user).values_list('board_id', 'board__version'))
+    generations = board_generations([board_id for board_id, _ in versions])
+    fingerprint = ';'.join(f'{board_id}:{version}:{generations[board_id]}' for board_id, version in versions)
+    # Overdue counts depend on the date, so the key rolls over daily
+    digest = hashlib.md5(f'{timezone.localdate()}|{fingerprint}'.encode()).hexdigest()
+    return f'kanban:board-summary:{user.pk}:{digest}'
+
+
+@receiver(post_save, sender=Board)
+@receiver(post_save, sender=BoardMembership)
+@receiver(post_save, sender=List)
+@receiver(post_save, sender=Card)
+@receiver(post_save, sender=Checklist)
+@receiver(post_save, sender=ChecklistItem)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Label)
+@receiver(post_save, sender=Attachment)
+def invalidate_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if sender is BoardMembership:
+        bump_board(instance.board_id)
+    elif sender is not Label or instance.board_id is not None:
+        bump_board(board_id_for(instance))
+
+
+# User fields that board snapshots and summaries show
+PROFILE_FIELDS = {'username', 'first_name', 'last_name', 'email', 'avatar'}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_on_profile_change(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Logins save last_login only; those leave the boards alone
+    if raw or created or (update_fields is not None and not PROFILE_FIELDS & set(update_fields)):
+        return
+    board_ids = set(BoardMembership.objects.filter(user=instance).values_list('board_id', flat=True))
+    board_ids.update(
+        Comment.objects.filter(author=instance).order_by().values_list('card__list__board_id', flat=True).distinct()
+    )
+    for board_id in board_ids:
+        bump_board(board_id)
+
+
+@receiver(m2m_changed, sender=Card.assignees.through)
+@receiver(m2m_changed, sender=Card.labels.through)
+def invalidate_on_card_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_board(board_id_for(instance))
+    elif pk_set:
+        for board_id in set(Card.objects.filter(pk__in=pk_set).values_list('list__board_id', flat=True)):
+            bump_board(board_id)
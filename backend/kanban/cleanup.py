@@ -0,0 +1,67 @@
+"""
+Removal of stored files and of archived or deleted board trees.
+
+``purge_rows`` deletes rows and everything that cascades from them
+without Django's collector: it walks the model's reverse relations,
+children first, and removes each level in primary-key batches of
+``batch_size`` with raw DELETEs (nullable references are cleared with an
+UPDATE). No signals fire and nothing is loaded beyond ids, and each batch
+commits on its own, so purging a large board never holds one long
+transaction. Attachment blobs are removed once their rows are gone.
+"""
+from django.core.files.storage import default_storage
+from django.db import models
+
+from .models import Attachment, Board, Card, List
+from .tasks import task
+
+PURGE_BATCH_SIZE = 1000
+ARCHIVABLE = {'board': Board, 'list': List, 'card': Card}
+
+
+@task
+def delete_stored_files(names):
+    # Blobs are shared between attachments with identical content
+    in_use = set(Attachment.objects.filter(file__in=names).values_list('file', flat=True))
+    for name in set(names) - in_use:
+        default_storage.delete(name)
+
+
+def _purge_dependents(model, ids, batch_size):
+    # Hidden relations included: m2m through tables and related_name='+' keys
+    for relation in model._meta.get_fields(include_hidden=True):
+        if not (relation.auto_created and not relation.concrete and (relation.one_to_many or relation.one_to_one)):
+            continue
+        related = relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': ids})
+        if relation.on_delete is models.SET_NULL:
+            related.update(**{relation.field.name: None})
+        elif relation.on_delete is not models.DO_NOTHING:
+            purge_rows(related, batch_size)
+
+
+def purge_rows(queryset, batch_size=PURGE_BATCH_SIZE):
+    """Delete the rows of ``queryset`` and their dependents in bounded batches; returns the row count."""
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        _purge_dependents(model, ids, batch_size)
+        batch = model._base_manager.filter(pk__in=ids)
+        names = list(batch.exclude(file='').values_list('file', flat=True)) if model is Attachment else []
+        deleted += batch._raw_delete(batch.db)
+        if names:
+            delete_stored_files(names)
+
+
+@task
+def purge_board(board_id):
+    """Delete a board that is no longer visible to its members, with everything on it."""
+    purge_rows(Board.all_objects.filter(pk=board_id))
+
+
+@task
+def purge(kind, *object_ids):
+    """Delete archived boards, lists or cards for good; skips any that were restored."""
+    purge_rows(ARCHIVABLE[kind].all_objects.filter(pk__in=object_ids, archived_at__isnull=False))
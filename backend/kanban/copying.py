@@ -0,0 +1,271 @@
+"""
+Server-side deep copies of boards, lists and cards, and with them
+templates: a template is a board or card flagged ``is_template`` that
+users copy from.
+
+A copy reads each level of the source tree (lists, cards, checklists,
+items, attachments, card labels and assignees) with one query, inserts
+it with one bulk_create and maps source ids to the new rows before the
+next level, so copying a board with thousands of cards takes the same
+number of queries as copying one card. Everything runs in one transaction.
+
+Comments stay behind. Attachments are only copied on request, and by
+reference: the new rows point at the same stored blobs, which cleanup
+keeps until no attachment uses them. A board copy gets its own labels; a
+copy into another board reuses that board's labels with the same name
+(creating missing ones) and keeps only assignees who are members there.
+
+Copies of more than ``KANBAN_COPY_INLINE_LIMIT`` cards and checklist
+items run as a ``CopyJob`` on the task queue, reporting progress through
+the cache (``copy_progress``) while they run.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .changes import record_changes
+from .events import compact, prefetch_compact
+from .models import Attachment, Board, BoardMembership, Card, Checklist, ChecklistItem, CopyJob, Label, List
+from .ordering import next_order
+from .search import index_created
+from .tasks import enqueue, task
+
+BATCH_SIZE = 500
+PROGRESS_TIMEOUT = 24 * 60 * 60
+
+# Card filter selecting what a copy of each kind covers
+SCOPES = {
+    'board': lambda pk: {'list__board_id': pk},
+    'list': lambda pk: {'list_id': pk},
+    'card': lambda pk: {'pk': pk},
+}
+
+
+def _within(prefix, scope):
+    """Re-root a card filter at a related model, e.g. 'card__' for checklists; archived cards are skipped."""
+    return {prefix + 'archived_at': None, **{prefix + lookup: value for lookup, value in scope.items()}}
+
+
+def _clone(objects, **fields):
+    """Turn loaded rows into unsaved copies with ``fields`` set; returns {source id: copy}."""
+    now = timezone.now()
+    copies = {}
+    for obj in objects:
+        source_id = obj.pk
+        obj.pk = None
+        obj._state.adding = True
+        if hasattr(obj, 'created_at'):
+            obj.created_at = now
+        for name, value in fields.items():
+            setattr(obj, name, value)
+        copies[source_id] = obj
+    return copies
+
+
+def copy_size(kind, source_id):
+    """Cards plus checklist items a copy of ``kind`` ``source_id`` would insert."""
+    scope = SCOPES[kind](source_id)
+    items = ChecklistItem.objects.filter(**_within('checklist__card__', scope))
+    return Card.objects.filter(**scope).count() + items.count()
+
+
+def _progress_key(job_id):
+    return f'kanban:copy:{job_id}'
+
+
+def copy_progress(job_id):
+    return cache.get(_progress_key(job_id))
+
+
+class Progress:
+    """Counts copied cards and items; published to the cache for background jobs."""
+
+    def __init__(self, job_id=None, total=0):
+        self.job_id = job_id
+        self.total = total
+        self.copied = 0
+
+    def advance(self, count):
+        self.copied += count
+        if self.job_id is not None:
+            cache.set(_progress_key(self.job_id), {'copied': self.copied, 'total': self.total}, PROGRESS_TIMEOUT)
+
+
+class _CardCopier:
+    def __init__(self, board_id, same_board, attachments, progress):
+        self.board_id = board_id
+        self.same_board = same_board
+        self.attachments = attachments
+        self.progress = progress or Progress()
+        # Source label id -> label to use on the target board
+        self.labels = {}
+
+    def copy_cards(self, scope, lists, **fields):
+        """Copy the cards matching ``scope`` into ``lists`` (source list id -> new list)."""
+        cards = _clone(Card.objects.filter(**scope).order_by('order', 'id'), **{'is_template': False, **fields})
+        for card in cards.values():
+            card.list = lists[card.list_id]
+        Card.objects.bulk_create(cards.values(), batch_size=BATCH_SIZE)
+        self.progress.advance(len(cards))
+
+        checklists = _clone(Checklist.objects.filter(**_within('card__', scope)).order_by('created_at', 'id'))
+        for checklist in checklists.values():
+            checklist.card = cards[checklist.card_id]
+        Checklist.objects.bulk_create(checklists.values(), batch_size=BATCH_SIZE)
+        items = _clone(ChecklistItem.objects.filter(**_within('checklist__card__', scope)).order_by('created_at', 'id'))
+        for item in items.values():
+            item.checklist = checklists[item.checklist_id]
+        ChecklistItem.objects.bulk_create(items.values(), batch_size=BATCH_SIZE)
+        self.progress.advance(len(items))
+
+        if self.attachments:
+            attachments = _clone(Attachment.objects.filter(**_within('card__', scope)).order_by('uploaded_at', 'id'))
+            for attachment in attachments.values():
+                attachment.card = cards[attachment.card_id]
+            Attachment.objects.bulk_create(attachments.values(), batch_size=BATCH_SIZE)
+
+        label_names = self._copy_relations(scope, cards)
+        rows = [(obj, self.board_id) for obj in [*cards.values(), *items.values()]]
+        index_created(rows, label_names)
+        return cards
+
+    def _copy_relations(self, scope, cards):
+        CardLabel, CardAssignee = Card.labels.through, Card.assignees.through
+        label_rows = list(CardLabel.objects.filter(**_within('card__', scope)).values_list('card_id', 'label_id'))
+        labels = self._map_labels({label_id for _, label_id in label_rows})
+        CardLabel.objects.bulk_create(
+            [CardLabel(card_id=cards[card_id].pk, label_id=labels[label_id].pk) for card_id, label_id in label_rows],
+            batch_size=BATCH_SIZE,
+        )
+        # The through table names its user column after the user model
+        user_field = Card._meta.get_field('assignees').m2m_reverse_name()
+        assignee_rows = CardAssignee.objects.filter(**_within('card__', scope)).values_list('card_id', user_field)
+        if not self.same_board:
+            members = BoardMembership.objects.filter(board_id=self.board_id).values('user_id')
+            assignee_rows = assignee_rows.filter(**{f'{user_field}__in': members})
+        CardAssignee.objects.bulk_create(
+            [CardAssignee(card_id=cards[card_id].pk, **{user_field: user_id}) for card_id, user_id in assignee_rows],
+            batch_size=BATCH_SIZE,
+        )
+        label_names = {}
+        for card_id, label_id in label_rows:
+            label_names.setdefault(cards[card_id].pk, []).append(labels[label_id].name)
+        return label_names
+
+    def _map_labels(self, label_ids):
+        missing = set(label_ids) - self.labels.keys()
+        if not missing:
+            return self.labels
+        sources = list(Label.objects.filter(pk__in=missing).order_by('id'))
+        if self.same_board:
+            self.labels.update((label.pk, label) for label in sources)
+            return self.labels
+        existing = {label.name: label for label in Label.objects.filter(board_id=self.board_id)}
+        created = []
+        for label in sources:
+            if label.board_id is None:
+                # Global labels are shared by every board
+                self.labels[label.pk] = label
+                continue
+            if label.name not in existing:
+                existing[label.name] = Label(
+                    board_id=self.board_id, name=label.name, color=label.color, text_color=label.text_color,
+                )
+                created.append(existing[label.name])
+            self.labels[label.pk] = existing[label.name]
+        Label.objects.bulk_create(created)
+        return self.labels
+
+
+def copy_board(user_id, board_id, title=None, attachments=False, template=False, progress=None):
+    """Copy a board with its labels, lists and cards; ``user_id`` owns the copy."""
+    source = Board.objects.get(pk=board_id)
+    with transaction.atomic():
+        board = _clone(
+            [source], title=title or source.title, created_by_id=user_id, is_template=template,
+            version=0, compacted_version=0,
+        )[board_id]
+        board.save()
+        labels = _clone(Label.objects.filter(board_id=board_id).order_by('id'), board=board)
+        Label.objects.bulk_create(labels.values())
+        lists = _clone(List.objects.filter(board_id=board_id).order_by('order', 'id'), board=board)
+        List.objects.bulk_create(lists.values())
+        copier = _CardCopier(board.pk, False, attachments, progress)
+        copier.labels.update(labels)
+        copier.copy_cards(SCOPES['board'](board_id), lists)
+        # Added last, so the board only shows up for its owner once it's complete
+        BoardMembership.objects.create(board=board, user_id=user_id, role='owner')
+    return board
+
+
+def copy_list(user_id, list_id, board_id=None, title=None, attachments=False, progress=None):
+    """Copy a list and its cards to the end of ``board_id`` (default: its own board)."""
+    source = List.objects.get(pk=list_id)
+    board_id = board_id or source.board_id
+    with transaction.atomic():
+        list_obj = _clone(
+            [source], board_id=board_id, title=title or source.title, order=next_order(List, 'board_id', board_id),
+        )[list_id]
+        list_obj.save()
+        copier = _CardCopier(board_id, board_id == source.board_id, attachments, progress)
+        cards = copier.copy_cards(SCOPES['list'](list_id), {list_id: list_obj})
+        record_changes(board_id, 'list', 'created', [compact(list_obj)])
+        record_changes(board_id, 'card', 'created', [compact(card) for card in prefetch_compact(cards.values())])
+    return list_obj
+
+
+def copy_card(user_id, card_id, list_id=None, title=None, attachments=False, template=False, progress=None):
+    """Copy a card to the end of ``list_id`` (default: its own list)."""
+    source = Card.objects.select_related('list').get(pk=card_id)
+    target = List.objects.get(pk=list_id) if list_id else source.list
+    with transaction.atomic():
+        copier = _CardCopier(target.board_id, target.board_id == source.list.board_id, attachments, progress)
+        card = copier.copy_cards(
+            SCOPES['card'](card_id), {source.list_id: target},
+            title=title or source.title, is_template=template, order=next_order(Card, 'list_id', target.pk),
+        )[card_id]
+        record_changes(target.board_id, 'card', 'created', [compact(card)])
+    return card
+
+
+def _copy(kind, user_id, source_id, target_id, options, progress=None):
+    if kind == 'board':
+        return copy_board(user_id, source_id, progress=progress, **options)
+    if kind == 'list':
+        return copy_list(user_id, source_id, target_id, progress=progress, **options)
+    return copy_card(user_id, source_id, target_id, progress=progress, **options)
+
+
+def start_copy(user, kind, source_id, target_id=None, **options):
+    """
+    Copy inline and return the new object, or, for large trees, queue a
+    CopyJob and return that.
+    """
+    total = copy_size(kind, source_id)
+    if total <= getattr(settings, 'KANBAN_COPY_INLINE_LIMIT', 500):
+        return _copy(kind, user.pk, source_id, target_id, options)
+    job = CopyJob.objects.create(user=user, kind=kind, source_id=source_id, target_id=target_id, options=options)
+    Progress(job.pk, total).advance(0)
+    enqueue(run_copy_job, str(job.pk), idempotency_key=f'copy:{job.pk}')
+    return job
+
+
+@task
+def run_copy_job(job_id):
+    job = CopyJob.objects.filter(pk=job_id).first()
+    if job is None or job.status == CopyJob.DONE:
+        return
+    CopyJob.objects.filter(pk=job.pk).update(status=CopyJob.RUNNING)
+    progress = Progress(job.pk, copy_size(job.kind, job.source_id))
+    try:
+        obj = _copy(job.kind, job.user_id, job.source_id, job.target_id, job.options, progress)
+    except Exception as exc:
+        # The copy rolled back; a retry by the task queue starts over
+        CopyJob.objects.filter(pk=job.pk).update(
+            status=CopyJob.FAILED, error=f'{type(exc).__name__}: {exc}', finished_at=timezone.now(),
+        )
+        raise
+    CopyJob.objects.filter(pk=job.pk).update(
+        status=CopyJob.DONE, result_id=obj.pk, error='', finished_at=timezone.now(),
+    )
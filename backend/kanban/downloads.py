@@ -0,0 +1,170 @@
+"""
+Serving stored files: attachments (behind a membership check) and public
+media (avatars, backgrounds) when Django isn't serving MEDIA_ROOT in DEBUG.
+
+Responses answer conditional requests (ETag / Last-Modified) and single
+byte ranges. Whole files go out as ``FileResponse`` so the WSGI server can
+use sendfile. With ``KANBAN_SENDFILE_BACKEND`` set, the transfer is handed
+to the front proxy instead (nginx ``X-Accel-Redirect`` or Apache/lighttpd
+``X-Sendfile``) and no Python worker is held while the bytes go out.
+
+Files are served from the API origin, so uploads must never run as a page
+there: only raster images and PDFs are shown inline, everything else is a
+download, and every response forbids sniffing and sandboxes the content.
+Attachment links authenticate with ``download_token``, a short-lived
+signature for one attachment and user, never with the access token.
+"""
+import hashlib
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .files import CHUNK_SIZE, guess_content_type
+
+UNSATISFIABLE = object()
+# Types browsers render without running script; anything else is sent as a download
+INLINE_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'application/pdf'}
+DOWNLOAD_TOKEN_SALT = 'kanban.downloads.attachment'
+
+
+def download_token(attachment_id, user_id):
+    return signing.TimestampSigner(salt=DOWNLOAD_TOKEN_SALT).sign(f'{attachment_id}:{user_id}')
+
+
+def download_token_user(token, attachment_id):
+    """The user id a valid, unexpired ``token`` for ``attachment_id`` was issued to, else None."""
+    try:
+        value = signing.TimestampSigner(salt=DOWNLOAD_TOKEN_SALT).unsign(
+            token, max_age=getattr(settings, 'KANBAN_DOWNLOAD_TOKEN_TTL', 15 * 60),
+        )
+    except signing.BadSignature:
+        return None
+    signed_id, _, user_id = value.partition(':')
+    return int(user_id) if signed_id == str(attachment_id) else None
+
+
+def parse_range(header, size):
+    """
+    (start, end) for a single ``bytes=`` range, None to serve the whole
+    file (no header, or a form we don't handle such as multiple ranges),
+    or UNSATISFIABLE.
+    """
+    if not header:
+        return None
+    units, _, spec = header.partition('=')
+    if units.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix == 0:
+                return UNSATISFIABLE
+            return max(size - suffix, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return UNSATISFIABLE
+    return start, min(end, size - 1)
+
+
+def _range_applies(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_range(fileobj, length):
+    try:
+        while length > 0:
+            data = fileobj.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        fileobj.close()
+
+
+def _offload(name):
+    backend = getattr(settings, 'KANBAN_SENDFILE_BACKEND', None)
+    if backend == 'nginx':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = settings.KANBAN_SENDFILE_URL + quote(name)
+        return response
+    if backend == 'apache':
+        response = HttpResponse()
+        response['X-Sendfile'] = default_storage.path(name)
+        return response
+    return None
+
+
+def serve_stored_file(request, name, *, size=None, etag=None, last_modified=None,
+                      content_type=None, filename=None, as_attachment=False, cache_control='private, max-age=3600'):
+    """
+    Respond with the stored file ``name``. ``last_modified`` is a POSIX
+    timestamp; ``etag`` defaults to one derived from name, size and time.
+    """
+    if not name:
+        raise Http404
+    try:
+        if size is None:
+            size = default_storage.size(name)
+        if last_modified is None:
+            last_modified = int(default_storage.get_modified_time(name).timestamp())
+    except (FileNotFoundError, OSError):
+        raise Http404
+    if etag is None:
+        etag = hashlib.md5(f'{name}:{size}:{last_modified}'.encode()).hexdigest()
+    etag = f'"{etag}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _offload(name) or _file_response(request, name, size, etag, last_modified)
+    if response.status_code in (200, 206):
+        content_type = content_type or guess_content_type(name)
+        response['Content-Type'] = content_type
+        filename = filename or os.path.basename(name)
+        inline = not as_attachment and content_type.split(';')[0].strip().lower() in INLINE_TYPES
+        disposition = 'inline' if inline else 'attachment'
+        response['Content-Disposition'] = f"{disposition}; filename*=UTF-8''{quote(filename)}"
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    response['Accept-Ranges'] = 'bytes'
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['Content-Security-Policy'] = 'sandbox'
+    return response
+
+
+def _file_response(request, name, size, etag, last_modified):
+    byte_range = None
+    if _range_applies(request, etag, last_modified):
+        byte_range = parse_range(request.headers.get('Range'), size)
+    if byte_range is UNSATISFIABLE:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    try:
+        fileobj = default_storage.open(name, 'rb')
+    except (FileNotFoundError, OSError):
+        raise Http404
+    if byte_range is None:
+        return FileResponse(fileobj)
+    start, end = byte_range
+    fileobj.seek(start)
+    response = StreamingHttpResponse(_read_range(fileobj, end - start + 1), status=206)
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
@@ -0,0 +1,159 @@
+"""
+Per-board change events pushed to connected clients.
+
+Writes are recorded through ``kanban.changes.record_change``, which hands
+the event to the configured broker once the transaction commits. The
+``board_events`` view (served by the ASGI app) subscribes to a board's
+channel and streams events to the browser as Server-Sent Events.
+
+``InMemoryBroker`` fans events out inside one process. Deployments with
+several workers point ``KANBAN_EVENT_BROKER`` at a ``BaseBroker`` subclass
+backed by a shared transport (Redis pub/sub, Postgres LISTEN/NOTIFY, ...).
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils.module_loading import import_string
+
+from .models import Board, List, Card, Checklist, ChecklistItem, Comment, Label
+
+# Fields sent for each model; enough for clients to patch their local state
+COMPACT_FIELDS = {
+    Board: ['id', 'title', 'description', 'color', 'icon', 'background_theme'],
+    List: ['id', 'board', 'title', 'order'],
+    Card: ['id', 'list', 'title', 'description', 'due_date', 'order'],
+    Checklist: ['id', 'card', 'title'],
+    ChecklistItem: ['id', 'checklist', 'text', 'completed'],
+    Comment: ['id', 'card', 'author', 'text', 'created_at'],
+    Label: ['id', 'board', 'name', 'color', 'text_color'],
+}
+# Many-to-many fields sent as sorted id lists
+COMPACT_RELATIONS = {
+    Card: ['assignees', 'labels'],
+}
+
+
+def compact(obj):
+    meta = obj._meta
+    data = {name: getattr(obj, meta.get_field(name).attname) for name in COMPACT_FIELDS[type(obj)]}
+    for name in COMPACT_RELATIONS.get(type(obj), ()):
+        # Served from prefetched rows when prefetch_compact ran
+        data[name] = sorted(related.pk for related in getattr(obj, name).all())
+    return data
+
+
+def prefetch_compact(objects):
+    """Load what compact() needs for ``objects`` (one model) with one query per relation; returns them."""
+    objects = list(objects)
+    if objects and type(objects[0]) in COMPACT_RELATIONS:
+        prefetch_related_objects(objects, *COMPACT_RELATIONS[type(objects[0])])
+    return objects
+
+
+class Subscription:
+    """A subscriber's bounded queue, fed from any thread."""
+
+    def __init__(self, broker, channel, maxsize=256):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def put(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put_nowait, event)
+        except RuntimeError:
+            # Event loop already closed; the subscriber is gone
+            self.close()
+
+    def _put_nowait(self, event):
+        if self.queue.full():
+            # Slow consumer: drop the backlog and tell the client to refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = {'type': 'resync', 'board': event.get('board')}
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class BaseBroker:
+    def publish(self, channel, event):
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class InMemoryBroker(BaseBroker):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'KANBAN_EVENT_BROKER', 'kanban.events.InMemoryBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def board_channel(board_id):
+    return f'board:{board_id}'
+
+
+def publish_board_event(board_id, event_type, data, version=None):
+    """
+    Queue ``{'type', 'board', 'version', 'data'}`` for delivery once the
+    current transaction commits. Writes normally go through
+    ``kanban.changes.record_change``, which also logs the change.
+    """
+    if board_id is None:
+        return
+    event = {'type': event_type, 'board': board_id, 'version': version, 'data': data}
+    transaction.on_commit(lambda: get_broker().publish(board_channel(board_id), event))
+
+
+def format_sse(event):
+    payload = json.dumps(event, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f'event: {event["type"]}\ndata: {payload}\n\n'
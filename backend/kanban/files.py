@@ -0,0 +1,153 @@
+"""
+Attachment file handling: metadata, content-addressed storage and
+resumable uploads.
+
+Blobs are stored under their sha256 (``blobs/ab/abcdef....png``), so the
+same file uploaded to many cards or boards is kept once. Resumable uploads
+(``Upload`` rows) append chunks to a local partial file, streamed from the
+request body without buffering it, and become a blob when complete. Sizes
+and quotas are checked before any bytes are accepted.
+"""
+import hashlib
+import mimetypes
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Attachment, Upload
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def file_digest(fileobj):
+    """Return (size, sha256 hex) of a Django File, reading it in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in fileobj.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def guess_content_type(name, declared=None):
+    if declared and declared != 'application/octet-stream':
+        return declared
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def file_metadata(fileobj, original_name=None, declared_type=None):
+    """Metadata recorded on Attachment rows so serializing never touches storage."""
+    size, checksum = file_digest(fileobj)
+    original_name = os.path.basename(original_name or fileobj.name or '')
+    return {
+        'size': size,
+        'checksum': checksum,
+        'content_type': guess_content_type(original_name, declared_type),
+        'original_name': original_name[:255],
+    }
+
+
+def check_upload_size(user, size):
+    """Reject ``size`` bytes for ``user`` up front: per-file limit, then quota."""
+    limit = settings.KANBAN_MAX_UPLOAD_SIZE
+    if size > limit:
+        raise UploadError(f'Files are limited to {limit} bytes.', 413)
+    quota = getattr(settings, 'KANBAN_USER_UPLOAD_QUOTA', None)
+    if quota is None:
+        return
+    used = Attachment.objects.filter(uploaded_by=user).aggregate(total=Sum('size'))['total'] or 0
+    # Open sessions reserve their full declared size
+    used += Upload.objects.filter(user=user).aggregate(total=Sum('size'))['total'] or 0
+    if used + size > int(quota):
+        raise UploadError('Upload quota exceeded.', 413)
+
+
+def blob_name(checksum, original_name, prefix='blobs'):
+    extension = os.path.splitext(original_name)[1].lower()[:16]
+    return f'{prefix}/{checksum[:2]}/{checksum}{extension}'
+
+
+def store_blob(fileobj, metadata, prefix='blobs'):
+    """Save ``fileobj`` under its checksum unless an identical blob exists; returns the storage name."""
+    name = blob_name(metadata['checksum'], metadata['original_name'], prefix)
+    if default_storage.exists(name):
+        if default_storage.size(name) == metadata['size']:
+            return name
+        # Left truncated by an interrupted write; replace it
+        default_storage.delete(name)
+    fileobj.seek(0)
+    return default_storage.save(name, fileobj)
+
+
+def store_uploaded_file(uploaded_file, prefix='blobs'):
+    """Hash and store a file received in one request; returns (name, metadata)."""
+    metadata = file_metadata(uploaded_file, uploaded_file.name, getattr(uploaded_file, 'content_type', None))
+    return store_blob(uploaded_file, metadata, prefix), metadata
+
+
+def partial_path(upload):
+    return os.path.join(settings.KANBAN_UPLOAD_TEMP_DIR, f'{upload.pk}.part')
+
+
+def discard_partial(upload):
+    try:
+        os.remove(partial_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def append_chunk(upload, offset, stream, length):
+    """
+    Append ``length`` bytes read from ``stream`` at ``offset``. The caller
+    holds the Upload row lock. Bytes past the recorded offset (left by an
+    interrupted request) are discarded first, so a retried chunk is safe.
+    """
+    if offset != upload.offset:
+        raise UploadError(f'Expected offset {upload.offset}.', 409)
+    if length > settings.KANBAN_MAX_UPLOAD_CHUNK:
+        raise UploadError(f'Chunks are limited to {settings.KANBAN_MAX_UPLOAD_CHUNK} bytes.', 413)
+    if offset + length > upload.size:
+        raise UploadError('Chunk runs past the declared upload size.', 413)
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as out:
+        out.truncate(offset)
+        out.seek(offset)
+        while written < length:
+            data = stream.read(min(CHUNK_SIZE, length - written))
+            if not data:
+                break
+            out.write(data)
+            written += len(data)
+    if written != length:
+        raise UploadError('Chunk ended before Content-Length bytes were received.')
+    upload.offset += written
+    upload.updated_at = timezone.now()
+    upload.save(update_fields=['offset', 'updated_at'])
+
+
+def finish_upload(upload, prefix='blobs'):
+    """
+    Turn a complete Upload into a stored blob; returns (name, metadata).
+    The session row is deleted and its partial file removed on commit.
+    """
+    if not upload.complete:
+        raise UploadError('Upload is not complete.', 409)
+    with File(open(partial_path(upload), 'rb'), name=upload.filename) as fileobj:
+        metadata = file_metadata(fileobj, upload.filename, upload.content_type)
+        name = store_blob(fileobj, metadata, prefix)
+    upload.delete()
+    transaction.on_commit(lambda: discard_partial(upload))
+    return name, metadata
@@ -0,0 +1,118 @@
+from datetime import date
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+
+def _int_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be an integer.'})
+
+
+def _date_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be a date (YYYY-MM-DD).'})
+
+
+def _bool_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    lowered = value.lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValidationError({name: 'Must be true or false.'})
+
+
+def filter_lists(queryset, params, board_ids):
+    queryset = queryset.filter(board_id__in=board_ids)
+    board_id = _int_param(params, 'board')
+    if board_id is not None:
+        queryset = queryset.filter(board_id=board_id)
+    return queryset
+
+
+def filter_cards(queryset, params, board_ids):
+    queryset = queryset.filter(list__board_id__in=board_ids)
+    list_id = _int_param(params, 'list')
+    if list_id is not None:
+        queryset = queryset.filter(list_id=list_id)
+    board_id = _int_param(params, 'board')
+    if board_id is not None:
+        queryset = queryset.filter(list__board_id=board_id)
+    assignee_id = _int_param(params, 'assignee')
+    if assignee_id is not None:
+        queryset = queryset.filter(assignees=assignee_id)
+    label_id = _int_param(params, 'label')
+    if label_id is not None:
+        queryset = queryset.filter(labels=label_id)
+    due_after = _date_param(params, 'due_after')
+    if due_after is not None:
+        queryset = queryset.filter(due_date__gte=due_after)
+    due_before = _date_param(params, 'due_before')
+    if due_before is not None:
+        queryset = queryset.filter(due_date__lte=due_before)
+    return queryset
+
+
+def filter_labels(queryset, params, board_ids):
+    queryset = queryset.filter(Q(board_id__in=board_ids) | Q(board__isnull=True))
+    board_id = _int_param(params, 'board')
+    if board_id is not None:
+        queryset = queryset.filter(board_id=board_id)
+    return queryset
+
+
+def filter_checklists(queryset, params, board_ids):
+    queryset = queryset.filter(card__list__board_id__in=board_ids, card__archived_at=None)
+    card_id = _int_param(params, 'card')
+    if card_id is not None:
+        queryset = queryset.filter(card_id=card_id)
+    return queryset
+
+
+def filter_checklist_items(queryset, params, board_ids):
+    queryset = queryset.filter(checklist__card__list__board_id__in=board_ids, checklist__card__archived_at=None)
+    checklist_id = _int_param(params, 'checklist')
+    if checklist_id is not None:
+        queryset = queryset.filter(checklist_id=checklist_id)
+    card_id = _int_param(params, 'card')
+    if card_id is not None:
+        queryset = queryset.filter(checklist__card_id=card_id)
+    completed = _bool_param(params, 'completed')
+    if completed is not None:
+        queryset = queryset.filter(completed=completed)
+    return queryset
+
+
+def filter_comments(queryset, params, board_ids):
+    queryset = queryset.filter(card__list__board_id__in=board_ids, card__archived_at=None)
+    card_id = _int_param(params, 'card')
+    if card_id is not None:
+        queryset = queryset.filter(card_id=card_id)
+    author_id = _int_param(params, 'author')
+    if author_id is not None:
+        queryset = queryset.filter(author_id=author_id)
+    return queryset
+
+
+def filter_notifications(queryset, params):
+    read = _bool_param(params, 'read')
+    if read is not None:
+        queryset = queryset.filter(read=read)
+    kind = params.get('type')
+    if kind:
+        queryset = queryset.filter(type=kind)
+    return queryset
@@ -0,0 +1,102 @@
+"""
+Resized copies ("derivatives") of avatars and board backgrounds.
+
+Derivatives are generated by a task after upload and stored under names
+that are a pure function of the source and variant
+(``derivatives/<source name>/<variant>.webp``), so serializers can emit
+their URLs without a query. Until the task has run, ``public_media``
+redirects a missing derivative to its original.
+"""
+import logging
+from io import BytesIO
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from .tasks import task
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_PREFIX = 'derivatives/'
+# Avatars are cropped to squares, backgrounds are fitted inside the box
+AVATAR_VARIANTS = {'sm': (48, 48), 'md': (128, 128)}
+BACKGROUND_VARIANTS = {'thumb': (480, 270), 'large': (1920, 1080)}
+VARIANTS = {'avatar': AVATAR_VARIANTS, 'background': BACKGROUND_VARIANTS}
+FORMAT = 'webp' if features.check('webp') else 'jpeg'
+
+
+def derivative_name(source, variant):
+    return f'{DERIVATIVE_PREFIX}{source}/{variant}.{FORMAT}'
+
+
+def source_of(name):
+    """The source name a derivative name was built from, or None."""
+    if not name.startswith(DERIVATIVE_PREFIX) or '/' not in name[len(DERIVATIVE_PREFIX):]:
+        return None
+    return name[len(DERIVATIVE_PREFIX):].rsplit('/', 1)[0]
+
+
+def derivative_url(source, variant):
+    return settings.MEDIA_URL + derivative_name(source, variant)
+
+
+def avatar_url(user, variant='sm'):
+    avatar = getattr(user, 'avatar', None)
+    return derivative_url(avatar.name, variant) if avatar else ''
+
+
+def background_source(theme):
+    """Storage name of an uploaded background referenced by a board theme, if any."""
+    url = (theme or {}).get('backgroundImage') if isinstance(theme, dict) else None
+    if not url:
+        return None
+    path = urlparse(url).path
+    prefix = settings.MEDIA_URL + 'backgrounds/'
+    return path[len(settings.MEDIA_URL):] if path.startswith(prefix) else None
+
+
+def background_thumbnail_url(theme, variant='thumb'):
+    source = background_source(theme)
+    return derivative_url(source, variant) if source else None
+
+
+def _render(image, size, crop):
+    if crop:
+        resized = ImageOps.fit(image, size, Image.LANCZOS)
+    else:
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+    if FORMAT == 'jpeg':
+        resized = resized.convert('RGB')
+    elif resized.mode not in ('RGB', 'RGBA'):
+        resized = resized.convert('RGBA')
+    buffer = BytesIO()
+    resized.save(buffer, FORMAT.upper(), quality=82)
+    return ContentFile(buffer.getvalue())
+
+
+@task
+def generate_derivatives(source, kind):
+    variants = VARIANTS[kind]
+    missing = {
+        variant: size for variant, size in variants.items()
+        if not default_storage.exists(derivative_name(source, variant))
+    }
+    if not missing:
+        return
+    try:
+        with default_storage.open(source, 'rb') as fileobj:
+            image = Image.open(fileobj)
+            image.load()
+    except FileNotFoundError:
+        return
+    except (UnidentifiedImageError, OSError):
+        # Not an image Pillow can read; the original keeps being served
+        logger.warning('Cannot generate derivatives for %s', source)
+        return
+    image = ImageOps.exif_transpose(image)
+    for variant, size in missing.items():
+        default_storage.save(derivative_name(source, variant), _render(image, size, crop=kind == 'avatar'))
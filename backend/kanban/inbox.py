@@ -0,0 +1,150 @@
+"""
+The notification inbox: collapsed entries and a per-user unread counter.
+
+Events about a card (mentions, assignments, ...) carry a collapse key, and
+while a user still has an unread entry with that key a repeat bumps its
+``count``, message and timestamp instead of adding a row; a partial unique
+constraint keeps it to one unread entry per key.
+
+``NotificationCounter.unread`` counts unread entries. Every path that
+creates, reads or deletes notifications goes through this module and
+adjusts the counter by the number of rows it actually changed, so the
+badge is a primary-key lookup. ``recount`` rebuilds counters from the
+rows; the ``compact_notifications`` command runs it after pruning.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Notification, NotificationCounter
+
+
+def collapse_key(type, card_id):
+    return f'{type}:card:{card_id}' if card_id is not None else ''
+
+
+def _adjust(user_ids, delta):
+    if not user_ids or not delta:
+        return
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in user_ids], ignore_conflicts=True,
+    )
+    NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=Greatest(F('unread') + delta, 0))
+
+
+def _deliver(user_ids, message, type, board_id, card_id):
+    key = collapse_key(type, card_id)
+    collapsed = set()
+    if key:
+        pending = Notification.objects.filter(user_id__in=user_ids, collapse_key=key, read=False)
+        collapsed = set(pending.values_list('user_id', flat=True))
+        if collapsed:
+            pending.update(count=F('count') + 1, message=message, created_at=timezone.now(), board_id=board_id)
+    fresh = [user_id for user_id in user_ids if user_id not in collapsed]
+    Notification.objects.bulk_create([
+        Notification(
+            user_id=user_id, message=message, type=type, board_id=board_id, card_id=card_id, collapse_key=key,
+        )
+        for user_id in fresh
+    ])
+    _adjust(fresh, 1)
+
+
+def deliver(user_ids, message, type, board_id=None, card_id=None):
+    """Add a notification for each user, folding repeats into their unread entry."""
+    user_ids = sorted(set(user_ids))
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                return _deliver(user_ids, message, type, board_id, card_id)
+        except IntegrityError:
+            # A concurrent delivery created the entry first; the retry folds into it
+            if attempt:
+                raise
+
+
+def unread_count(user):
+    return NotificationCounter.objects.filter(user=user).values_list('unread', flat=True).first() or 0
+
+
+def mark_read(user, ids=None):
+    """Mark the user's notifications (all, or just ``ids``) read; returns the new unread count."""
+    pending = Notification.objects.filter(user=user, read=False)
+    if ids is not None:
+        pending = pending.filter(pk__in=ids)
+    with transaction.atomic():
+        changed = pending.update(read=True)
+        _adjust([user.pk], -changed)
+    return unread_count(user)
+
+
+def delete(user, ids):
+    """Delete the user's notifications ``ids``; returns the new unread count."""
+    with transaction.atomic():
+        rows = list(
+            Notification.objects.select_for_update().filter(user=user, pk__in=ids).values_list('pk', 'read')
+        )
+        Notification.objects.filter(pk__in=[pk for pk, _ in rows]).delete()
+        _adjust([user.pk], -sum(not read for _, read in rows))
+    return unread_count(user)
+
+
+def recount(user_ids=None):
+    """Rebuild counters from the notification rows; returns how many were corrected."""
+    counts = Notification.objects.filter(read=False)
+    counters = NotificationCounter.objects.all()
+    if user_ids is not None:
+        counts = counts.filter(user_id__in=user_ids)
+        counters = counters.filter(user_id__in=user_ids)
+    actual = dict(counts.order_by().values('user_id').annotate(n=Count('id')).values_list('user_id', 'n'))
+    stored = dict(counters.values_list('user_id', 'unread'))
+    wrong = {
+        user_id: actual.get(user_id, 0)
+        for user_id in actual.keys() | stored.keys()
+        if actual.get(user_id, 0) != stored.get(user_id)
+    }
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id, unread=n) for user_id, n in wrong.items()],
+        update_conflicts=True, unique_fields=['user'], update_fields=['unread'],
+    )
+    return len(wrong)
+
+
+def compact(read_days, unread_days, keep_per_user, batch_size=1000):
+    """
+    Delete read notifications older than ``read_days``, any older than
+    ``unread_days``, and everything beyond the newest ``keep_per_user``
+    per user. Deletes run in primary-key batches; returns the row count.
+    """
+    now = timezone.now()
+    expired = Notification.objects.filter(
+        Q(read=True, created_at__lt=now - timedelta(days=read_days))
+        | Q(created_at__lt=now - timedelta(days=unread_days))
+    )
+    deleted = _delete_in_batches(expired, batch_size)
+    heavy = (
+        Notification.objects.order_by().values('user_id').annotate(n=Count('id')).filter(n__gt=keep_per_user)
+        .values_list('user_id', flat=True)
+    )
+    for user_id in list(heavy):
+        cutoff = (
+            Notification.objects.filter(user_id=user_id).order_by('-created_at', '-id')
+            .values_list('created_at', 'id')[keep_per_user - 1]
+        )
+        older = Notification.objects.filter(user_id=user_id).filter(
+            Q(created_at__lt=cutoff[0]) | Q(created_at=cutoff[0], id__lt=cutoff[1])
+        )
+        deleted += _delete_in_batches(older, batch_size)
+    return deleted
+
+
+def _delete_in_batches(queryset, batch_size):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Notification.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from kanban.files import file_metadata
+from kanban.models import Attachment
+
+FIELDS = ['size', 'checksum', 'content_type', 'original_name']
+
+
+class Command(BaseCommand):
+    help = "Record size, checksum, content type and original name for attachments uploaded before they were stored."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        pending = Attachment.objects.filter(size__isnull=True).exclude(file='').only('id', 'file')
+        batch, updated, missing = [], 0, 0
+        for attachment in pending.iterator(chunk_size=options['batch_size']):
+            try:
+                with attachment.file.open('rb') as fileobj:
+                    metadata = file_metadata(fileobj, attachment.file.name)
+            except (FileNotFoundError, OSError):
+                missing += 1
+                continue
+            for field, value in metadata.items():
+                setattr(attachment, field, value)
+            batch.append(attachment)
+            if len(batch) >= options['batch_size']:
+                updated += Attachment.objects.bulk_update(batch, FIELDS)
+                batch = []
+        if batch:
+            updated += Attachment.objects.bulk_update(batch, FIELDS)
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} attachment(s); {missing} file(s) missing.'))
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from kanban.models import Board, BoardChange
+
+
+class Command(BaseCommand):
+    help = "Delete old board change log rows; clients behind the cut-off resync from a snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Keep changes newer than this many days.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        old = BoardChange.objects.filter(created_at__lt=cutoff)
+        floors = old.order_by().values('board').annotate(floor=Max('version'))
+        with transaction.atomic():
+            boards = [Board(pk=row['board'], compacted_version=row['floor']) for row in floors]
+            Board.objects.bulk_update(boards, ['compacted_version'], batch_size=500)
+            deleted, _ = old.delete()
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} change(s) across {len(boards)} board(s).'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from kanban.inbox import compact, recount
+
+
+class Command(BaseCommand):
+    help = "Apply notification retention (age limits and a per-user cap), then resync unread counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--read-days', type=int, default=30, help='Keep read notifications this many days.')
+        parser.add_argument('--unread-days', type=int, default=180, help='Keep unread notifications this many days.')
+        parser.add_argument('--keep', type=int, default=500, help='Keep at most this many notifications per user.')
+
+    def handle(self, *args, **options):
+        if options['keep'] < 1:
+            raise CommandError('--keep must be at least 1.')
+        deleted = compact(options['read_days'], options['unread_days'], options['keep'])
+        fixed = recount()
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} notification(s); corrected {fixed} unread counter(s).'))
@@ -0,0 +1,37 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from kanban.models import Board, BoardMembership
+from kanban.transfer import export_ndjson, export_zip
+
+
+class Command(BaseCommand):
+    help = "Export boards as NDJSON, or as a zip with their attachments, for backups and moves between servers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='File to write, or - for standard output.')
+        parser.add_argument('--board', type=int, action='append', dest='boards', help='Board id; repeatable.')
+        parser.add_argument('--user', help='Only boards this user (by email) is a member of.')
+        parser.add_argument('--zip', action='store_true', help='Write a zip with the attachment files.')
+
+    def handle(self, *args, **options):
+        board_ids = Board.objects.values('pk')
+        if options['user']:
+            user = get_user_model().objects.filter(email__iexact=options['user']).order_by('pk').first()
+            if user is None:
+                raise CommandError(f'No user with email {options["user"]}.')
+            board_ids = board_ids.filter(pk__in=BoardMembership.objects.filter(user=user).values('board_id'))
+        if options['boards']:
+            board_ids = board_ids.filter(pk__in=options['boards'])
+        chunks = export_zip(board_ids) if options['zip'] else export_ndjson(board_ids)
+
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f'Exported {board_ids.count()} board(s) to {options["output"]}.'))
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from kanban.images import background_source, generate_derivatives
+from kanban.models import Board
+from kanban.tasks import enqueue
+
+
+class Command(BaseCommand):
+    help = "Queue thumbnail generation for existing avatars and uploaded board backgrounds."
+
+    def handle(self, *args, **options):
+        avatars = get_user_model().objects.exclude(avatar='').exclude(avatar__isnull=True)
+        count = 0
+        for name in avatars.values_list('avatar', flat=True).iterator():
+            enqueue(generate_derivatives, name, 'avatar', idempotency_key=f'derivatives:{name}')
+            count += 1
+        backgrounds = {
+            background_source(theme) for theme in Board.objects.values_list('background_theme', flat=True).iterator()
+        }
+        for name in backgrounds - {None}:
+            enqueue(generate_derivatives, name, 'background', idempotency_key=f'derivatives:{name}')
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Queued derivatives for {count} image(s).'))
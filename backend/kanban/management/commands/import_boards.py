@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from kanban.transfer import TransferError, import_file
+
+
+class Command(BaseCommand):
+    help = "Import boards from an NDJSON or zip export made by export_boards or the export endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Export file to read.')
+        parser.add_argument('--user', required=True, help='Email of the user who will own the imported boards.')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(email__iexact=options['user']).order_by('pk').first()
+        if user is None:
+            raise CommandError(f'No user with email {options["user"]}.')
+        try:
+            with open(options['path'], 'rb') as source:
+                # Run by an operator: users are matched by email and attachments may
+                # point at files already in storage
+                board_ids = import_file(source, user, trusted=True)
+        except (OSError, TransferError) as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(board_ids)} board(s).'))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from kanban.files import discard_partial
+from kanban.models import Upload
+
+
+class Command(BaseCommand):
+    help = "Delete resumable uploads that haven't received a chunk recently, along with their partial files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Drop uploads idle for longer than this.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = list(Upload.objects.filter(updated_at__lt=cutoff).only('id'))
+        for upload in stale:
+            discard_partial(upload)
+        Upload.objects.filter(pk__in=[upload.pk for upload in stale]).delete()
+        self.stdout.write(self.style.SUCCESS(f'Removed {len(stale)} stale upload(s).'))
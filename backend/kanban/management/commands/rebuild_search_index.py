@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from kanban.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the board search index from cards, comments and checklist items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} entr{"y" if total == 1 else "ies"}.'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from kanban.tasks import run_pending
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (notifications, file cleanup, board purges)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the due tasks and exit.')
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+
+    def handle(self, *args, **options):
+        processed = 0
+        try:
+            while True:
+                count = run_pending(options['batch_size'])
+                processed += count
+                if options['once'] and count == 0:
+                    break
+                if count == 0:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} task(s).'))
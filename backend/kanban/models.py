@@ -1,9 +1,17 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models.fields import timezone
 
 User = settings.AUTH_USER_MODEL
 
+class ActiveManager(models.Manager):
+    """Default manager that hides archived rows (see kanban.archive); ``all_objects`` sees them too."""
+    def get_queryset(self):
+        return super().get_queryset().filter(archived_at=None)
+
 class Board(models.Model):
     created_by = models.ForeignKey(User, related_name="created_boards", on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
@@ -13,6 +21,15 @@ class Board(models.Model):
     members = models.ManyToManyField(User, through="BoardMembership", related_name="boards")
     created_at = models.DateTimeField(default=timezone.now)
     background_theme = models.JSONField(default=dict, blank=True)
+    # Bumped on every recorded change; see kanban.changes
+    version = models.PositiveBigIntegerField(default=0)
+    compacted_version = models.PositiveBigIntegerField(default=0)
+    # Templates are ordinary boards/cards that users copy (see kanban.copying)
+    is_template = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
 
 class BoardMembership(models.Model):
     ROLE_CHOICES = (
@@ -26,12 +43,24 @@ class BoardMembership(models.Model):
     added_at = models.DateTimeField(default=timezone.now)
     class Meta:
         unique_together = ('board', 'user')
+        indexes = [
+            models.Index(fields=['user', 'board'], name='kanban_member_user_board_idx'),
+        ]
 
 class List(models.Model):
     board = models.ForeignKey(Board, related_name='lists', on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     order = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['board', 'order', 'id'], name='kanban_list_board_order_idx'),
+        ]
 
 class Card(models.Model):
     list = models.ForeignKey('List', related_name='cards', on_delete=models.CASCADE)
@@ -41,25 +70,50 @@ class Card(models.Model):
     order = models.PositiveIntegerField(default=0)
     assignees = models.ManyToManyField(User, blank=True, related_name='assigned_cards')
     labels = models.ManyToManyField('Label', blank=True, related_name='cards')
+    is_template = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['list', 'order', 'id'], name='kanban_card_list_order_idx'),
+        ]
 
 class Checklist(models.Model):
     card = models.ForeignKey(Card, related_name='checklists', on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['card', 'created_at', 'id'], name='kanban_checklist_card_idx'),
+        ]
+
 class ChecklistItem(models.Model):
     checklist = models.ForeignKey(Checklist, related_name='items', on_delete=models.CASCADE)
     text = models.CharField(max_length=255)
     completed = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['checklist', 'created_at', 'id'], name='kanban_item_checklist_idx'),
+        ]
+
 class Comment(models.Model):
     card = models.ForeignKey(Card, related_name='comments', on_delete=models.CASCADE)
     author = models.ForeignKey(User, related_name="comments", on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['card', 'created_at', 'id'], name='kanban_comment_card_idx'),
+        ]
+
 class Label(models.Model):
     name = models.CharField(max_length=50)
     color = models.CharField(max_length=30, default="bg-blue-500")
@@ -74,6 +128,155 @@ class Attachment(models.Model):
     file = models.FileField(upload_to="attachments/%Y/%m/%d/")
     uploaded_by = models.ForeignKey(User, related_name="attachments", on_delete=models.CASCADE)
     uploaded_at = models.DateTimeField(default=timezone.now)
+    # Recorded at upload time (kanban.files.file_metadata) so reads never stat the storage
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    checksum = models.CharField(max_length=64, blank=True)
+    original_name = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['card', 'uploaded_at', 'id'], name='kanban_attachment_card_idx'),
+            models.Index(fields=['checksum'], name='kanban_attachment_checksum_idx'),
+        ]
+
+class BoardChange(models.Model):
+    ACTION_CHOICES = (
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    )
+    board = models.ForeignKey(Board, related_name='changes', on_delete=models.CASCADE)
+    version = models.PositiveBigIntegerField()
+    object_type = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'version'], name='kanban_change_board_version_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='kanban_change_created_idx'),
+        ]
+
+# Deferred side effects run by `manage.py run_tasks`; see kanban.tasks
+class Task(models.Model):
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    idempotency_key = models.CharField(max_length=200, null=True, blank=True, unique=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='kanban_task_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+class Upload(models.Model):
+    """A resumable upload session; chunks are appended until offset reaches size."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, related_name="uploads", on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='kanban_upload_updated_idx'),
+        ]
+
+    @property
+    def complete(self):
+        return self.offset >= self.size
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+class CopyJob(models.Model):
+    """A board/list/card copy too large to run inside the request; see kanban.copying."""
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+    KIND_CHOICES = (
+        ('board', 'Board'),
+        ('list', 'List'),
+        ('card', 'Card'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, related_name="copy_jobs", on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    source_id = models.BigIntegerField()
+    # Board a list is copied into / list a card is copied into
+    target_id = models.BigIntegerField(null=True, blank=True)
+    options = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    result_id = models.BigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"copy {self.kind} {self.source_id} ({self.status})"
+
+class SearchEntry(models.Model):
+    """
+    Plain text of one card, comment or checklist item, kept current by
+    kanban.search and indexed there with the database's full-text engine.
+    Rows cascade away with the object they describe.
+    """
+    board = models.ForeignKey(Board, related_name="+", on_delete=models.CASCADE)
+    card = models.ForeignKey(Card, related_name="+", on_delete=models.CASCADE)
+    comment = models.ForeignKey(Comment, related_name="+", on_delete=models.CASCADE, null=True, blank=True)
+    checklist_item = models.ForeignKey(ChecklistItem, related_name="+", on_delete=models.CASCADE, null=True, blank=True)
+    text = models.TextField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['board'], name='kanban_searchentry_board_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['card'], condition=models.Q(comment=None, checklist_item=None),
+                name='kanban_searchentry_card_uniq',
+            ),
+            models.UniqueConstraint(fields=['comment'], name='kanban_searchentry_comment_uniq'),
+            models.UniqueConstraint(fields=['checklist_item'], name='kanban_searchentry_item_uniq'),
+        ]
+
+    @property
+    def kind(self):
+        if self.comment_id:
+            return 'comment'
+        if self.checklist_item_id:
+            return 'checklist_item'
+        return 'card'
 
 # Notification model for user notifications
 class Notification(models.Model):
@@ -84,9 +287,39 @@ class Notification(models.Model):
     read = models.BooleanField(default=False)
     board = models.ForeignKey('Board', null=True, blank=True, on_delete=models.SET_NULL, related_name='notifications')
     card = models.ForeignKey('Card', null=True, blank=True, on_delete=models.SET_NULL, related_name='notifications')
+    # Repeated events with the same key fold into one unread entry (see kanban.inbox)
+    collapse_key = models.CharField(max_length=100, blank=True, default='')
+    count = models.PositiveIntegerField(default=1)
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'collapse_key'],
+                condition=models.Q(read=False) & ~models.Q(collapse_key=''),
+                name='kanban_notif_unread_collapse_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'read', '-created_at'], name='kanban_notif_user_read_idx'),
+            # Partial index for the unread badge/inbox; ignored on backends without partial indexes
+            models.Index(
+                fields=['user', '-created_at'],
+                condition=models.Q(read=False),
+                name='kanban_notif_unread_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.message[:30]}..."
+
+
+class NotificationCounter(models.Model):
+    """Denormalized unread count behind the notification badge, maintained by kanban.inbox."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, primary_key=True, on_delete=models.CASCADE, related_name='notification_counter',
+    )
+    unread = models.IntegerField(default=0)
 
     def __str__(self):
-        return f"{self.user} - {self.message[:30]}..."
\ No newline at end of file
+        return f"{self.user}: {self.unread} unread"
@@ -0,0 +1,50 @@
+"""
+Notification fan-out for mentions, assignments and board invites.
+
+Recipients are resolved with one ``username__in`` query and delivered
+to their inboxes in bulk (kanban.inbox, which collapses repeats and keeps
+the unread counters). Sending is queued on the task queue (kanban.tasks)
+so the request doesn't wait for it.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+
+from .inbox import deliver
+from .models import Card
+from .tasks import enqueue, task
+
+MENTION_RE = re.compile(r"@([\w\-_.]+)")
+
+
+def extract_mentions(text):
+    return set(MENTION_RE.findall(text or ""))
+
+
+@task
+def send_notifications(user_ids, message, type, board_id=None, card_id=None):
+    if card_id is not None and board_id is None:
+        board_id = Card.objects.filter(pk=card_id).values_list('list__board_id', flat=True).first()
+    deliver(user_ids, message, type, board_id=board_id, card_id=card_id)
+
+
+@task
+def send_mention_notifications(usernames, message, card_id, exclude_user_id=None):
+    users = get_user_model().objects.filter(username__in=usernames)
+    if exclude_user_id is not None:
+        users = users.exclude(pk=exclude_user_id)
+    user_ids = list(users.values_list('pk', flat=True))
+    if user_ids:
+        send_notifications(user_ids, message, 'mention', card_id=card_id)
+
+
+def notify_users(user_ids, message, type, board_id=None, card_id=None):
+    user_ids = sorted(set(user_ids))
+    if user_ids:
+        enqueue(send_notifications, user_ids, message, type, board_id, card_id)
+
+
+def notify_mentions(usernames, message, card_id, exclude_user_id=None):
+    usernames = sorted(usernames)
+    if usernames:
+        enqueue(send_mention_notifications, usernames, message, card_id, exclude_user_id)
@@ -0,0 +1,118 @@
+"""
+Sparse ordering keys for lists and cards.
+
+Rows are spaced ORDER_GAP apart so moving one row normally rewrites only
+that row: its new key is the midpoint of its new neighbours. When two
+neighbours are adjacent integers the whole sibling set is renumbered in a
+single bulk_update.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+ORDER_GAP = 1024
+
+
+class MoveError(Exception):
+    pass
+
+
+def _key_between(previous, following):
+    if previous is None and following is None:
+        return ORDER_GAP
+    if previous is None:
+        return following // 2 if following > 1 else None
+    if following is None:
+        return previous + ORDER_GAP
+    if following - previous > 1:
+        return (previous + following) // 2
+    return None
+
+
+def next_order(model, parent_field, parent_id):
+    """Key for appending a new row after the current last sibling."""
+    last = (
+        model.objects.filter(**{parent_field: parent_id})
+        .order_by('-order', '-id')
+        .values_list('order', flat=True)
+        .first()
+    )
+    return ORDER_GAP if last is None else last + ORDER_GAP
+
+
+def _neighbours(siblings, after_id=None, position=None):
+    if position is not None:
+        if position < 0:
+            raise MoveError('position must be zero or greater.')
+        if position == 0:
+            following = siblings.values_list('order', flat=True)[:1]
+            return None, next(iter(following), None)
+        window = list(siblings.values_list('order', flat=True)[position - 1:position + 1])
+        if not window:
+            # Past the end: append after the last sibling
+            last = siblings.reverse().values_list('order', flat=True)[:1]
+            return next(iter(last), None), None
+        return window[0], window[1] if len(window) > 1 else None
+    if after_id is None:
+        following = siblings.values_list('order', flat=True)[:1]
+        return None, next(iter(following), None)
+    anchor = siblings.filter(pk=after_id).values_list('order', flat=True).first()
+    if anchor is None:
+        raise MoveError(f'after={after_id} is not in the target.')
+    following = siblings.filter(Q(order__gt=anchor) | Q(order=anchor, pk__gt=after_id))
+    following = following.values_list('order', flat=True)[:1]
+    return anchor, next(iter(following), None)
+
+
+def _rebalance(model, parent_field, parent_id, obj, after_id=None, position=None):
+    siblings = list(
+        model.objects.filter(**{parent_field: parent_id}).exclude(pk=obj.pk).order_by('order', 'id')
+    )
+    if position is not None:
+        index = min(position, len(siblings))
+    elif after_id is None:
+        index = 0
+    else:
+        index = next(i for i, sibling in enumerate(siblings) if sibling.pk == after_id) + 1
+    siblings.insert(index, obj)
+    setattr(obj, parent_field, parent_id)
+    for number, row in enumerate(siblings, start=1):
+        row.order = number * ORDER_GAP
+    model.objects.bulk_update(siblings, ['order', parent_field])
+    return siblings
+
+
+def move(model, obj, parent_field, parent_id, after_id=None, position=None):
+    """
+    Move ``obj`` under ``parent_id`` (``parent_field`` is e.g. 'list_id'),
+    either right after sibling ``after_id`` (None = first) or to the
+    zero-based ``position``. Returns the rows whose key changed.
+    Callers are expected to run inside a transaction.
+    """
+    siblings = model.objects.filter(**{parent_field: parent_id}).exclude(pk=obj.pk).order_by('order', 'id')
+    previous, following = _neighbours(siblings, after_id=after_id, position=position)
+    key = _key_between(previous, following)
+    if key is None:
+        return _rebalance(model, parent_field, parent_id, obj, after_id=after_id, position=position)
+    obj.order = key
+    setattr(obj, parent_field, parent_id)
+    obj.save(update_fields=['order', parent_field])
+    return [obj]
+
+
+def apply_moves(model, parent_model, parent_field, moves, objects, parents):
+    """
+    Apply a batch of moves atomically. ``objects`` and ``parents`` map ids
+    to the already-authorised rows; parents are locked for the duration so
+    concurrent moves into the same list/board serialise.
+    """
+    changed = {}
+    with transaction.atomic():
+        list(parent_model.objects.select_for_update().filter(pk__in=parents).order_by('pk'))
+        for move_data in moves:
+            obj = objects[move_data['id']]
+            for row in move(
+                model, obj, parent_field, move_data['parent'],
+                after_id=move_data.get('after'), position=move_data.get('position'),
+            ):
+                changed[row.pk] = row
+    return list(changed.values())
@@ -0,0 +1,87 @@
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Board, BoardMembership, List, Card, Checklist, ChecklistItem, Comment, Label, Attachment
+
+
+def card_tree_queryset():
+    # Everything CardSerializer touches, loaded in one query per relation
+    return Card.objects.order_by('order', 'id').prefetch_related(
+        'assignees',
+        'labels',
+        Prefetch(
+            'checklists',
+            queryset=Checklist.objects.order_by('created_at', 'id').prefetch_related(
+                Prefetch('items', queryset=ChecklistItem.objects.order_by('created_at', 'id'))
+            ),
+        ),
+        Prefetch('comments', queryset=Comment.objects.select_related('author').order_by('created_at', 'id')),
+        Prefetch('attachments', queryset=Attachment.objects.select_related('uploaded_by').order_by('uploaded_at', 'id')),
+    )
+
+
+def list_tree_queryset():
+    return List.objects.order_by('order', 'id').prefetch_related(
+        Prefetch('cards', queryset=card_tree_queryset())
+    )
+
+
+def board_tree_queryset():
+    """
+    Boards with their full list/card tree prefetched, so BoardSerializer
+    renders in a fixed number of queries regardless of board size.
+    """
+    return Board.objects.prefetch_related(
+        Prefetch('lists', queryset=list_tree_queryset()),
+        Prefetch('boardmembership_set', queryset=BoardMembership.objects.select_related('user')),
+    )
+
+
+def _count_subquery(queryset, board_field):
+    counts = (
+        queryset.filter(**{board_field: OuterRef('pk')})
+        .order_by()
+        .values(board_field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def board_summary_queryset(boards=None):
+    """
+    Boards (default: all unarchived ones) annotated with list/card/done/overdue
+    counts for the board index. "Done" cards sit in a list titled like
+    "Done" or "Completed". Counts are correlated subqueries so the
+    listing stays one query per relation no matter how many cards each
+    board holds.
+    """
+    today = timezone.localdate()
+    boards = Board.objects.all() if boards is None else boards
+    return boards.annotate(
+        list_count=_count_subquery(List.objects.all(), 'board'),
+        card_count=_count_subquery(Card.objects.all(), 'list__board'),
+        done_count=_count_subquery(
+            Card.objects.filter(Q(list__title__icontains='done') | Q(list__title__icontains='completed')),
+            'list__board',
+        ),
+        overdue_count=_count_subquery(Card.objects.filter(due_date__lt=today), 'list__board'),
+    ).prefetch_related(
+        Prefetch('boardmembership_set', queryset=BoardMembership.objects.select_related('user')),
+    )
+
+
+def board_id_for(obj):
+    """Resolve the board an object belongs to with at most one indexed lookup."""
+    if isinstance(obj, Board):
+        return obj.pk
+    if isinstance(obj, (List, Label)):
+        return obj.board_id
+    if isinstance(obj, Card):
+        return List.objects.filter(pk=obj.list_id).values_list('board_id', flat=True).first()
+    if isinstance(obj, (Checklist, Comment, Attachment)):
+        return Card.objects.filter(pk=obj.card_id).values_list('list__board_id', flat=True).first()
+    if isinstance(obj, ChecklistItem):
+        return Checklist.objects.filter(pk=obj.checklist_id).values_list('card__list__board_id', flat=True).first()
+    raise TypeError(f'No board for {type(obj).__name__}')
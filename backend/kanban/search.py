@@ -0,0 +1,301 @@
+"""
+Full-text search over cards, comments and checklist items.
+
+Each searchable object has a ``SearchEntry`` row holding its plain text
+(a card's entry also carries its label names). Entries are written from
+``post_save``/``m2m_changed`` receivers as objects change and disappear
+by cascade with their object, so Django keeps its fast-delete path.
+Code that writes rows with bulk_create/bulk_update indexes them itself
+(``index_created``, ``reindex_cards``, ``reindex_checklist_items``).
+Archived cards have no entries (kanban.archive drops them and rebuilds
+them on restore) and archived boards are outside every user's scope.
+
+The entry text is indexed with the database's own engine, set up from
+``post_migrate``: a GIN index on ``to_tsvector('simple', text)`` on
+PostgreSQL, an external-content FTS5 table maintained by triggers on
+SQLite. Other databases fall back to an unindexed ``icontains`` scan.
+"""
+import re
+from html import escape
+
+from django.db import connection
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+from django.utils.html import strip_tags
+
+from .models import Board, BoardMembership, Card, Checklist, ChecklistItem, Comment, Label, SearchEntry
+from .queries import board_id_for
+
+FTS_TABLE = 'kanban_searchentry_fts'
+MAX_TERMS = 8
+# Markers placed around matches by the database, swapped for <mark> after escaping
+HIGHLIGHT_START, HIGHLIGHT_END = '\x02', '\x03'
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    return TERM_RE.findall(query.lower())[:MAX_TERMS]
+
+
+# ------------------- INDEX MAINTENANCE -------------------
+def card_text(card, label_names=None):
+    if label_names is None:
+        label_names = card.labels.values_list('name', flat=True)
+    return '\n'.join(filter(None, [card.title, strip_tags(card.description or ''), ' '.join(label_names)]))
+
+
+def index_card(card, board_id=None):
+    SearchEntry.objects.update_or_create(
+        card=card, comment=None, checklist_item=None,
+        defaults={'board_id': board_id or board_id_for(card), 'text': card_text(card)},
+    )
+
+
+def reindex_cards(card_ids):
+    cards = Card.objects.filter(pk__in=card_ids).select_related('list').prefetch_related('labels')
+    for card in cards:
+        label_names = [label.name for label in card.labels.all()]
+        SearchEntry.objects.update_or_create(
+            card=card, comment=None, checklist_item=None,
+            defaults={'board_id': card.list.board_id, 'text': card_text(card, label_names)},
+        )
+
+
+def _new_entry(obj, board_id, label_names):
+    if isinstance(obj, Card):
+        return SearchEntry(board_id=board_id, card=obj, text=card_text(obj, label_names.get(obj.pk, [])))
+    if isinstance(obj, Comment):
+        return SearchEntry(board_id=board_id, card_id=obj.card_id, comment=obj, text=strip_tags(obj.text))
+    return SearchEntry(board_id=board_id, card_id=obj.checklist.card_id, checklist_item=obj, text=obj.text)
+
+
+def index_created(rows, label_names=None):
+    """
+    Index cards, comments and checklist items inserted with bulk_create,
+    which sends no post_save. ``rows`` are (object, board id) pairs; items
+    need their checklist attached. ``label_names`` maps card ids to the
+    names of labels already set on them (cards have none by default).
+    """
+    label_names = label_names or {}
+    SearchEntry.objects.bulk_create([_new_entry(obj, board_id, label_names) for obj, board_id in rows])
+
+
+def reindex_checklist_items(items):
+    """Refresh the entries of checklist items changed with bulk_update."""
+    texts = {item.pk: item.text for item in items}
+    entries = list(SearchEntry.objects.filter(checklist_item_id__in=texts))
+    for entry in entries:
+        entry.text = texts[entry.checklist_item_id]
+    SearchEntry.objects.bulk_update(entries, ['text'])
+
+
+@receiver(post_save, sender=Card)
+def _index_card(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    fields = None if update_fields is None else set(update_fields)
+    text_changed = fields is None or bool(fields & {'title', 'description'})
+    moved = fields is None or bool(fields & {'list', 'list_id'})
+    if not (text_changed or moved):
+        # Reorders within a list leave the index alone
+        return
+    board_id = board_id_for(instance)
+    if text_changed:
+        index_card(instance, board_id)
+    if moved:
+        # Comments and checklist items follow the card to another board
+        SearchEntry.objects.filter(card=instance).exclude(board_id=board_id).update(board_id=board_id)
+
+
+@receiver(post_save, sender=Comment)
+def _index_comment(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    SearchEntry.objects.update_or_create(
+        comment=instance,
+        defaults={'board_id': board_id_for(instance), 'card_id': instance.card_id, 'text': strip_tags(instance.text)},
+    )
+
+
+@receiver(post_save, sender=ChecklistItem)
+def _index_checklist_item(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    card_id, board_id = Checklist.objects.filter(pk=instance.checklist_id).values_list(
+        'card_id', 'card__list__board_id'
+    ).get()
+    SearchEntry.objects.update_or_create(
+        checklist_item=instance, defaults={'board_id': board_id, 'card_id': card_id, 'text': instance.text},
+    )
+
+
+@receiver(post_save, sender=Label)
+def _index_label_rename(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        reindex_cards(list(instance.cards.values_list('pk', flat=True)))
+
+
+@receiver(m2m_changed, sender=Card.labels.through)
+def _index_card_labels(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        index_card(instance)
+    elif pk_set:
+        reindex_cards(pk_set)
+
+
+def rebuild(batch_size=500, cards=None):
+    """
+    Recreate entries from the source tables, for every card or just the
+    ``cards`` queryset (archived cards get none); returns the number written.
+    """
+    scope = {} if cards is None else {'card__in': cards}
+    item_scope = {} if cards is None else {'checklist__card__in': cards}
+
+    def entries():
+        card_rows = Card.objects.all() if cards is None else cards
+        card_rows = card_rows.select_related('list').prefetch_related('labels').order_by('pk')
+        for card in card_rows.iterator(chunk_size=batch_size):
+            text = card_text(card, [label.name for label in card.labels.all()])
+            yield SearchEntry(board_id=card.list.board_id, card=card, text=text)
+        comments = Comment.objects.filter(card__archived_at=None, **scope).select_related('card__list').order_by('pk')
+        for comment in comments.iterator(chunk_size=batch_size):
+            yield SearchEntry(
+                board_id=comment.card.list.board_id, card_id=comment.card_id, comment=comment,
+                text=strip_tags(comment.text),
+            )
+        items = ChecklistItem.objects.filter(checklist__card__archived_at=None, **item_scope)
+        for item in items.select_related('checklist__card__list').order_by('pk').iterator(chunk_size=batch_size):
+            card = item.checklist.card
+            yield SearchEntry(board_id=card.list.board_id, card=card, checklist_item=item, text=item.text)
+
+    SearchEntry.objects.filter(**scope).delete()
+    total, batch = 0, []
+    for entry in entries():
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            total += len(SearchEntry.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        total += len(SearchEntry.objects.bulk_create(batch))
+    return total
+
+
+# ------------------- VENDOR INDEXES -------------------
+def _postgres_statements(table, quote):
+    yield (
+        f'CREATE INDEX IF NOT EXISTS {table}_text_fts '
+        f"ON {quote(table)} USING gin (to_tsvector('simple', {quote('text')}))"
+    )
+
+
+def _sqlite_statements(table):
+    yield f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(text, content='{table}', content_rowid='id')"
+    yield (
+        f'CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END'
+    )
+    yield (
+        f'CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN '
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); END"
+    )
+    yield (
+        f'CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF text ON {table} BEGIN '
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); "
+        f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END'
+    )
+    yield f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+
+def install_search_index(using='default', **kwargs):
+    from django.db import connections
+
+    db = connections[using]
+    table = SearchEntry._meta.db_table
+    with db.cursor() as cursor:
+        if table not in db.introspection.table_names(cursor):
+            return
+        if db.vendor == 'postgresql':
+            for statement in _postgres_statements(table, db.ops.quote_name):
+                cursor.execute(statement)
+        elif db.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            if cursor.fetchone() is None:
+                for statement in _sqlite_statements(table):
+                    cursor.execute(statement)
+
+
+# ------------------- QUERIES -------------------
+def _scope(board_id):
+    membership, board = BoardMembership._meta.db_table, Board._meta.db_table
+    sql = (
+        f'e.board_id IN (SELECT m.board_id FROM {membership} m JOIN {board} b ON b.id = m.board_id '
+        f'WHERE m.user_id = %s AND b.archived_at IS NULL)'
+    )
+    if board_id is not None:
+        sql += ' AND e.board_id = %s'
+    return sql
+
+
+def _ranked_ids(terms, user_id, board_id, limit, offset):
+    """[(entry id, highlighted snippet)] best match first."""
+    table = SearchEntry._meta.db_table
+    params = [user_id] + ([board_id] if board_id is not None else [])
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        sql = (
+            f"SELECT e.id, snippet({FTS_TABLE}, 0, %s, %s, '…', 16) FROM {FTS_TABLE} "
+            f'JOIN {table} e ON e.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND {_scope(board_id)} ORDER BY {FTS_TABLE}.rank, e.id LIMIT %s OFFSET %s'
+        )
+        params = [HIGHLIGHT_START, HIGHLIGHT_END, match] + params + [limit, offset]
+    elif connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        options = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=2, MaxWords=16, MinWords=4'
+        sql = (
+            f"SELECT e.id, ts_headline('simple', e.text, q, %s) FROM {table} e, to_tsquery('simple', %s) q "
+            f"WHERE to_tsvector('simple', e.text) @@ q AND {_scope(board_id)} "
+            f"ORDER BY ts_rank(to_tsvector('simple', e.text), q) DESC, e.id LIMIT %s OFFSET %s"
+        )
+        params = [options, tsquery] + params + [limit, offset]
+    else:
+        condition = ' AND '.join('LOWER(e.text) LIKE %s' for _ in terms)
+        sql = f'SELECT e.id, e.text FROM {table} e WHERE {condition} AND {_scope(board_id)} ORDER BY e.id LIMIT %s OFFSET %s'
+        params = [f'%{term}%' for term in terms] + params + [limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def highlight_html(snippet):
+    """Escape a snippet and turn the database's match markers into <mark> tags."""
+    return escape(snippet).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+
+def search(user, query, board_id=None, limit=20, offset=0):
+    """
+    Ranked hits for ``query`` on the user's boards (optionally one board):
+    ``[{'type', 'id', 'board', 'card': {'id', 'title', 'list'}, 'highlight'}]``.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    ranked = _ranked_ids(terms, user.pk, board_id, limit, offset)
+    entries = SearchEntry.objects.select_related('card').only(
+        'id', 'board_id', 'comment_id', 'checklist_item_id', 'card__id', 'card__title', 'card__list_id',
+    ).in_bulk([entry_id for entry_id, _ in ranked])
+    hits = []
+    for entry_id, snippet in ranked:
+        entry = entries.get(entry_id)
+        if entry is None:
+            continue
+        hits.append({
+            'type': entry.kind,
+            'id': entry.comment_id or entry.checklist_item_id or entry.card_id,
+            'board': entry.board_id,
+            'card': {'id': entry.card_id, 'title': entry.card.title, 'list': entry.card.list_id},
+            'highlight': highlight_html(snippet),
+        })
+    return hits
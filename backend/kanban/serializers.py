@@ -1,7 +1,14 @@
 from rest_framework import serializers
-from .models import Board, List, Card, Checklist, ChecklistItem, Comment, Label, BoardMembership, Attachment
+from .models import Board, List, Card, Checklist, ChecklistItem, Comment, Label, BoardMembership, Attachment, Upload, CopyJob
 from django.contrib.auth import get_user_model
+from django.urls import reverse
 from accounts.serializers import UserProfileSerializer
+from .downloads import download_token
+from .files import store_uploaded_file
+from .images import avatar_url, background_thumbnail_url
+from .notifications import extract_mentions, notify_mentions, notify_users
+from .ordering import next_order
+from .search import index_created
 
 class ChecklistItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -19,8 +26,12 @@ class ChecklistSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
         checklist = Checklist.objects.create(**validated_data)
-        for item_data in items_data:
-            ChecklistItem.objects.create(checklist=checklist, **item_data)
+        if items_data:
+            items = ChecklistItem.objects.bulk_create(
+                [ChecklistItem(checklist=checklist, **item_data) for item_data in items_data]
+            )
+            board_id = checklist.card.list.board_id
+            index_created([(item, board_id) for item in items])
         return checklist
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -33,85 +44,96 @@ class CommentSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         comment = Comment.objects.create(**validated_data)
         # --- Mention notification logic ---
-        import re
-        from django.contrib.auth import get_user_model
-        from .models import Notification
-        User = get_user_model()
-        mentioned_usernames = set(re.findall(r"@([\w\-_.]+)", comment.text))
-        for username in mentioned_usernames:
-            try:
-                user = User.objects.get(username=username)
-                if user != comment.author:
-                    Notification.objects.create(
-                        user=user,
-                        message=f'You were mentioned in a comment on card "{comment.card.title}"',
-                        type='mention',
-                        card=comment.card,
-                        board=comment.card.list.board
-                    )
-            except User.DoesNotExist:
-                continue
+        notify_mentions(
+            extract_mentions(comment.text),
+            f'You were mentioned in a comment on card "{comment.card.title}"',
+            card_id=comment.card_id,
+            exclude_user_id=comment.author_id,
+        )
         return comment
 
 class AttachmentSerializer(serializers.ModelSerializer):
     uploaded_by = serializers.StringRelatedField(read_only=True)
-    file_size = serializers.SerializerMethodField()
+    file_size = serializers.IntegerField(source='size', read_only=True)
     uploaded_at_formatted = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+    download_token = serializers.SerializerMethodField()
 
     class Meta:
         model = Attachment
-        fields = ["id", "card", "file", "uploaded_by", "uploaded_at", "file_size", "uploaded_at_formatted"]
-        read_only_fields = ["id", "uploaded_by", "uploaded_at"]
+        fields = [
+            "id", "card", "file", "uploaded_by", "uploaded_at", "file_size", "uploaded_at_formatted",
+            "content_type", "checksum", "original_name", "download_url", "download_token",
+        ]
+        read_only_fields = ["id", "uploaded_by", "uploaded_at", "content_type", "checksum", "original_name"]
 
-    def get_file_size(self, obj):
-        try:
-            if obj.file and hasattr(obj.file, 'size'):
-                return obj.file.size
-            return None
-        except:
+    def create(self, validated_data):
+        name, metadata = store_uploaded_file(validated_data['file'])
+        validated_data.update(metadata, file=name)
+        return super().create(validated_data)
+
+    def get_download_url(self, obj):
+        return reverse('attachment-download', args=[obj.pk])
+
+    def get_download_token(self, obj):
+        # Per user, so only in per-request responses (never in cached board trees)
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
             return None
+        return download_token(obj.pk, request.user.pk)
 
     def get_uploaded_at_formatted(self, obj):
         if obj.uploaded_at:
             return obj.uploaded_at.strftime("%Y-%m-%d %H:%M")
         return None
 
+class UploadSerializer(serializers.ModelSerializer):
+    complete = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Upload
+        fields = ["id", "filename", "content_type", "size", "offset", "complete", "created_at"]
+        read_only_fields = ["id", "offset", "created_at"]
+        extra_kwargs = {"size": {"min_value": 1}}
+
 class CardSerializer(serializers.ModelSerializer):
     checklists = ChecklistSerializer(many=True, required=False)
     comments = CommentSerializer(many=True, required=False)
     assignees = serializers.PrimaryKeyRelatedField(many=True, queryset=get_user_model().objects.all(), required=False)
     labels = serializers.PrimaryKeyRelatedField(many=True, queryset=Label.objects.all(), required=False)
-    attachments = serializers.SerializerMethodField()
+    attachments = AttachmentSerializer(many=True, read_only=True)
 
     class Meta:
         model = Card
         fields = [
             "id", "list", "title", "description", "due_date", "order",
-            "assignees", "labels", "created_at", "checklists", "comments", "attachments"
+            "assignees", "labels", "is_template", "created_at", "checklists", "comments", "attachments"
         ]
         read_only_fields = ["id", "created_at"]
 
-    def get_attachments(self, obj):
-        try:
-            return AttachmentSerializer(obj.attachments.all(), many=True).data
-        except:
-            return []
-
     def create(self, validated_data):
         checklists_data = validated_data.pop('checklists', [])
         comments_data = validated_data.pop('comments', [])
         assignees = validated_data.pop('assignees', [])
         labels = validated_data.pop('labels', [])
+        if 'order' not in validated_data:
+            validated_data['order'] = next_order(Card, 'list_id', validated_data['list'].pk)
         card = Card.objects.create(**validated_data)
         card.assignees.set(assignees)
         card.labels.set(labels)
-        for checklist_data in checklists_data:
-            items_data = checklist_data.pop('items', [])
-            checklist = Checklist.objects.create(card=card, **checklist_data)
-            for item_data in items_data:
-                ChecklistItem.objects.create(checklist=checklist, **item_data)
-        for comment_data in comments_data:
-            Comment.objects.create(card=card, **comment_data)
+        # Nested rows go in with one INSERT per table
+        items_data = [checklist_data.pop('items', []) for checklist_data in checklists_data]
+        checklists = Checklist.objects.bulk_create(
+            [Checklist(card=card, **checklist_data) for checklist_data in checklists_data]
+        )
+        items = ChecklistItem.objects.bulk_create([
+            ChecklistItem(checklist=checklist, **item_data)
+            for checklist, checklist_items in zip(checklists, items_data)
+            for item_data in checklist_items
+        ])
+        comments = Comment.objects.bulk_create([Comment(card=card, **comment_data) for comment_data in comments_data])
+        board_id = validated_data['list'].board_id
+        index_created([(row, board_id) for row in [*items, *comments]])
         return card
 
     def update(self, instance, validated_data):
@@ -121,27 +143,13 @@ class CardSerializer(serializers.ModelSerializer):
         labels = validated_data.pop('labels', None)
 
         # --- Mention notification logic for card description ---
-        import re
-        from django.contrib.auth import get_user_model
-        from .models import Notification
-        User = get_user_model()
         old_description = instance.description or ""
         new_description = validated_data.get('description', old_description)
-        old_mentions = set(re.findall(r"@([\w\-_.]+)", old_description))
-        new_mentions = set(re.findall(r"@([\w\-_.]+)", new_description))
-        added_mentions = new_mentions - old_mentions
-        for username in added_mentions:
-            try:
-                user = User.objects.get(username=username)
-                Notification.objects.create(
-                    user=user,
-                    message=f'You were mentioned in the description of card "{instance.title}"',
-                    type='mention',
-                    card=instance,
-                    board=instance.list.board
-                )
-            except User.DoesNotExist:
-                continue
+        notify_mentions(
+            extract_mentions(new_description) - extract_mentions(old_description),
+            f'You were mentioned in the description of card "{instance.title}"',
+            card_id=instance.pk,
+        )
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -149,18 +157,14 @@ class CardSerializer(serializers.ModelSerializer):
 
         # --- Notification logic for new assignees ---
         if assignees is not None:
-            old_assignees = set(instance.assignees.all())
+            old_assignee_ids = set(instance.assignees.values_list('pk', flat=True))
             instance.assignees.set(assignees)
-            new_assignees = set(instance.assignees.all())
-            added_assignees = new_assignees - old_assignees
-            for user in added_assignees:
-                Notification.objects.create(
-                    user=user,
-                    message=f'You were assigned a new card: "{instance.title}"',
-                    type='card_assigned',
-                    card=instance,
-                    board=instance.list.board
-                )
+            notify_users(
+                {user.pk for user in assignees} - old_assignee_ids,
+                f'You were assigned a new card: "{instance.title}"',
+                'card_assigned',
+                card_id=instance.pk,
+            )
         if labels is not None:
             instance.labels.set(labels)
 
@@ -174,28 +178,117 @@ class ListSerializer(serializers.ModelSerializer):
         model = List
         fields = ["id", "board", "title", "order", "created_at", "cards"]
 
+    def create(self, validated_data):
+        if 'order' not in validated_data:
+            validated_data['order'] = next_order(List, 'board_id', validated_data['board'].pk)
+        return super().create(validated_data)
+
+# Batch payloads (kanban.batch): plain fields only, parents are resolved by the batch
+class CardFieldsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Card
+        fields = ["title", "description", "due_date", "order"]
+
+class ChecklistFieldsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Checklist
+        fields = ["title"]
+
+class ChecklistItemFieldsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChecklistItem
+        fields = ["text", "completed"]
+
+class CopySerializer(serializers.Serializer):
+    """Options for copying a board, list or card (kanban.copying)."""
+    title = serializers.CharField(max_length=255, required=False)
+    attachments = serializers.BooleanField(default=False)
+    template = serializers.BooleanField(default=False)
+    # Where a list/card copy goes; defaults to the source's own board/list
+    board = serializers.IntegerField(required=False)
+    list = serializers.IntegerField(required=False)
+
+class CopyJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CopyJob
+        fields = ["id", "kind", "source_id", "target_id", "status", "result_id", "error", "progress", "created_at", "finished_at"]
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        from .copying import copy_progress
+        return copy_progress(obj.pk)
+
+class MoveSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    after = serializers.IntegerField(required=False, allow_null=True)
+    position = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        if 'after' in attrs and 'position' in attrs:
+            raise serializers.ValidationError("Pass either 'after' or 'position', not both.")
+        return attrs
+
+class CardMoveSerializer(MoveSerializer):
+    list = serializers.IntegerField()
+
 class BoardSerializer(serializers.ModelSerializer):
     lists = serializers.SerializerMethodField()
     created_by = serializers.PrimaryKeyRelatedField(read_only=True)
     members = serializers.SerializerMethodField()
     icon = serializers.CharField(required=False, allow_blank=True, allow_null=True, default="")
+    background_thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = Board
         fields = [
             "id", "title", "description", "color", "icon",
-            "created_by", "created_at", "lists", "members", "background_theme"
+            "created_by", "created_at", "lists", "members", "background_theme", "background_thumbnail", "version",
+            "is_template",
         ]
+        read_only_fields = ["version"]
+
+    def get_background_thumbnail(self, obj):
+        return background_thumbnail_url(obj.background_theme)
 
     def get_lists(self, obj):
         from .serializers import ListSerializer  # avoid circular import if needed
-        lists = obj.lists.all().order_by('order')
+        # Boards loaded through board_tree_queryset() already carry ordered lists
+        lists = obj.lists.all()
+        if 'lists' not in getattr(obj, '_prefetched_objects_cache', {}):
+            lists = lists.order_by('order', 'id')
         return ListSerializer(lists, many=True).data
 
     def get_members(self, obj):
-        memberships = BoardMembership.objects.filter(board=obj)
+        memberships = obj.boardmembership_set.all()
+        if 'boardmembership_set' not in getattr(obj, '_prefetched_objects_cache', {}):
+            memberships = memberships.select_related('user')
         return BoardMemberSerializer(memberships, many=True).data
 
+class BoardSummarySerializer(serializers.ModelSerializer):
+    members = serializers.SerializerMethodField()
+    list_count = serializers.IntegerField(read_only=True)
+    card_count = serializers.IntegerField(read_only=True)
+    done_count = serializers.IntegerField(read_only=True)
+    overdue_count = serializers.IntegerField(read_only=True)
+    background_thumbnail = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Board
+        fields = [
+            "id", "title", "description", "color", "icon", "background_theme", "background_thumbnail", "created_by",
+            "created_at", "members", "list_count", "card_count", "done_count", "overdue_count", "is_template",
+            "archived_at",
+        ]
+        read_only_fields = fields
+
+    def get_members(self, obj):
+        return BoardMemberSerializer(obj.boardmembership_set.all(), many=True).data
+
+    def get_background_thumbnail(self, obj):
+        return background_thumbnail_url(obj.background_theme)
+
 class LabelSerializer(serializers.ModelSerializer):
     class Meta:
         model = Label
@@ -204,13 +297,17 @@ class LabelSerializer(serializers.ModelSerializer):
 class BoardMemberSerializer(serializers.ModelSerializer):
     first_name = serializers.SerializerMethodField()
     avatar = serializers.CharField(source='user.avatar', default="", read_only=True)
+    avatar_thumbnail = serializers.SerializerMethodField()
     email = serializers.CharField(source='user.email', default="", read_only=True)
     id = serializers.IntegerField(source='user.id', read_only=True)
     role = serializers.CharField(read_only=True)
 
     class Meta:
         model = BoardMembership
-        fields = ['id', 'role', 'first_name', 'avatar', 'email']
+        fields = ['id', 'role', 'first_name', 'avatar', 'avatar_thumbnail', 'email']
+
+    def get_avatar_thumbnail(self, obj):
+        return avatar_url(obj.user)
 
     def get_first_name(self, obj):
         return obj.user.first_name or obj.user.username or "No Name"
@@ -220,8 +317,6 @@ from .models import Notification
 from rest_framework import serializers
 
 class NotificationSerializer(serializers.ModelSerializer):
-    board_id = serializers.IntegerField(source='board.id', read_only=True)
-    card_id = serializers.IntegerField(source='card.id', read_only=True)
     class Meta:
         model = Notification
-        fields = '__all__'  # board and card are now included
+        exclude = ['collapse_key']
@@ -0,0 +1,155 @@
+"""
+A small database-backed task queue for side effects that shouldn't run
+inside the request (notifications, file cleanup, large deletes).
+
+Functions decorated with ``@task`` are queued with ``enqueue()`` and
+executed by ``python manage.py run_tasks``. Tasks are retried with
+exponential backoff up to ``max_attempts``; an ``idempotency_key``
+collapses duplicate submissions into one row.
+
+With ``KANBAN_TASKS_EAGER`` enabled (the default, so a plain deploy needs
+no extra process) tasks are still stored, and each one runs on a thread
+of the web process after the transaction commits, so the response doesn't
+wait for it; if the process dies first, ``run_tasks`` picks the row up.
+``KANBAN_TASKS_INLINE`` (tests only) instead runs them synchronously on
+commit without storing them.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+# How long a claimed task may run before another worker may retry it
+LEASE = timedelta(minutes=10)
+RETRY_BASE_SECONDS = 10
+
+
+def task(func):
+    name = f'{func.__module__}.{func.__qualname__}'
+    _registry[name] = func
+    func.task_name = name
+    return func
+
+
+def _is_eager():
+    return getattr(settings, 'KANBAN_TASKS_EAGER', True)
+
+
+def _is_inline():
+    return getattr(settings, 'KANBAN_TASKS_INLINE', False)
+
+
+def _run_eagerly(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Task %s failed', func.task_name)
+
+
+def _spawn(target, *args):
+    def run():
+        try:
+            target(*args)
+        finally:
+            connection.close()
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _run_in_background(pk):
+    now = timezone.now()
+    won = Task.objects.filter(pk=pk, status=Task.PENDING).update(
+        status=Task.RUNNING, locked_until=now + LEASE, updated_at=now,
+    )
+    if won:
+        execute(Task.objects.get(pk=pk))
+
+
+def enqueue(func, *args, idempotency_key=None, delay=None, max_attempts=3, **kwargs):
+    """
+    Queue ``func(*args, **kwargs)``; arguments must be JSON serialisable.
+    Returns the Task row (None with ``KANBAN_TASKS_INLINE``).
+    """
+    if _is_inline():
+        transaction.on_commit(lambda: _run_eagerly(func, args, kwargs))
+        return None
+    fields = {
+        'name': func.task_name,
+        'args': list(args),
+        'kwargs': kwargs,
+        'max_attempts': max_attempts,
+        'run_after': timezone.now() + (delay or timedelta()),
+    }
+    if idempotency_key is None:
+        task_row = Task.objects.create(**fields)
+    else:
+        try:
+            with transaction.atomic():
+                task_row = Task.objects.create(idempotency_key=idempotency_key, **fields)
+        except IntegrityError:
+            task_row = Task.objects.get(idempotency_key=idempotency_key)
+    if _is_eager():
+        transaction.on_commit(lambda: _spawn(_run_in_background, task_row.pk))
+    return task_row
+
+
+def claim(batch_size=10):
+    """Mark up to ``batch_size`` due tasks as running and return them."""
+    now = timezone.now()
+    due = Task.objects.filter(
+        Q(status=Task.PENDING, run_after__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+    ).order_by('run_after', 'id')
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        candidates = list(due.values_list('pk', flat=True)[:batch_size])
+    claimed = []
+    for pk in candidates:
+        # Conditional update: only one worker wins each row, even without row locks
+        won = Task.objects.filter(pk=pk).filter(
+            Q(status=Task.PENDING) | Q(status=Task.RUNNING, locked_until__lt=now)
+        ).update(status=Task.RUNNING, locked_until=now + LEASE, updated_at=now)
+        if won:
+            claimed.append(Task.objects.get(pk=pk))
+    return claimed
+
+
+def execute(task_row):
+    task_row.attempts += 1
+    func = _registry.get(task_row.name)
+    try:
+        if func is None:
+            raise LookupError(f'Unknown task {task_row.name}')
+        func(*task_row.args, **task_row.kwargs)
+    except Exception as exc:
+        logger.exception('Task %s (%s) failed', task_row.name, task_row.pk)
+        task_row.last_error = f'{type(exc).__name__}: {exc}'
+        if task_row.attempts >= task_row.max_attempts:
+            task_row.status = Task.FAILED
+        else:
+            task_row.status = Task.PENDING
+            task_row.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (task_row.attempts - 1))
+    else:
+        task_row.status = Task.DONE
+        task_row.last_error = ''
+    task_row.locked_until = None
+    task_row.updated_at = timezone.now()
+    task_row.save(update_fields=['attempts', 'status', 'last_error', 'run_after', 'locked_until', 'updated_at'])
+    return task_row.status == Task.DONE
+
+
+def run_pending(batch_size=10):
+    """Run one batch of due tasks; returns how many were processed."""
+    tasks = claim(batch_size)
+    for task_row in tasks:
+        execute(task_row)
+    return len(tasks)
@@ -1,3 +1,1188 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from PIL import Image
+
+from . import inbox
+from .events import InMemoryBroker
+from .cleanup import purge_rows
+from .images import derivative_name, generate_derivatives
+from .search import rebuild, search
+from .ordering import ORDER_GAP
+from .models import Attachment, Board, Upload, BoardChange, BoardMembership, List, Card, Checklist, ChecklistItem, Comment, Label, Notification, NotificationCounter, Task
+from .tasks import enqueue, task
+from .transfer import export_ndjson
+
+User = get_user_model()
+
+
+class BoardOwnerTestCase(TestCase):
+    """An owner with one board (``board_fields``) and a client logged in as them."""
+    board_fields = {'title': 'Board'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='pass')
+        self.board = Board.objects.create(created_by=self.user, **self.board_fields)
+        BoardMembership.objects.create(board=self.board, user=self.user, role='owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class BoardTreeQueryTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pass')
+        BoardMembership.objects.create(board=self.board, user=self.other)
+        self.label = Label.objects.create(name='Bug', board=self.board)
+
+    def add_cards(self, lists, cards_per_list):
+        for list_index in range(lists):
+            list_obj = List.objects.create(board=self.board, title=f'List {list_index}', order=list_index)
+            for card_index in range(cards_per_list):
+                card = Card.objects.create(list=list_obj, title=f'Card {card_index}', order=card_index)
+                card.assignees.add(self.user, self.other)
+                card.labels.add(self.label)
+                checklist = Checklist.objects.create(card=card, title='Todo')
+                ChecklistItem.objects.create(checklist=checklist, text='One')
+                ChecklistItem.objects.create(checklist=checklist, text='Two')
+                Comment.objects.create(card=card, author=self.other, text='Hello')
+
+    def count_board_queries(self):
+        # Start both measurements cold, including the cached board roles
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/boards/{self.board.id}/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.data
+
+    def test_board_detail_query_count_is_constant(self):
+        self.add_cards(lists=2, cards_per_list=2)
+        small_count, _ = self.count_board_queries()
+        self.add_cards(lists=5, cards_per_list=10)
+        large_count, data = self.count_board_queries()
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(data['lists']), 7)
+        self.assertEqual(sum(len(l['cards']) for l in data['lists']), 54)
+
+    def test_board_detail_keeps_list_and_card_order(self):
+        second = List.objects.create(board=self.board, title='Second', order=2)
+        first = List.objects.create(board=self.board, title='First', order=1)
+        Card.objects.create(list=first, title='B', order=2)
+        Card.objects.create(list=first, title='A', order=1)
+        _, data = self.count_board_queries()
+        self.assertEqual([l['id'] for l in data['lists']], [first.id, second.id])
+        self.assertEqual([c['title'] for c in data['lists'][0]['cards']], ['A', 'B'])
+
+
+class BoardSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_board(self, title, lists, cards_per_list):
+        board = Board.objects.create(title=title, created_by=self.user)
+        BoardMembership.objects.create(board=board, user=self.user, role='owner')
+        yesterday = timezone.localdate() - timedelta(days=1)
+        for list_index in range(lists):
+            list_obj = List.objects.create(board=board, title=f'List {list_index}', order=list_index)
+            for card_index in range(cards_per_list):
+                Card.objects.create(list=list_obj, title='Card', order=card_index,
+                                    due_date=yesterday if card_index == 0 else None)
+        return board
+
+    def test_summary_counts_and_constant_queries(self):
+        self.make_board('Small', lists=1, cards_per_list=1)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/boards/')
+        self.make_board('Large', lists=3, cards_per_list=4)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/api/boards/')
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        tile = response.data[1]
+        self.assertNotIn('lists', tile)
+        self.assertEqual((tile['list_count'], tile['card_count'], tile['overdue_count']), (3, 12, 3))
+        self.assertEqual(len(tile['members']), 1)
+
+    def test_summary_counts_cards_in_done_lists(self):
+        board = self.make_board('Board', lists=2, cards_per_list=2)
+        done = List.objects.create(board=board, title='Done', order=2)
+        Card.objects.create(list=done, title='Shipped', order=0)
+        tile = self.client.get('/api/boards/').data[0]
+        self.assertEqual((tile['card_count'], tile['done_count']), (5, 1))
+
+
+class CursorPaginationTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.list = List.objects.create(board=self.board, title='List')
+
+    def test_cards_are_paged_by_cursor_on_order_and_id(self):
+        # Duplicate order values must neither repeat nor drop rows across pages
+        for index in range(7):
+            Card.objects.create(list=self.list, title=f'Card {index}', order=index // 2)
+        seen = []
+        url = f'/api/cards/?list={self.list.id}&page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data), 3)
+            seen.extend(card['title'] for card in response.data)
+            link = response.headers.get('Link')
+            url = link[1:link.index('>')] if link else None
+        self.assertEqual(seen, [f'Card {index}' for index in range(7)])
+
+    def test_card_filters_and_membership_scope(self):
+        label = Label.objects.create(name='Bug', board=self.board)
+        tagged = Card.objects.create(list=self.list, title='Tagged', due_date=timezone.localdate())
+        tagged.labels.add(label)
+        tagged.assignees.add(self.user)
+        Card.objects.create(list=self.list, title='Plain')
+        outsider = User.objects.create_user(username='outsider', email='outsider@example.com', password='pass')
+        foreign = Board.objects.create(title='Foreign', created_by=outsider)
+        Card.objects.create(list=List.objects.create(board=foreign, title='L'), title='Hidden')
+
+        titles = lambda query: [c['title'] for c in self.client.get(f'/api/cards/{query}').data]
+        self.assertEqual(titles(''), ['Tagged', 'Plain'])
+        self.assertEqual(titles(f'?label={label.id}&assignee={self.user.id}'), ['Tagged'])
+        self.assertEqual(titles(f'?due_after={timezone.localdate().isoformat()}'), ['Tagged'])
+        self.assertEqual(self.client.get('/api/cards/?due_after=soon').status_code, 400)
+        self.assertEqual(self.client.get('/api/cards/?cursor=bogus').status_code, 400)
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAINs the hot kanban queries on a seeded dataset and fails if any of
+    them stops using an index (a full table scan or a sort step).
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='owner', email='owner@example.com', password='pass')
+        cls.board = Board.objects.create(title='Board', created_by=cls.user)
+        BoardMembership.objects.create(board=cls.board, user=cls.user, role='owner')
+        lists = List.objects.bulk_create(
+            List(board=cls.board, title=f'List {index}', order=index) for index in range(20)
+        )
+        cards = Card.objects.bulk_create(
+            Card(list=list_obj, title='Card', order=index) for list_obj in lists for index in range(50)
+        )
+        cls.card = cards[0]
+        Comment.objects.bulk_create(Comment(card=card, author=cls.user, text='Hi') for card in cards[:200])
+        Notification.objects.bulk_create(
+            Notification(user=cls.user, message='Hello', type='mention', read=index % 3 == 0) for index in range(300)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, table):
+        plan = self.explain(queryset)
+        if connection.vendor == 'sqlite':
+            self.assertNotRegex(plan, rf'\bSCAN {table}\b', plan)
+            self.assertNotIn('TEMP B-TREE', plan, plan)
+        elif connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan, plan)
+
+    def test_hot_queries_use_indexes(self):
+        self.assertUsesIndex(List.objects.filter(board=self.board).order_by('order', 'id'), 'kanban_list')
+        self.assertUsesIndex(Card.objects.filter(list_id=self.card.list_id).order_by('order', 'id'), 'kanban_card')
+        self.assertUsesIndex(Comment.objects.filter(card=self.card).order_by('created_at', 'id'), 'kanban_comment')
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.user, read=False).order_by('-created_at'), 'kanban_notification'
+        )
+        self.assertUsesIndex(BoardMembership.objects.filter(user=self.user, board=self.board), 'kanban_boardmembership')
+
+
+class MoveTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.list = List.objects.create(board=self.board, title='Todo')
+        self.done = List.objects.create(board=self.board, title='Done', order=1)
+        self.cards = [
+            self.client.post('/api/cards/', {'list': self.list.id, 'title': f'Card {index}'}).data['id']
+            for index in range(5)
+        ]
+
+    def titles(self, list_obj):
+        return list(Card.objects.filter(list=list_obj).order_by('order', 'id').values_list('title', flat=True))
+
+    def test_move_to_top_touches_one_row(self):
+        response = self.client.post('/api/cards/move/', {'moves': [{'id': self.cards[4], 'list': self.list.id, 'position': 0}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(self.titles(self.list), ['Card 4', 'Card 0', 'Card 1', 'Card 2', 'Card 3'])
+
+    def test_batch_move_across_lists_and_rebalance(self):
+        Card.objects.filter(list=self.list).update(order=1)
+        moves = [
+            {'id': self.cards[0], 'list': self.done.id, 'after': None},
+            {'id': self.cards[3], 'list': self.list.id, 'after': self.cards[1]},
+        ]
+        response = self.client.post('/api/cards/move/', {'moves': moves}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(self.done), ['Card 0'])
+        self.assertEqual(self.titles(self.list), ['Card 1', 'Card 3', 'Card 2', 'Card 4'])
+
+    def test_list_reorder(self):
+        response = self.client.post('/api/lists/move/', {'moves': [{'id': self.done.id, 'position': 0}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(List.objects.order_by('order', 'id').values_list('title', flat=True)), ['Done', 'Todo'])
+
+    def test_non_object_body_is_rejected(self):
+        for url in ('/api/cards/move/', '/api/lists/move/'):
+            response = self.client.post(url, [{'id': self.cards[0], 'list': self.list.id}], format='json')
+            self.assertEqual(response.status_code, 400)
+
+
+class BoardEventTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.list = List.objects.create(board=self.board, title='Todo')
+
+    def test_in_memory_broker_fans_out_across_threads(self):
+        broker = InMemoryBroker()
+
+        async def listen():
+            first = broker.subscribe('board:1')
+            second = broker.subscribe('board:1')
+            other = broker.subscribe('board:2')
+            await asyncio.to_thread(broker.publish, 'board:1', {'type': 'card.updated', 'board': 1})
+            received = [await first.get(timeout=1), await second.get(timeout=1)]
+            self.assertTrue(other.queue.empty())
+            for subscription in (first, second, other):
+                subscription.close()
+            return received
+
+        self.assertEqual([event['type'] for event in asyncio.run(listen())], ['card.updated'] * 2)
+        self.assertEqual(dict(broker._subscribers), {})
+
+    def test_card_writes_publish_compact_events_on_commit(self):
+        published = []
+        with mock.patch.object(InMemoryBroker, 'publish', lambda broker, channel, event: published.append((channel, event))):
+            with self.captureOnCommitCallbacks(execute=True):
+                card_id = self.client.post('/api/cards/', {'list': self.list.id, 'title': 'New'}).data['id']
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(f'/api/cards/{card_id}/', {'title': 'Renamed'})
+        self.assertEqual([event['type'] for _, event in published], ['card.created', 'card.updated'])
+        channel, event = published[-1]
+        self.assertEqual(channel, f'board:{self.board.id}')
+        self.assertEqual(event['data']['title'], 'Renamed')
+        self.assertNotIn('checklists', event['data'])
+
+
+class BoardDeltaTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.list = List.objects.create(board=self.board, title='Todo')
+
+    def version(self):
+        return self.client.get(f'/api/boards/{self.board.id}/').data['version']
+
+    def test_delta_collapses_changes_since_version(self):
+        keep = self.client.post('/api/cards/', {'list': self.list.id, 'title': 'Keep'}).data['id']
+        base = self.version()
+        self.client.patch(f'/api/cards/{keep}/', {'title': 'Renamed'})
+        self.client.post('/api/cards/move/', {'moves': [{'id': keep, 'list': self.list.id, 'position': 0}]}, format='json')
+        gone = self.client.post('/api/cards/', {'list': self.list.id, 'title': 'Gone'}).data['id']
+        self.client.delete(f'/api/cards/{gone}/')
+
+        response = self.client.get(f'/api/boards/{self.board.id}/changes/?since={base}')
+        self.assertEqual(response.data['version'], base + 4)
+        changes = {change['id']: change for change in response.data['changes']}
+        self.assertEqual(changes[keep]['action'], 'updated')
+        self.assertEqual(changes[keep]['data']['title'], 'Renamed')
+        self.assertEqual(changes[gone]['action'], 'deleted')
+
+    def test_move_to_another_board_leaves_and_arrives_whole(self):
+        other = Board.objects.create(title='Other', created_by=self.user)
+        BoardMembership.objects.create(board=other, user=self.user, role='owner')
+        target = List.objects.create(board=other, title='Inbox')
+        card = self.client.post('/api/cards/', {'list': self.list.id, 'title': 'Travel'}).data['id']
+        base, other_base = self.version(), self.client.get(f'/api/boards/{other.id}/').data['version']
+        response = self.client.post(
+            '/api/cards/move/', {'moves': [{'id': card, 'list': target.id, 'position': 0}]}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        left = self.client.get(f'/api/boards/{self.board.id}/changes/?since={base}').data['changes']
+        self.assertEqual([(change['id'], change['action']) for change in left], [(card, 'deleted')])
+        arrived = self.client.get(f'/api/boards/{other.id}/changes/?since={other_base}').data['changes']
+        self.assertEqual([(change['id'], change['action']) for change in arrived], [(card, 'created')])
+        self.assertEqual(arrived[0]['data']['title'], 'Travel')
+        self.assertEqual(arrived[0]['data']['list'], target.id)
+
+    def test_assignees_and_labels_reach_the_delta(self):
+        label = Label.objects.create(board=self.board, name='bug')
+        card = self.client.post(
+            '/api/cards/', {'list': self.list.id, 'title': 'Fix', 'labels': [label.id]}, format='json',
+        ).data['id']
+        base = self.version()
+        self.client.patch(f'/api/cards/{card}/', {'assignees': [self.user.id]}, format='json')
+        changes = self.client.get(f'/api/boards/{self.board.id}/changes/?since={base - 1}').data['changes']
+        self.assertEqual(changes[0]['data']['labels'], [label.id])
+        self.assertEqual(changes[0]['data']['assignees'], [self.user.id])
+
+    def test_compacted_log_falls_back_to_snapshot(self):
+        self.client.post('/api/cards/', {'list': self.list.id, 'title': 'Card'})
+        BoardChange.objects.update(created_at=timezone.now() - timedelta(days=30))
+        call_command('compact_board_changes', days=7, stdout=StringIO())
+        response = self.client.get(f'/api/boards/{self.board.id}/changes/?since=0')
+        self.assertIn('snapshot', response.data)
+        self.assertEqual(response.data['snapshot']['lists'][0]['cards'][0]['title'], 'Card')
+        self.assertEqual(self.client.get(f'/api/boards/{self.board.id}/changes/?since=1').data['changes'], [])
+
+
+class NotificationDispatchTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.card = Card.objects.create(list=List.objects.create(board=self.board, title='Todo'), title='Card')
+
+    @override_settings(KANBAN_TASKS_INLINE=True)
+    def test_mentions_resolve_in_one_query_and_bulk_insert(self):
+        for index in range(10):
+            User.objects.create_user(username=f'user{index}', email=f'user{index}@example.com', password='pass')
+        text = ' '.join(f'@user{index}' for index in range(10)) + ' @owner @nobody'
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/comments/', {'card': self.card.id, 'text': text})
+        self.assertEqual(response.status_code, 201)
+        notifications = Notification.objects.filter(type='mention')
+        self.assertEqual(notifications.count(), 10)
+        self.assertFalse(notifications.filter(user=self.user).exists())
+        self.assertEqual(set(notifications.values_list('board_id', flat=True)), {self.board.id})
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "kanban_notification"')]
+        self.assertEqual(len(inserts), 1)
+
+
+class NotificationInboxTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.card = Card.objects.create(list=List.objects.create(board=self.board, title='Todo'), title='Card')
+
+    def unread(self):
+        return self.client.get('/api/notifications/unread-count/').data['unread']
+
+    def test_repeats_collapse_and_counter_tracks_unread(self):
+        for _ in range(10):
+            inbox.deliver([self.user.pk], 'You were mentioned', 'mention', card_id=self.card.pk)
+        inbox.deliver([self.user.pk], 'You joined', 'board_joined', board_id=self.board.pk)
+        mention = Notification.objects.get(type='mention')
+        self.assertEqual(mention.count, 10)
+        self.assertEqual(self.unread(), 2)
+
+        response = self.client.patch('/api/notifications/mark-read/', {'ids': [mention.pk]}, format='json')
+        self.assertEqual(response.data['unread'], 1)
+        # Once read, a new mention starts a fresh entry
+        inbox.deliver([self.user.pk], 'You were mentioned again', 'mention', card_id=self.card.pk)
+        self.assertEqual(Notification.objects.filter(type='mention').count(), 2)
+        self.assertEqual(self.unread(), 2)
+
+        response = self.client.post('/api/notifications/delete/', {'ids': [mention.pk]}, format='json')
+        self.assertEqual(response.data['unread'], 2)
+        latest = Notification.objects.get(type='mention')
+        self.assertEqual(self.client.delete(f'/api/notifications/{latest.pk}/delete/').data['unread'], 1)
+        self.assertEqual(self.client.patch('/api/notifications/mark-read/').data['unread'], 0)
+
+        listed = self.client.get('/api/notifications/').data
+        self.assertEqual([n['board'] for n in listed], [self.board.pk])
+
+    def test_compaction_and_recount(self):
+        for index in range(5):
+            inbox.deliver([self.user.pk], f'Card {index}', f'event{index}', card_id=self.card.pk)
+        Notification.objects.filter(message='Card 0').update(created_at=timezone.now() - timedelta(days=400))
+        NotificationCounter.objects.filter(user=self.user).update(unread=42)
+        out = StringIO()
+        call_command('compact_notifications', '--keep', '3', stdout=out)
+        self.assertEqual(
+            sorted(Notification.objects.values_list('message', flat=True)), ['Card 2', 'Card 3', 'Card 4'],
+        )
+        self.assertEqual(self.unread(), 3)
+
+
+_flaky_calls = []
+
+
+@task
+def flaky_task(value):
+    _flaky_calls.append(value)
+    if len(_flaky_calls) == 1:
+        raise RuntimeError('first attempt fails')
+
+
+@override_settings(KANBAN_TASKS_EAGER=False)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        _flaky_calls.clear()
+
+    def test_retry_and_idempotency(self):
+        first = enqueue(flaky_task, 'a', idempotency_key='job-a')
+        second = enqueue(flaky_task, 'a', idempotency_key='job-a')
+        self.assertEqual(first.pk, second.pk)
+
+        with self.assertLogs('kanban.tasks', level='ERROR'):
+            call_command('run_tasks', once=True, stdout=StringIO())
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), (Task.PENDING, 1))
+        self.assertIn('first attempt fails', first.last_error)
+
+        Task.objects.update(run_after=timezone.now())
+        call_command('run_tasks', once=True, stdout=StringIO())
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), (Task.DONE, 2))
+        self.assertEqual(_flaky_calls, ['a', 'a'])
+
+    def test_board_delete_is_deferred(self):
+        user = User.objects.create_user(username='owner', email='owner@example.com', password='pass')
+        board = Board.objects.create(title='Board', created_by=user)
+        BoardMembership.objects.create(board=board, user=user, role='owner')
+        client = APIClient()
+        client.force_authenticate(user)
+        self.assertEqual(client.delete(f'/api/boards/{board.id}/').status_code, 204)
+        self.assertEqual(client.get(f'/api/boards/{board.id}/').status_code, 404)
+        self.assertTrue(Board.all_objects.filter(pk=board.pk).exists())
+        call_command('run_tasks', once=True, stdout=StringIO())
+        self.assertFalse(Board.all_objects.filter(pk=board.pk).exists())
+
+    def test_delete_after_restore_queues_a_new_purge(self):
+        user = User.objects.create_user(username='owner', email='owner@example.com', password='pass')
+        board = Board.objects.create(title='Board', created_by=user)
+        BoardMembership.objects.create(board=board, user=user, role='owner')
+        client = APIClient()
+        client.force_authenticate(user)
+        client.delete(f'/api/boards/{board.id}/')
+        self.assertEqual(client.post(f'/api/boards/{board.id}/restore/').status_code, 200)
+        call_command('run_tasks', once=True, stdout=StringIO())
+        self.assertTrue(Board.objects.filter(pk=board.pk).exists())
+
+        self.assertEqual(client.delete(f'/api/boards/{board.id}/').status_code, 204)
+        self.assertEqual(Task.objects.filter(status=Task.PENDING).count(), 1)
+        call_command('run_tasks', once=True, stdout=StringIO())
+        self.assertFalse(Board.all_objects.filter(pk=board.pk).exists())
+
+    @override_settings(KANBAN_TASKS_EAGER=True)
+    def test_eager_tasks_run_after_the_response(self):
+        with mock.patch('kanban.tasks._spawn') as spawn:
+            with self.captureOnCommitCallbacks(execute=True):
+                row = enqueue(flaky_task, 'b')
+        self.assertEqual(row.status, Task.PENDING)
+        self.assertEqual(_flaky_calls, [])
+        spawn.assert_called_once()
+        target, pk = spawn.call_args.args
+        with self.assertLogs('kanban.tasks', level='ERROR'):
+            target(pk)
+        row.refresh_from_db()
+        self.assertEqual(_flaky_calls, ['b'])
+        self.assertEqual((row.status, row.attempts), (Task.PENDING, 1))
+
+
+class BoardCacheTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.card = Card.objects.create(list=List.objects.create(board=self.board, title='Todo'), title='Card')
+        self.url = f'/api/boards/{self.board.id}/'
+
+    def test_etag_and_invalidation(self):
+        first = self.client.get(self.url)
+        etag = first.headers['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        # m2m writes bypass the change log and must still invalidate through signals
+        self.card.assignees.add(self.user)
+        fresh = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh.data['lists'][0]['cards'][0]['assignees'], [self.user.id])
+
+    def test_profile_edit_invalidates_cached_snapshots(self):
+        etag = self.client.get(self.url).headers['ETag']
+        response = self.client.patch('/api/accounts/profile/', {'first_name': 'Ada'}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        fresh = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh.data['members'][0]['first_name'], 'Ada')
+
+    def test_summary_cache_follows_card_changes(self):
+        etag = self.client.get('/api/boards/').headers['ETag']
+        self.assertEqual(self.client.get('/api/boards/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.post('/api/cards/', {'list': self.card.list_id, 'title': 'Another'})
+        response = self.client.get('/api/boards/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['card_count'], 2)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AttachmentMetadataTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.card = Card.objects.create(list=List.objects.create(board=self.board, title='Todo'), title='Card')
+
+    def test_upload_records_metadata(self):
+        upload = SimpleUploadedFile('notes.txt', b'hello world', content_type='text/plain')
+        response = self.client.post('/api/attachments/', {'card': self.card.id, 'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['file_size'], 11)
+        self.assertEqual(response.data['content_type'], 'text/plain')
+        self.assertEqual(response.data['original_name'], 'notes.txt')
+        self.assertEqual(response.data['checksum'], hashlib.sha256(b'hello world').hexdigest())
+
+    def test_backfill_fills_legacy_rows(self):
+        legacy = Attachment.objects.create(
+            card=self.card, uploaded_by=self.user, file=SimpleUploadedFile('old.png', b'\x89PNG data'),
+        )
+        missing = Attachment.objects.create(card=self.card, uploaded_by=self.user, file='attachments/gone.txt')
+        call_command('backfill_attachment_metadata', stdout=StringIO())
+        legacy.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual(legacy.size, 9)
+        self.assertEqual(legacy.content_type, 'image/png')
+        self.assertIsNone(missing.size)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), KANBAN_UPLOAD_TEMP_DIR=tempfile.mkdtemp())
+class ResumableUploadTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.todo = List.objects.create(board=self.board, title='Todo')
+        self.card = Card.objects.create(list=self.todo, title='Card')
+
+    def _chunk(self, upload_id, offset, data):
+        return self.client.generic(
+            'PATCH', f'/api/uploads/{upload_id}/', data,
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_chunked_upload_resumes_and_dedups(self):
+        content = b'0123456789' * 10
+        upload = self.client.post('/api/uploads/', {'filename': 'report.pdf', 'size': len(content)}).data
+        self.assertEqual(self._chunk(upload['id'], 0, content[:40]).data['offset'], 40)
+        # A retried or out-of-order chunk is refused with the offset to resume from
+        conflict = self._chunk(upload['id'], 0, content[:40])
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(conflict.data['offset'], 40)
+        self.assertTrue(self._chunk(upload['id'], 40, content[40:]).data['complete'])
+
+        first = self.client.post('/api/attachments/', {'card': self.card.id, 'upload': upload['id']})
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.data['file_size'], len(content))
+        self.assertFalse(Upload.objects.exists())
+
+        other = Card.objects.create(list=self.todo, title='Other')
+        upload = SimpleUploadedFile('copy.pdf', content)
+        second = self.client.post('/api/attachments/', {'card': other.id, 'file': upload}, format='multipart')
+        self.assertEqual(second.status_code, 201)
+        names = set(Attachment.objects.values_list('file', flat=True))
+        self.assertEqual(len(names), 1)
+
+    @override_settings(KANBAN_MAX_UPLOAD_SIZE=50)
+    def test_size_limit_checked_before_upload(self):
+        response = self.client.post('/api/uploads/', {'filename': 'big.bin', 'size': 51})
+        self.assertEqual(response.status_code, 413)
+        upload = self.client.post('/api/uploads/', {'filename': 'ok.bin', 'size': 10}).data
+        self.assertEqual(self._chunk(upload['id'], 0, b'x' * 11).status_code, 413)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AttachmentDownloadTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        # Uploads go through the logged-in client; downloads are fetched without it, like a browser link
+        self.api, self.client = self.client, APIClient()
+        self.card = Card.objects.create(list=List.objects.create(board=self.board, title='Todo'), title='Card')
+        attachment = self.upload('data.txt', b'abcdefghij', 'text/plain')
+        self.url = attachment['download_url']
+        self.token = attachment['download_token']
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def upload(self, name, content, content_type):
+        upload = SimpleUploadedFile(name, content, content_type=content_type)
+        return self.api.post('/api/attachments/', {'card': self.card.id, 'file': upload}, format='multipart').data
+
+    def test_full_range_and_conditional(self):
+        response = self.client.get(self.url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'abcdefghij')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+
+        partial = self.client.get(self.url, HTTP_RANGE='bytes=2-4', **self.auth)
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial['Content-Range'], 'bytes 2-4/10')
+        self.assertEqual(b''.join(partial.streaming_content), b'cde')
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=20-', **self.auth).status_code, 416)
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'], **self.auth)
+        self.assertEqual(cached.status_code, 304)
+
+    def test_requires_membership(self):
+        outsider = User.objects.create_user(username='outsider', email='out@example.com', password='pass')
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        outsider_auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(outsider)}'}
+        self.assertEqual(self.client.get(self.url, **outsider_auth).status_code, 404)
+
+    def test_links_use_scoped_download_tokens(self):
+        response = self.client.get(f'{self.url}?token={self.token}')
+        self.assertEqual(response.status_code, 200)
+        # The access token itself is not accepted in the query
+        self.assertEqual(self.client.get(f'{self.url}?token={AccessToken.for_user(self.user)}').status_code, 401)
+        other = self.upload('other.txt', b'other', 'text/plain')
+        self.assertEqual(self.client.get(f'{other["download_url"]}?token={self.token}').status_code, 401)
+        with override_settings(KANBAN_DOWNLOAD_TOKEN_TTL=-1):
+            self.assertEqual(self.client.get(f'{self.url}?token={self.token}').status_code, 401)
+
+    def test_only_safe_types_render_inline(self):
+        page = self.upload('page.html', b'<script>alert(1)</script>', 'text/html')
+        response = self.client.get(page['download_url'], **self.auth)
+        self.assertTrue(response['Content-Disposition'].startswith('attachment;'))
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+        self.assertEqual(response['Content-Security-Policy'], 'sandbox')
+        image = self.upload('pixel.png', b'\x89PNG data', 'image/png')
+        response = self.client.get(image['download_url'], **self.auth)
+        self.assertTrue(response['Content-Disposition'].startswith('inline;'))
+        self.assertEqual(response['Content-Security-Policy'], 'sandbox')
+
+    @override_settings(KANBAN_SENDFILE_BACKEND='nginx')
+    def test_offload_to_proxy(self):
+        response = self.client.get(self.url, **self.auth)
+        self.assertTrue(response['X-Accel-Redirect'].startswith('/protected-media/blobs/'))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _image(self, name, size=(600, 400)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    @override_settings(KANBAN_TASKS_INLINE=True)
+    def test_avatar_thumbnails_generated_on_upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/accounts/profile/', {'avatar': self._image('me.png')}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        name = derivative_name(self.user.avatar.name, 'md')
+        self.assertTrue(response.data['avatar_thumbnail'].endswith(name))
+        with default_storage.open(name) as fileobj:
+            self.assertEqual(Image.open(fileobj).size, (128, 128))
+
+    @override_settings(KANBAN_TASKS_EAGER=True)
+    def test_derivatives_are_generated_after_the_response(self):
+        with mock.patch('kanban.tasks._spawn') as spawn:
+            with self.captureOnCommitCallbacks(execute=True):
+                url = self.client.post(
+                    '/api/boards/upload-background/', {'file': self._image('bg.png')}, format='multipart',
+                ).data['url']
+        path = url[len(settings.MEDIA_URL):]
+        task_row = Task.objects.get(idempotency_key=f'derivatives:{path}')
+        self.assertEqual(task_row.status, Task.PENDING)
+        spawn.assert_called_once_with(mock.ANY, task_row.pk)
+
+    def test_background_thumbnail_falls_back_to_original(self):
+        with mock.patch('kanban.views.enqueue'):
+            url = self.client.post(
+                '/api/boards/upload-background/', {'file': self._image('bg.png')}, format='multipart',
+            ).data['url']
+        board = Board.objects.create(title='Board', created_by=self.user, background_theme={'backgroundImage': url})
+        BoardMembership.objects.create(board=board, user=self.user, role='owner')
+        thumbnail = self.client.get('/api/boards/').data[0]['background_thumbnail']
+        fallback = self.client.get(thumbnail)
+        self.assertEqual(fallback.status_code, 302)
+        self.assertEqual(fallback['Location'], url)
+
+        generate_derivatives(url.removeprefix(settings.MEDIA_URL), 'background')
+        with default_storage.open(thumbnail.removeprefix(settings.MEDIA_URL)) as fileobj:
+            self.assertEqual(Image.open(fileobj).size, (405, 270))
+
+
+class BoardSearchTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.todo = List.objects.create(board=self.board, title='Todo')
+        self.card = Card.objects.create(list=self.todo, title='Quarterly invoice', description='<p>Send to <b>finance</b></p>')
+        self.comment = Comment.objects.create(card=self.card, author=self.user, text='Invoices & receipts are overdue')
+        checklist = Checklist.objects.create(card=self.card, title='Steps')
+        self.item = ChecklistItem.objects.create(checklist=checklist, text='Email the accountant')
+        other = Board.objects.create(title='Private', created_by=self.user)
+        Card.objects.create(list=List.objects.create(board=other, title='Todo'), title='Invoice elsewhere')
+
+    def test_search_is_scoped_ranked_and_highlighted(self):
+        hits = self.client.get('/api/search/', {'q': 'invoice'}).data
+        self.assertEqual({(hit['type'], hit['id']) for hit in hits}, {('card', self.card.id), ('comment', self.comment.id)})
+        comment_hit = next(hit for hit in hits if hit['type'] == 'comment')
+        self.assertIn('<mark>Invoices</mark>', comment_hit['highlight'])
+        self.assertIn('&amp; receipts', comment_hit['highlight'])
+        self.assertEqual(comment_hit['card']['title'], 'Quarterly invoice')
+
+        page = self.client.get('/api/search/', {'q': 'invoice', 'page_size': 1, 'board': self.board.id})
+        self.assertEqual(len(page.data), 1)
+        self.assertIn('offset=1', page.headers['Link'])
+
+    def test_index_follows_writes(self):
+        label = Label.objects.create(board=self.board, name='urgent')
+        self.card.labels.add(label)
+        self.assertEqual([hit['id'] for hit in search(self.user, 'urgent')], [self.card.id])
+        self.item.text = 'Call the bank'
+        self.item.save()
+        self.assertEqual([hit['type'] for hit in search(self.user, 'bank')], ['checklist_item'])
+        self.assertEqual(search(self.user, 'accountant'), [])
+        self.card.delete()
+        self.assertEqual(search(self.user, 'bank'), [])
+
+    def test_rebuild(self):
+        self.assertEqual(rebuild(), 3 + 1)
+        self.assertEqual([hit['id'] for hit in search(self.user, 'fin')], [self.card.id])
+
+
+class BoardAccessTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pass')
+        self.member = User.objects.create_user(username='member', email='member@example.com', password='pass')
+        self.outsider = User.objects.create_user(username='outsider', email='outsider@example.com', password='pass')
+        self.board = Board.objects.create(title='Board', created_by=self.owner)
+        BoardMembership.objects.create(board=self.board, user=self.owner, role='owner')
+        BoardMembership.objects.create(board=self.board, user=self.member)
+        self.todo = List.objects.create(board=self.board, title='Todo')
+        self.card = Card.objects.create(list=self.todo, title='Card')
+        self.comment = Comment.objects.create(card=self.card, author=self.owner, text='Hi')
+        self.client = APIClient()
+
+    def test_outsiders_get_404(self):
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.client.get(f'/api/cards/{self.card.id}/').status_code, 404)
+        self.assertEqual(self.client.patch(f'/api/lists/{self.todo.id}/', {'title': 'x'}).status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/comments/?id={self.comment.id}').status_code, 404)
+        response = self.client.post('/api/cards/', {'list': self.todo.id, 'title': 'Sneaky'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get('/api/cards/').data, [])
+        self.assertTrue(Comment.objects.filter(pk=self.comment.pk).exists())
+
+    def test_roles_are_enforced(self):
+        self.client.force_authenticate(self.member)
+        self.assertEqual(self.client.get(f'/api/cards/{self.card.id}/').status_code, 200)
+        self.assertEqual(self.client.delete(f'/api/boards/{self.board.id}/').status_code, 403)
+
+    def test_roles_are_cached_and_invalidated(self):
+        self.client.force_authenticate(self.member)
+        self.client.get(f'/api/cards/{self.card.id}/')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(f'/api/cards/{self.card.id}/')
+        self.assertFalse(any('kanban_boardmembership' in q['sql'] for q in ctx.captured_queries))
+        BoardMembership.objects.filter(board=self.board, user=self.member).delete()
+        self.assertEqual(self.client.get(f'/api/cards/{self.card.id}/').status_code, 404)
+
+
+class BatchWriteTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.outsider = User.objects.create_user(username='outsider', email='outsider@example.com', password='pass')
+        self.todo = List.objects.create(board=self.board, title='Todo')
+        self.card = Card.objects.create(list=self.todo, title='Existing', order=1000)
+
+    def batch(self, operations):
+        return self.client.post('/api/batch/', {'operations': operations}, format='json')
+
+    def test_creates_with_refs_in_one_insert_per_type(self):
+        operations = [
+            {'op': 'create', 'type': 'card', 'ref': 'c', 'data': {'list': self.todo.id, 'title': 'Release'}},
+            {'op': 'create', 'type': 'checklist', 'ref': 's', 'data': {'card': '$c', 'title': 'Steps'}},
+        ] + [
+            {'op': 'create', 'type': 'checklist_item', 'data': {'checklist': '$s', 'text': f'Deploy region {i}'}}
+            for i in range(5)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.batch(operations)
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [201] * 7)
+        card = Card.objects.get(pk=results[0]['data']['id'])
+        self.assertEqual(card.order, 1000 + ORDER_GAP)
+        self.assertEqual(ChecklistItem.objects.filter(checklist__card=card).count(), 5)
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "kanban_checklistitem"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(len(search(self.user, 'region')), 5)
+
+    def test_update_and_delete(self):
+        checklist = Checklist.objects.create(card=self.card, title='Steps')
+        item = ChecklistItem.objects.create(checklist=checklist, text='Tag')
+        version = self.board.version
+        response = self.batch([
+            {'op': 'update', 'type': 'checklist_item', 'id': item.id, 'data': {'completed': True}},
+            {'op': 'update', 'type': 'card', 'id': self.card.id, 'data': {'title': 'Renamed'}},
+            {'op': 'delete', 'type': 'checklist', 'id': checklist.id},
+        ])
+        self.assertEqual([result['status'] for result in response.data['results']], [200, 200, 204])
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.title, 'Renamed')
+        self.assertFalse(Checklist.objects.filter(pk=checklist.pk).exists())
+        self.board.refresh_from_db()
+        self.assertEqual(self.board.version, version + 3)
+        self.assertEqual([hit['id'] for hit in search(self.user, 'renamed')], [self.card.id])
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(), KANBAN_TASKS_INLINE=True)
+    def test_card_delete_archives_then_purges_attachments(self):
+        name = default_storage.save('attachments/notes.txt', BytesIO(b'notes'))
+        Attachment.objects.create(card=self.card, file=name, uploaded_by=self.user)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.batch([{'op': 'delete', 'type': 'card', 'id': self.card.id}])
+        self.assertEqual([result['status'] for result in response.data['results']], [204])
+        self.assertFalse(Card.objects.filter(pk=self.card.pk).exists())
+        self.assertTrue(Card.all_objects.filter(pk=self.card.pk, archived_at__isnull=False).exists())
+        for callback in callbacks:
+            callback()
+        self.assertFalse(Card.all_objects.exists())
+        self.assertFalse(Attachment.objects.exists())
+        self.assertFalse(default_storage.exists(name))
+
+    def test_invalid_or_foreign_operations_write_nothing(self):
+        response = self.batch([
+            {'op': 'create', 'type': 'card', 'data': {'list': self.todo.id, 'title': 'Fine'}},
+            {'op': 'create', 'type': 'checklist', 'data': {'card': '$nope', 'title': 'Steps'}},
+            {'op': 'update', 'type': 'card', 'id': self.card.id, 'data': {'title': ''}},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['errors']), {1, 2})
+
+        self.client.force_authenticate(self.outsider)
+        response = self.batch([
+            {'op': 'create', 'type': 'card', 'data': {'list': self.todo.id, 'title': 'Sneaky'}},
+            {'op': 'delete', 'type': 'card', 'id': self.card.id},
+        ])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Card.objects.count(), 1)
+
+    def test_non_object_body_is_rejected(self):
+        operations = [{'op': 'create', 'type': 'card', 'data': {'list': self.todo.id, 'title': 'Fine'}}]
+        response = self.client.post('/api/batch/', operations, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Card.objects.count(), 1)
+
+
+class CopyTests(BoardOwnerTestCase):
+    board_fields = {'title': 'Launch', 'is_template': True}
+
+    def setUp(self):
+        super().setUp()
+        self.helper = User.objects.create_user(username='helper', email='helper@example.com', password='pass')
+        BoardMembership.objects.create(board=self.board, user=self.helper)
+        self.label = Label.objects.create(board=self.board, name='blocker')
+        self.todo = List.objects.create(board=self.board, title='Todo', order=1)
+        self.done = List.objects.create(board=self.board, title='Done', order=2)
+        self.card = self.make_card(self.todo, 'Write announcement')
+        self.other = Board.objects.create(title='Other', created_by=self.user)
+        BoardMembership.objects.create(board=self.other, user=self.user, role='owner')
+        self.inbox = List.objects.create(board=self.other, title='Inbox')
+
+    def make_card(self, list_obj, title, items=2):
+        card = Card.objects.create(list=list_obj, title=title)
+        card.labels.add(self.label)
+        card.assignees.add(self.helper)
+        checklist = Checklist.objects.create(card=card, title='Steps')
+        for i in range(items):
+            ChecklistItem.objects.create(checklist=checklist, text=f'Step {i}', completed=i == 0)
+        Comment.objects.create(card=card, author=self.user, text='Draft attached')
+        return card
+
+    def test_board_copy_is_deep_and_constant_in_queries(self):
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post(f'/api/boards/{self.board.id}/copy/', {'title': 'Launch 2'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        copy = Board.objects.get(pk=response.data['id'])
+        self.assertEqual((copy.title, copy.is_template, copy.created_by_id), ('Launch 2', False, self.user.id))
+        self.assertEqual(list(copy.lists.values_list('title', flat=True)), ['Todo', 'Done'])
+        card = Card.objects.get(list__board=copy)
+        new_label = Label.objects.get(board=copy)
+        self.assertEqual(list(card.labels.all()), [new_label])
+        self.assertEqual(list(card.assignees.all()), [])
+        self.assertEqual(list(ChecklistItem.objects.filter(checklist__card=card).values_list('text', 'completed')),
+                         [('Step 0', True), ('Step 1', False)])
+        self.assertFalse(card.comments.exists())
+        self.assertEqual(list(BoardMembership.objects.filter(board=copy).values_list('user_id', 'role')),
+                         [(self.user.id, 'owner')])
+        self.assertEqual([hit['id'] for hit in search(self.user, 'blocker', board_id=copy.id)], [card.id])
+
+        for i in range(5):
+            self.make_card(self.done, f'Card {i}', items=4)
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(f'/api/boards/{self.board.id}/copy/', {}, format='json')
+        self.assertEqual(len(large), len(small))
+
+    def test_card_copy_into_another_board(self):
+        response = self.client.post(
+            f'/api/cards/{self.card.id}/copy/', {'list': self.inbox.id, 'title': 'From template'}, format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['list'], self.inbox.id)
+        label = Label.objects.get(board=self.other)
+        self.assertEqual((label.name, response.data['labels']), ('blocker', [label.id]))
+        # The helper isn't on the other board
+        self.assertEqual(response.data['assignees'], [])
+        self.assertEqual(len(response.data['checklists'][0]['items']), 2)
+
+        self.client.force_authenticate(self.helper)
+        response = self.client.post(f'/api/cards/{self.card.id}/copy/', {'list': self.inbox.id}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_copy_is_logged(self):
+        version = self.board.version
+        response = self.client.post(f'/api/lists/{self.todo.id}/copy/', {}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['cards']), 1)
+        self.assertGreater(response.data['order'], self.done.order)
+        self.board.refresh_from_db()
+        self.assertEqual(self.board.version, version + 2)
+
+    @override_settings(KANBAN_COPY_INLINE_LIMIT=2, KANBAN_TASKS_EAGER=True)
+    def test_large_copies_run_as_jobs(self):
+        with mock.patch('kanban.tasks._spawn') as spawn:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(f'/api/boards/{self.board.id}/copy/', {'title': 'Big'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        # The copy hasn't run when the response is sent; the spawned thread does it
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertFalse(Board.objects.filter(title='Big').exists())
+        target, pk = spawn.call_args.args
+        target(pk)
+        job = self.client.get(f'/api/copies/{response.data["id"]}/').data
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['progress'], {'copied': 3, 'total': 3})
+        self.assertEqual(Board.objects.get(pk=job['result_id']).title, 'Big')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ArchiveTests(BoardOwnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = User.objects.create_user(username='member', email='member@example.com', password='pass')
+        BoardMembership.objects.create(board=self.board, user=self.member)
+        self.todo = List.objects.create(board=self.board, title='Todo')
+        self.card = Card.objects.create(list=self.todo, title='Quarterly report')
+        self.card.labels.add(Label.objects.create(board=self.board, name='finance'))
+        self.card.assignees.add(self.member)
+        checklist = Checklist.objects.create(card=self.card, title='Steps')
+        ChecklistItem.objects.create(checklist=checklist, text='Collect receipts')
+        Comment.objects.create(card=self.card, author=self.user, text='Due soon')
+        name = default_storage.save('attachments/report.txt', BytesIO(b'numbers'))
+        Attachment.objects.create(card=self.card, file=name, uploaded_by=self.user)
+        Notification.objects.create(user=self.member, message='m', type='card_assigned', board=self.board, card=self.card)
+
+    def test_archived_lists_and_cards_are_hidden_until_restored(self):
+        earlier = Card.objects.create(list=self.todo, title='Old report')
+        self.assertEqual(self.client.post(f'/api/cards/{earlier.id}/archive/').status_code, 204)
+        self.assertEqual(self.client.post(f'/api/lists/{self.todo.id}/archive/').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/boards/{self.board.id}/').data['lists'], [])
+        self.assertEqual(self.client.get('/api/cards/').data, [])
+        self.assertEqual(self.client.get('/api/comments/', {'card': self.card.id}).data, [])
+        self.assertEqual(search(self.user, 'receipts'), [])
+        archived = self.client.get(f'/api/boards/{self.board.id}/archive/').data
+        self.assertEqual([row['id'] for row in archived['cards']], [self.card.id, earlier.id])
+        self.assertEqual(self.client.post(f'/api/cards/{self.card.id}/restore/').status_code, 409)
+
+        response = self.client.post(f'/api/lists/{self.todo.id}/restore/')
+        self.assertEqual(response.status_code, 200)
+        # Cards archived on their own stay archived
+        self.assertEqual([card['id'] for card in response.data['cards']], [self.card.id])
+        self.assertEqual(len(search(self.user, 'receipts')), 1)
+
+    def test_archived_board_is_hidden_and_admins_restore_it(self):
+        self.assertEqual(self.client.get(f'/api/boards/{self.board.id}/').status_code, 200)
+        self.client.force_authenticate(self.member)
+        self.assertEqual(self.client.post(f'/api/boards/{self.board.id}/archive/').status_code, 403)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post(f'/api/boards/{self.board.id}/archive/').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/boards/{self.board.id}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/boards/').data, [])
+        self.assertEqual(search(self.user, 'report'), [])
+        self.assertEqual([b['id'] for b in self.client.get('/api/boards/', {'archived': 'true'}).data], [self.board.id])
+
+        response = self.client.post(f'/api/boards/{self.board.id}/restore/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['lists'][0]['cards']), 1)
+
+    def test_delete_archives_then_purges_in_batches(self):
+        name = Attachment.objects.get().file.name
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.assertEqual(self.client.delete(f'/api/boards/{self.board.id}/').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/boards/{self.board.id}/').status_code, 404)
+        self.assertTrue(Card.all_objects.filter(pk=self.card.pk).exists())
+        # Eager mode hands tasks to a thread; run it inline so it shares the test transaction
+        with mock.patch('kanban.tasks._spawn', side_effect=lambda target, *args: target(*args)) as spawn:
+            for callback in callbacks:
+                callback()
+        spawn.assert_called_once()
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+        for model in (Board, List, Card):
+            self.assertFalse(model.all_objects.exists())
+        for model in (Checklist, ChecklistItem, Comment, Attachment, Label, BoardMembership, Card.labels.through):
+            self.assertFalse(model.objects.exists(), model)
+        self.assertFalse(default_storage.exists(name))
+        notification = Notification.objects.get()
+        self.assertEqual((notification.board_id, notification.card_id), (None, None))
+
+    def test_purge_rows_batches(self):
+        for i in range(5):
+            Card.objects.create(list=self.todo, title=f'Card {i}')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(purge_rows(Card.all_objects.filter(list=self.todo), batch_size=2), 6)
+        deletes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('DELETE FROM "kanban_card"')]
+        self.assertEqual(len(deletes), 3)
+        self.assertFalse(Comment.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BoardTransferTests(BoardOwnerTestCase):
+    board_fields = {'title': 'Launch'}
+
+    def setUp(self):
+        super().setUp()
+        self.helper = User.objects.create_user(username='helper', email='helper@example.com', password='pass')
+        self.mover = User.objects.create_user(username='mover', email='mover@example.com', password='pass')
+        BoardMembership.objects.create(board=self.board, user=self.helper, role='admin')
+        self.label = Label.objects.create(board=self.board, name='blocker')
+        self.shared = Label.objects.create(name='urgent')
+        self.todo = List.objects.create(board=self.board, title='Todo', order=1)
+        self.make_card('Write announcement')
+
+    def make_card(self, title):
+        card = Card.objects.create(list=self.todo, title=title, order=Card.objects.count() + 1)
+        card.labels.add(self.label, self.shared)
+        card.assignees.add(self.helper)
+        checklist = Checklist.objects.create(card=card, title='Steps')
+        ChecklistItem.objects.create(checklist=checklist, text='Proofread', completed=True)
+        Comment.objects.create(card=card, author=self.helper, text='Looks good')
+        return card
+
+    def export(self, url='/api/boards/{}/export/', **params):
+        response = self.client.get(url.format(self.board.id), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_zip_roundtrip_copies_the_board_and_its_files(self):
+        upload = SimpleUploadedFile('plan.txt', b'the plan', content_type='text/plain')
+        response = self.client.post(
+            '/api/attachments/', {'card': Card.objects.get().id, 'file': upload}, format='multipart',
+        )
+        self.assertEqual(response.status_code, 201)
+        archive = self.export(archive='true')
+
+        self.client.force_authenticate(self.mover)
+        response = self.client.post(
+            '/api/boards/import/', {'file': SimpleUploadedFile('boards.zip', archive)}, format='multipart',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([board['title'] for board in response.data], ['Launch'])
+        board = Board.objects.get(pk=response.data[0]['id'])
+        self.assertEqual(board.created_by, self.mover)
+        self.assertEqual(
+            set(BoardMembership.objects.filter(board=board).values_list('user_id', 'role')),
+            {(self.mover.id, 'owner')},
+        )
+        card = Card.objects.get(list__board=board)
+        self.assertEqual(card.title, 'Write announcement')
+        self.assertEqual(set(card.labels.values_list('name', 'board_id')), {('blocker', board.id), ('urgent', None)})
+        self.assertEqual(card.labels.get(name='urgent'), self.shared)
+        self.assertEqual(list(ChecklistItem.objects.filter(checklist__card=card).values_list('text', 'completed')),
+                         [('Proofread', True)])
+        attachment = Attachment.objects.get(card=card)
+        self.assertEqual((attachment.original_name, attachment.size, attachment.uploaded_by), ('plan.txt', 8, self.mover))
+        with default_storage.open(attachment.file.name) as stored:
+            self.assertEqual(stored.read(), b'the plan')
+        self.assertEqual([hit['id'] for hit in search(self.mover, 'announcement', board_id=board.id)], [card.id])
+        self.assertEqual(self.client.get(f'/api/boards/{board.id}/').status_code, 200)
+
+    def test_uploaded_exports_cannot_name_other_accounts(self):
+        # The export names the owner and helper as members, assignees and authors
+        ndjson = self.export()
+        self.client.force_authenticate(self.mover)
+        response = self.client.post(
+            '/api/boards/import/', {'file': SimpleUploadedFile('boards.ndjson', ndjson)}, format='multipart',
+        )
+        self.assertEqual(response.status_code, 201)
+        card = Card.objects.get(list__board_id=response.data[0]['id'])
+        self.assertEqual(list(card.assignees.all()), [])
+        self.assertEqual(list(card.comments.values_list('author_id', flat=True)), [self.mover.id])
+        self.assertEqual(BoardMembership.objects.filter(board_id=response.data[0]['id']).count(), 1)
+
+    def test_plain_ndjson_import_ignores_file_references(self):
+        Attachment.objects.create(
+            card=Card.objects.get(), uploaded_by=self.user, file=SimpleUploadedFile('secret.txt', b'secret'),
+        )
+        ndjson = self.export()
+        self.client.force_authenticate(self.mover)
+        response = self.client.post(
+            '/api/boards/import/', {'file': SimpleUploadedFile('boards.ndjson', ndjson)}, format='multipart',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Attachment.objects.filter(card__list__board_id=response.data[0]['id']).exists())
+
+    def test_export_queries_do_not_grow_with_the_board(self):
+        self.export()  # caches the user's board roles
+        with CaptureQueriesContext(connection) as small:
+            self.export()
+        for i in range(20):
+            self.make_card(f'Card {i}')
+        with CaptureQueriesContext(connection) as large:
+            lines = self.export().splitlines()
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(sum(b'"type": "card"' in line for line in lines), 21)
+
+    def test_invalid_exports_are_rejected_without_writes(self):
+        broken = self.export().replace(b'"type": "comment"', b'"type": "mystery"')
+        self.client.force_authenticate(self.mover)
+        for content in (b'not json', b'{"type": "board", "title": "x"}', broken):
+            response = self.client.post(
+                '/api/boards/import/', {'file': SimpleUploadedFile('boards.ndjson', content)}, format='multipart',
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Board.objects.count(), 1)
+        self.assertEqual(Card.objects.count(), 1)
+
+    def test_other_boards_are_not_exported(self):
+        self.client.force_authenticate(self.mover)
+        self.assertEqual(self.client.get(f'/api/boards/{self.board.id}/export/').status_code, 404)
+        lines = self.export('/api/boards/export/').splitlines()
+        self.assertEqual(len(lines), 1)
+
+    def test_commands_roundtrip(self):
+        path = tempfile.mkstemp(suffix='.ndjson')[1]
+        call_command('export_boards', path, '--user', 'helper@example.com', stdout=StringIO())
+        out = StringIO()
+        call_command('import_boards', path, '--user', 'mover@example.com', stdout=out)
+        self.assertIn('Imported 1 board(s).', out.getvalue())
+        board = Board.objects.get(created_by=self.mover, title='Launch')
+        # The command is run by an operator, so accounts are matched by email
+        self.assertEqual(
+            set(BoardMembership.objects.filter(board=board).values_list('user_id', 'role')),
+            {(self.mover.id, 'owner'), (self.user.id, 'owner'), (self.helper.id, 'admin')},
+        )
+        card = Card.objects.get(list__board=board)
+        self.assertEqual(list(card.assignees.all()), [self.helper])
+        self.assertEqual(list(card.comments.values_list('author_id', flat=True)), [self.helper.id])
+        self.assertEqual(b''.join(export_ndjson([self.board.id])).count(b'\n'), 16)
 
-# Create your tests here.
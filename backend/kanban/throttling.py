@@ -0,0 +1,148 @@
+"""
+Token-bucket throttling for DRF views.
+
+A view opts in with ``throttle_classes`` and a ``throttle_scope`` naming
+its budget in ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`` ('10/min' = a
+bucket of 10 tokens refilled at 10 per minute, so short bursts pass and
+sustained traffic is held to the rate). ``UserBucketThrottle`` keys the
+bucket on the user (the client IP for anonymous requests) and
+``IPBucketThrottle`` on the IP. DRF runs throttles before the handler
+and answers 429 with ``Retry-After`` set from ``wait()``.
+
+Buckets live in the store named by ``KANBAN_THROTTLE_STORE``.
+``LocalBucketStore`` keeps them in process memory without locking (each
+update replaces one tuple; two threads racing for the last token may both
+get it, which only makes the limit slightly soft). Deployments with
+several workers can use ``CacheBucketStore`` to share buckets through the
+cache, at the price of a cache round trip per request.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class BaseBucketStore:
+    def consume(self, key, capacity, rate):
+        """
+        Take one token from bucket ``key`` (``capacity`` tokens, refilled
+        at ``rate`` per second). Returns 0 if allowed, otherwise the
+        seconds until a token is available.
+        """
+        raise NotImplementedError
+
+
+def _refill(bucket, capacity, rate, now):
+    if bucket is None:
+        return capacity
+    tokens, stamp = bucket[:2]
+    return min(capacity, tokens + (now - stamp) * rate)
+
+
+class LocalBucketStore(BaseBucketStore):
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = {}
+
+    def consume(self, key, capacity, rate):
+        now = time.monotonic()
+        tokens = _refill(self._buckets.get(key), capacity, rate, now)
+        if tokens < 1:
+            return (1 - tokens) / rate
+        # Also remember when the bucket will have refilled to capacity
+        self._buckets[key] = (tokens - 1, now, now + (capacity - tokens + 1) / rate)
+        if len(self._buckets) > self.max_keys:
+            self._prune(now)
+        return 0
+
+    def _prune(self, now):
+        # A dropped bucket restarts full, so only buckets that have refilled
+        # since their last use can go without letting anyone exceed the rate.
+        # If that isn't enough, drop the ones closest to full.
+        for key, (_, _, full_at) in list(self._buckets.items()):
+            if full_at <= now:
+                self._buckets.pop(key, None)
+        excess = len(self._buckets) - self.max_keys
+        if excess > 0:
+            for key, _ in sorted(self._buckets.items(), key=lambda item: item[1][2])[:excess]:
+                self._buckets.pop(key, None)
+
+
+class CacheBucketStore(BaseBucketStore):
+    """Buckets in a shared Django cache (``KANBAN_THROTTLE_CACHE``, default 'default')."""
+
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'KANBAN_THROTTLE_CACHE', 'default')]
+
+    def consume(self, key, capacity, rate):
+        now = time.time()
+        tokens = _refill(self.cache.get(key), capacity, rate, now)
+        if tokens < 1:
+            return (1 - tokens) / rate
+        # A full refill takes capacity / rate seconds; after that the entry is redundant
+        self.cache.set(key, (tokens - 1, now), math.ceil(capacity / rate))
+        return 0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = getattr(settings, 'KANBAN_THROTTLE_STORE', 'kanban.throttling.LocalBucketStore')
+                _store = import_string(path)()
+    return _store
+
+
+class BucketThrottle(SimpleRateThrottle):
+    """Token bucket sized by the rate of the view's ``throttle_scope`` (or the class ``scope``)."""
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        # The scope comes from the view, so the rate is resolved per request
+        pass
+
+    def get_rate(self):
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            return super().get_rate()
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None) or self.scope
+        if not self.scope:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.get_rate())
+        if self.num_requests is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.delay = get_store().consume(self.key, self.num_requests, self.num_requests / self.duration)
+        return self.delay == 0
+
+    def wait(self):
+        return self.delay
+
+
+class UserBucketThrottle(BucketThrottle):
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class IPBucketThrottle(BucketThrottle):
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': f'ip:{self.get_ident(request)}'}
@@ -0,0 +1,387 @@
+"""
+Board export and import in a streaming NDJSON format.
+
+An export is one JSON object per line: a ``meta`` header, then users,
+boards, memberships, labels, lists, cards, card labels and assignees,
+checklists, items, comments and attachments, parents before children.
+Records carry their source ids (``id``, ``board_id``, ``card_id``, ...).
+Each type is read with one ``iterator()`` query in chunks, so memory
+stays flat however large the boards are. Archived lists and cards are
+left out. ``export_zip`` wraps the same stream as ``boards.ndjson`` in a
+zip, with each attachment blob under ``files/<storage name>``, written as
+it goes to a stream that is never seeked.
+
+``import_boards`` reads a stream line by line in one transaction. It
+bulk-inserts each type in batches and maps source ids to the new rows.
+The importing user owns the imported boards. Anyone can hand-write an
+export, so by default it can't name other accounts or stored files: only
+the importer's own email is matched, other members and assignees are
+dropped, every comment and attachment is credited to the importer, and
+attachment files come only from the zip. With ``trusted`` set (the
+management command, run by an operator) members, assignees, authors and
+uploaders are matched by email, unmatched authors and uploaders become
+the importer, and a plain NDJSON import keeps storage names that exist.
+"""
+import json
+import zipfile
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from .access import ROLE_RANK, forget_board_access
+from .files import UploadError, check_upload_size, file_metadata, store_blob
+from .models import Attachment, Board, BoardMembership, Card, Checklist, ChecklistItem, Comment, Label, List
+from .search import rebuild
+
+User = get_user_model()
+
+FORMAT, FORMAT_VERSION = 'kanban-boards', 1
+NDJSON_NAME = 'boards.ndjson'
+FILES_DIR = 'files/'
+BATCH_SIZE = 1000
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+class TransferError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# ------------------- EXPORT -------------------
+def _sources(board_ids):
+    """(record type, queryset of dicts) for everything on ``board_ids``, parents first."""
+    CardLabel, CardAssignee = Card.labels.through, Card.assignees.through
+    user_field = Card._meta.get_field('assignees').m2m_reverse_name()
+    cards = {'card__list__board_id__in': board_ids, 'card__archived_at': None}
+    card_labels = CardLabel.objects.filter(**cards)
+    card_assignees = CardAssignee.objects.filter(**cards)
+    comments = Comment.objects.filter(**cards)
+    attachments = Attachment.objects.filter(**cards)
+    users = User.objects.filter(
+        Q(pk__in=BoardMembership.objects.filter(board_id__in=board_ids).values('user_id'))
+        | Q(pk__in=card_assignees.values(user_field))
+        | Q(pk__in=comments.values('author_id'))
+        | Q(pk__in=attachments.values('uploaded_by_id'))
+    )
+    return [
+        ('user', users.values('id', 'email', 'username')),
+        ('board', Board.objects.filter(pk__in=board_ids).values(
+            'id', 'title', 'description', 'color', 'icon', 'background_theme', 'is_template', 'created_at',
+        )),
+        ('membership', BoardMembership.objects.filter(board_id__in=board_ids).values(
+            'board_id', 'user_id', 'role', 'added_at',
+        )),
+        # Global labels (no board) are exported when cards use them and matched by name on import
+        ('label', Label.objects.filter(
+            Q(board_id__in=board_ids) | Q(board=None, pk__in=card_labels.values('label_id'))
+        ).values('id', 'board_id', 'name', 'color', 'text_color')),
+        ('list', List.objects.filter(board_id__in=board_ids).values('id', 'board_id', 'title', 'order', 'created_at')),
+        ('card', Card.objects.filter(list__board_id__in=board_ids, list__archived_at=None).values(
+            'id', 'list_id', 'title', 'description', 'due_date', 'order', 'is_template', 'created_at',
+        )),
+        ('card_label', card_labels.values('card_id', 'label_id')),
+        ('card_assignee', card_assignees.values('card_id', user_id=F(user_field))),
+        ('checklist', Checklist.objects.filter(**cards).values('id', 'card_id', 'title', 'created_at')),
+        ('checklist_item', ChecklistItem.objects.filter(
+            checklist__card__list__board_id__in=board_ids, checklist__card__archived_at=None,
+        ).values('id', 'checklist_id', 'text', 'completed', 'created_at')),
+        ('comment', comments.values('id', 'card_id', 'author_id', 'text', 'created_at')),
+        ('attachment', attachments.exclude(file='').values(
+            'id', 'card_id', 'uploaded_by_id', 'file', 'uploaded_at', 'size', 'content_type', 'checksum',
+            'original_name',
+        )),
+    ]
+
+
+def export_records(board_ids):
+    """
+    Every record of the boards ``board_ids`` (a list of ids or a
+    ``values('pk')`` queryset), starting with the ``meta`` header.
+    """
+    yield {'type': 'meta', 'format': FORMAT, 'version': FORMAT_VERSION, 'exported_at': timezone.now()}
+    for kind, rows in _sources(board_ids):
+        for row in rows.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+            yield {'type': kind, **row}
+
+
+def export_ndjson(board_ids):
+    """The export as chunks of NDJSON bytes."""
+    lines = []
+    for record in export_records(board_ids):
+        lines.append(json.dumps(record, cls=DjangoJSONEncoder))
+        if len(lines) >= BATCH_SIZE:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+class _StreamBuffer:
+    """Write-only file that ZipFile writes into and the export generator drains."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_zip(board_ids):
+    """The export and its attachment blobs as chunks of a zip archive."""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(NDJSON_NAME, 'w', force_zip64=True) as member:
+            for chunk in export_ndjson(board_ids):
+                member.write(chunk)
+                yield buffer.drain()
+        names = (
+            Attachment.objects.filter(card__list__board_id__in=board_ids, card__archived_at=None)
+            .exclude(file='').order_by('file').values_list('file', flat=True).distinct()
+        )
+        for name in names.iterator(chunk_size=BATCH_SIZE):
+            try:
+                source = default_storage.open(name, 'rb')
+            except FileNotFoundError:
+                continue
+            with source, archive.open(FILES_DIR + name, 'w', force_zip64=True) as member:
+                for chunk in iter(lambda: source.read(FILE_CHUNK_SIZE), b''):
+                    member.write(chunk)
+                    yield buffer.drain()
+    yield buffer.drain()
+
+
+# ------------------- IMPORT -------------------
+# record type -> (model, {foreign key: parent record type}, fields copied as is)
+IMPORTS = {
+    'board': (Board, {}, ['title', 'description', 'color', 'icon', 'background_theme', 'is_template', 'created_at']),
+    'label': (Label, {'board_id': 'board'}, ['name', 'color', 'text_color']),
+    'list': (List, {'board_id': 'board'}, ['title', 'order', 'created_at']),
+    'card': (Card, {'list_id': 'list'}, ['title', 'description', 'due_date', 'order', 'is_template', 'created_at']),
+    'checklist': (Checklist, {'card_id': 'card'}, ['title', 'created_at']),
+    'checklist_item': (ChecklistItem, {'checklist_id': 'checklist'}, ['text', 'completed', 'created_at']),
+    'comment': (Comment, {'card_id': 'card'}, ['text', 'created_at']),
+    'attachment': (
+        Attachment, {'card_id': 'card'}, ['uploaded_at', 'size', 'content_type', 'checksum', 'original_name'],
+    ),
+}
+
+
+def read_ndjson(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise TransferError(f'Line {number} is not valid JSON.')
+        if not isinstance(record, dict) or not isinstance(record.get('type'), str):
+            raise TransferError(f'Line {number} is not a record.')
+        yield record
+
+
+class _Importer:
+    def __init__(self, user, open_file, trusted):
+        self.user = user
+        self.open_file = open_file
+        self.trusted = trusted
+        # record type -> {source id: new id}; 'user' maps to existing accounts
+        self.ids = defaultdict(dict)
+        self.memberships = []
+
+    def run(self, records):
+        kind, batch = None, []
+        for record in records:
+            if kind is None:
+                if record['type'] != 'meta' or record.get('format') != FORMAT:
+                    raise TransferError('Not a board export.')
+                if record.get('version') != FORMAT_VERSION:
+                    raise TransferError(f'Unsupported export version {record.get("version")}.')
+                kind = 'meta'
+                continue
+            if record['type'] != kind or len(batch) >= BATCH_SIZE:
+                self._flush(kind, batch)
+                kind, batch = record['type'], []
+            batch.append(record)
+        if kind is None:
+            raise TransferError('The export is empty.')
+        self._flush(kind, batch)
+        self._finish()
+
+    def _flush(self, kind, records):
+        if not records:
+            return
+        if kind == 'user':
+            self._map_users(records)
+        elif kind == 'membership':
+            self.memberships.extend(records)
+        elif kind == 'label':
+            self._map_global_labels([record for record in records if record.get('board_id') is None])
+            self._insert(kind, [record for record in records if record.get('board_id') is not None])
+        elif kind in ('card_label', 'card_assignee'):
+            self._link(kind, records)
+        elif kind in IMPORTS:
+            self._insert(kind, records)
+        else:
+            raise TransferError(f'Unknown record type {kind!r}.')
+
+    def _insert(self, kind, records):
+        model, parents, fields = IMPORTS[kind]
+        objects, source_ids = [], []
+        for record in records:
+            values = {name: record[name] for name in fields if name in record}
+            for field, parent_kind in parents.items():
+                values[field] = self.ids[parent_kind].get(record.get(field))
+            if any(values[field] is None for field in parents):
+                # Its parent wasn't imported
+                continue
+            extra = self._extra_values(kind, record)
+            if extra is None:
+                continue
+            objects.append(model(**{**values, **extra}))
+            source_ids.append(record.get('id'))
+        model.objects.bulk_create(objects)
+        self.ids[kind].update((source_id, obj.pk) for source_id, obj in zip(source_ids, objects))
+
+    def _extra_values(self, kind, record):
+        """Fields that aren't copied verbatim; None skips the record."""
+        if kind == 'board':
+            return {'created_by': self.user}
+        if kind == 'comment':
+            return {'author_id': self.ids['user'].get(record.get('author_id'), self.user.pk)}
+        if kind == 'attachment':
+            uploader = {'uploaded_by_id': self.ids['user'].get(record.get('uploaded_by_id'), self.user.pk)}
+            stored = self._store_file(record)
+            return None if stored is None else {**uploader, **stored}
+        return {}
+
+    def _store_file(self, record):
+        name = record.get('file')
+        if not isinstance(name, str) or not name:
+            return None
+        source = self.open_file(name) if self.open_file else None
+        if source is None:
+            if self.trusted and default_storage.exists(name):
+                return {'file': name}
+            return None
+        with source:
+            original_name = record.get('original_name') or name
+            fileobj = File(source, name=original_name)
+            metadata = file_metadata(fileobj, original_name, record.get('content_type'))
+            if not self.trusted:
+                check_upload_size(self.user, metadata['size'])
+            return {'file': store_blob(fileobj, metadata), **metadata}
+
+    def _map_users(self, records):
+        emails = {record['id']: record['email'].upper() for record in records if record.get('email')}
+        if not self.trusted:
+            # An uploaded file can only speak for the importer
+            own = self.user.email.upper()
+            emails = {source_id: email for source_id, email in emails.items() if email == own}
+            self.ids['user'].update((source_id, self.user.pk) for source_id in emails)
+            return
+        found = (
+            User.objects.alias(email_upper=Upper('email')).filter(email_upper__in=set(emails.values()))
+            .order_by('-pk').values_list('email', 'pk')
+        )
+        # The oldest account wins when several share an email
+        local = {email.upper(): pk for email, pk in found}
+        for source_id, email in emails.items():
+            if email in local:
+                self.ids['user'][source_id] = local[email]
+
+    def _map_global_labels(self, records):
+        names = {record.get('name') for record in records}
+        local = dict(Label.objects.filter(board=None, name__in=names).order_by('-pk').values_list('name', 'pk'))
+        for record in records:
+            if record.get('name') in local:
+                self.ids['label'][record.get('id')] = local[record['name']]
+
+    def _link(self, kind, records):
+        if kind == 'card_label':
+            through, target, target_kind = Card.labels.through, 'label_id', 'label'
+        else:
+            through, target, target_kind = Card.assignees.through, 'user_id', 'user'
+            user_field = Card._meta.get_field('assignees').m2m_reverse_name()
+        rows = []
+        for record in records:
+            card_id = self.ids['card'].get(record.get('card_id'))
+            target_id = self.ids[target_kind].get(record.get(target))
+            if card_id is None or target_id is None:
+                continue
+            if kind == 'card_label':
+                rows.append(through(card_id=card_id, label_id=target_id))
+            else:
+                rows.append(through(card_id=card_id, **{user_field: target_id}))
+        through.objects.bulk_create(rows, ignore_conflicts=True)
+
+    def _finish(self):
+        board_ids = list(self.ids['board'].values())
+        roles = {(board_id, self.user.pk): 'owner' for board_id in board_ids}
+        for record in self.memberships:
+            key = (self.ids['board'].get(record.get('board_id')), self.ids['user'].get(record.get('user_id')))
+            if None not in key and key not in roles:
+                roles[key] = record.get('role') if record.get('role') in ROLE_RANK else 'member'
+        BoardMembership.objects.bulk_create([
+            BoardMembership(board_id=board_id, user_id=user_id, role=role)
+            for (board_id, user_id), role in roles.items()
+        ])
+        for board_id in board_ids:
+            forget_board_access(board_id)
+        rebuild(cards=Card.objects.filter(list__board_id__in=board_ids))
+
+
+def import_boards(lines, user, open_file=None, trusted=False):
+    """
+    Import an NDJSON export (an iterable of lines) for ``user``; returns the
+    new board ids. ``open_file(name)`` returns a packed attachment file or None.
+    """
+    importer = _Importer(user, open_file, trusted)
+    try:
+        with transaction.atomic():
+            importer.run(read_ndjson(lines))
+    except UploadError as exc:
+        raise TransferError(str(exc), exc.status_code)
+    except (KeyError, TypeError, ValueError, AttributeError, ValidationError, IntegrityError, DataError) as exc:
+        raise TransferError(f'Invalid export: {exc}')
+    return list(importer.ids['board'].values())
+
+
+def import_file(fileobj, user, trusted=False):
+    """Import an NDJSON export or a zip made by ``export_zip`` from a seekable binary file."""
+    if not zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        return import_boards(fileobj, user, trusted=trusted)
+    fileobj.seek(0)
+    with zipfile.ZipFile(fileobj) as archive:
+        packed = set(archive.namelist())
+        if NDJSON_NAME not in packed:
+            raise TransferError(f'The archive has no {NDJSON_NAME}.')
+
+        def open_file(name):
+            return archive.open(FILES_DIR + name) if FILES_DIR + name in packed else None
+
+        with archive.open(NDJSON_NAME) as lines:
+            return import_boards(lines, user, open_file, trusted)
@@ -1,22 +1,49 @@
 from django.urls import path
 from .views import (
-    BoardAPI, ListAPI, CardAPI, LabelAPI, ChecklistAPI, ChecklistItemAPI, CommentAPI, AttachmentAPI, BoardImageUploadAPI, NotificationListView, NotificationMarkReadView, NotificationDeleteView
+    BoardAPI, BoardChangesAPI, ListAPI, ListMoveAPI, CardAPI, CardMoveAPI, LabelAPI, ChecklistAPI, ChecklistItemAPI, CommentAPI, AttachmentAPI, BoardImageUploadAPI, UploadAPI, SearchAPI, NotificationListView, NotificationCountView, NotificationMarkReadView, NotificationDeleteView,
+    NotificationBatchDeleteView, BatchAPI, CopyAPI, CopyJobAPI, ArchiveAPI,
+    BoardExportAPI, BoardImportAPI,
+    board_events, attachment_download,
 )
 
 urlpatterns = [
     path('boards/', BoardAPI.as_view(), name='board-list'),
+    path('boards/export/', BoardExportAPI.as_view(), name='board-export-all'),
+    path('boards/import/', BoardImportAPI.as_view(), name='board-import'),
     path('boards/<int:id>/', BoardAPI.as_view(), name='board-detail'),
+    path('boards/<int:id>/export/', BoardExportAPI.as_view(), name='board-export'),
+    path('boards/<int:id>/events/', board_events, name='board-events'),
+    path('boards/<int:id>/changes/', BoardChangesAPI.as_view(), name='board-changes'),
+    path('boards/<int:id>/copy/', CopyAPI.as_view(kind='board'), name='board-copy'),
+    path('boards/<int:id>/archive/', ArchiveAPI.as_view(kind='board'), name='board-archive'),
+    path('boards/<int:id>/restore/', ArchiveAPI.as_view(kind='board', restore=True), name='board-restore'),
+    path('copies/<uuid:id>/', CopyJobAPI.as_view(), name='copy-job'),
+    path('search/', SearchAPI.as_view(), name='search'),
+    path('batch/', BatchAPI.as_view(), name='batch'),
     path('lists/', ListAPI.as_view(), name='list-list'),
+    path('lists/move/', ListMoveAPI.as_view(), name='list-move'),
     path('lists/<int:id>/', ListAPI.as_view(), name='list-detail'),
+    path('lists/<int:id>/copy/', CopyAPI.as_view(kind='list'), name='list-copy'),
+    path('lists/<int:id>/archive/', ArchiveAPI.as_view(kind='list'), name='list-archive'),
+    path('lists/<int:id>/restore/', ArchiveAPI.as_view(kind='list', restore=True), name='list-restore'),
     path('cards/', CardAPI.as_view(), name='card-list'),
+    path('cards/move/', CardMoveAPI.as_view(), name='card-move'),
     path('cards/<int:id>/', CardAPI.as_view(), name='card-detail'),
+    path('cards/<int:id>/copy/', CopyAPI.as_view(kind='card'), name='card-copy'),
+    path('cards/<int:id>/archive/', ArchiveAPI.as_view(kind='card'), name='card-archive'),
+    path('cards/<int:id>/restore/', ArchiveAPI.as_view(kind='card', restore=True), name='card-restore'),
     path('labels/', LabelAPI.as_view(), name='label-list'),
     path('checklists/', ChecklistAPI.as_view(), name='checklist-list'),
     path('checklist-items/', ChecklistItemAPI.as_view(), name='checklistitem-list'),
     path('checklist-items/<int:id>/', ChecklistItemAPI.as_view(), name='checklistitem-detail'),
     path('comments/', CommentAPI.as_view(), name='comment-list'),
     path('attachments/', AttachmentAPI.as_view(), name='attachment-list'),
+    path('attachments/<int:id>/download/', attachment_download, name='attachment-download'),
+    path('uploads/', UploadAPI.as_view(), name='upload-list'),
+    path('uploads/<uuid:id>/', UploadAPI.as_view(), name='upload-detail'),
     path('notifications/', NotificationListView.as_view(), name='notifications-list'),
+    path('notifications/unread-count/', NotificationCountView.as_view(), name='notifications-unread-count'),
+    path('notifications/delete/', NotificationBatchDeleteView.as_view(), name='notifications-delete'),
     path('notifications/mark-read/', NotificationMarkReadView.as_view(), name='notifications-mark-read'),
     path('notifications/<int:pk>/delete/', NotificationDeleteView.as_view(), name='notification-delete'),
 ]
@@ -1,30 +1,98 @@
+import asyncio
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Board, List, Card, Label, Checklist, ChecklistItem, Comment, BoardMembership, Attachment, Notification
+from rest_framework.utils.urls import replace_query_param
+from accounts.authentication import ClaimsJWTAuthentication
+from .models import Board, List, Card, Label, Checklist, ChecklistItem, Comment, BoardMembership, Attachment, Notification, Upload, CopyJob
 from .serializers import (
-    BoardSerializer, ListSerializer, CardSerializer,
+    BoardSerializer, BoardSummarySerializer, ListSerializer, CardSerializer,
     LabelSerializer, ChecklistSerializer, ChecklistItemSerializer, CommentSerializer, AttachmentSerializer,
-    NotificationSerializer,
+    NotificationSerializer, MoveSerializer, CardMoveSerializer, UploadSerializer, CopySerializer, CopyJobSerializer,
+)
+from . import archive
+from .access import BoardAccessMixin, board_ids, check_archived_board, check_board, has_role, load_with_board
+from .batch import BatchError, run_batch
+from .cache import board_snapshot_key, board_summary_key, bump_board, etag_for, etag_matches, get_board_snapshot
+from .changes import record_change, record_changes, delta_since
+from .cleanup import delete_stored_files
+from .copying import start_copy
+from .downloads import download_token_user, serve_stored_file
+from . import inbox
+from .images import generate_derivatives, source_of
+from .events import compact, prefetch_compact, board_channel, get_broker, format_sse
+from .files import (
+    UploadError, append_chunk, check_upload_size, discard_partial, finish_upload, partial_path, store_uploaded_file,
+)
+from .filters import (
+    filter_lists, filter_cards, filter_labels, filter_checklists, filter_checklist_items, filter_comments,
+    filter_notifications,
 )
+from .ordering import MoveError, apply_moves
+from .pagination import KeysetPagination, paginate
+from .search import reindex_cards, search
+from .queries import board_tree_queryset, board_summary_queryset, list_tree_queryset, card_tree_queryset, board_id_for
+from .tasks import enqueue
+from .throttling import UserBucketThrottle
+from .transfer import TransferError, export_ndjson, export_zip, import_file
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 
+User = get_user_model()
+
+EVENT_STREAM_HEARTBEAT = 15
+
+# kind -> (model, serializer, queryset with the object's tree prefetched)
+RESOURCE_TREES = {
+    'board': (Board, BoardSerializer, board_tree_queryset),
+    'list': (List, ListSerializer, list_tree_queryset),
+    'card': (Card, CardSerializer, card_tree_queryset),
+}
+
 # ------------------- BOARD -------------------
-class BoardAPI(APIView):
-    permission_classes = [IsAuthenticated]
+class BoardAPI(BoardAccessMixin, APIView):
+    board_roles_required = {'DELETE': 'admin'}
 
     def get(self, request, id=None):
         if id is not None:
-            board = get_object_or_404(Board, id=id, members=request.user)
-            serializer = BoardSerializer(board)
+            check_board(request, id)
+            board = get_object_or_404(Board.objects.only('id', 'version'), id=id)
+            key = board_snapshot_key(board)
+            etag = etag_for(key)
+            if etag_matches(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+            data = get_board_snapshot(key, lambda: BoardSerializer(board_tree_queryset().get(pk=board.pk)).data)
+            return Response(data, headers={'ETag': etag})
+        if request.query_params.get('archived') == 'true':
+            boards = Board.all_objects.filter(archived_at__isnull=False, boardmembership__user=request.user)
+            boards = board_summary_queryset(boards).order_by('-archived_at', '-id')
+            return Response(BoardSummarySerializer(boards, many=True).data)
+        # The index only needs tiles; the full tree is opt-in with ?view=full
+        if request.query_params.get('view') == 'full':
+            boards = board_tree_queryset().filter(pk__in=board_ids(request))
+            serializer = BoardSerializer(boards, many=True)
             return Response(serializer.data)
-        boards = Board.objects.filter(members=request.user)
-        serializer = BoardSerializer(boards, many=True)
-        return Response(serializer.data)
+        key = board_summary_key(request.user)
+        etag = etag_for(key)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        boards = board_summary_queryset().filter(pk__in=board_ids(request)).order_by('created_at', 'id')
+        data = get_board_snapshot(key, lambda: BoardSummarySerializer(boards, many=True).data)
+        return Response(data, headers={'ETag': etag})
 
     def post(self, request):
         serializer = BoardSerializer(data=request.data)
@@ -36,19 +104,21 @@ class BoardAPI(APIView):
 
     def patch(self, request, id=None):
         board_id = id or request.data.get("id")
-        board = get_object_or_404(Board, id=board_id)
+        board = self.get_board_object(Board, id=board_id)
         serializer = BoardSerializer(board, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            board = serializer.save()
+            record_change(board.id, 'board', 'updated', board)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def put(self, request, id=None):
         board_id = id or request.data.get("id")
-        board = get_object_or_404(Board, id=board_id)
+        board = self.get_board_object(Board, id=board_id)
         serializer = BoardSerializer(board, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            board = serializer.save()
+            record_change(board.id, 'board', 'updated', board)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -56,42 +126,251 @@ class BoardAPI(APIView):
         board_id = id or request.data.get('id') or request.query_params.get('id')
         if not board_id:
             return Response({'detail': 'Board id required.'}, status=status.HTTP_400_BAD_REQUEST)
-        board = get_object_or_404(Board, pk=board_id)
-        board.delete()
+        board = self.get_board_object(Board.objects.only('id'), pk=board_id)
+        # Archived at once; the rows are purged on the task queue
+        archive.delete('board', board, board.pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-# ------------------- LIST -------------------
-class ListAPI(APIView):
+class BoardChangesAPI(BoardAccessMixin, APIView):
+
+    def get(self, request, id):
+        try:
+            since = int(request.query_params.get('since', ''))
+        except ValueError:
+            return Response({'detail': 'since (integer version) required.'}, status=status.HTTP_400_BAD_REQUEST)
+        check_board(request, id)
+        board = get_object_or_404(Board, id=id)
+        changes = delta_since(board, since)
+        if changes is None:
+            # Log compacted past the client's version (or too long): send a full snapshot
+            board = board_tree_queryset().get(pk=board.pk)
+            return Response({'version': board.version, 'snapshot': BoardSerializer(board).data})
+        return Response({'version': board.version, 'changes': changes})
+
+# ------------------- BATCH -------------------
+class BatchAPI(BoardAccessMixin, APIView):
+    """
+    Many card/checklist/checklist item creates, updates and deletes in one
+    transaction; see kanban.batch for the operation format. Responds with
+    {"results": [...]} in request order, or {"errors": {index: ...}} and
+    nothing applied.
+    """
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({'errors': {'operations': 'Expected an object with "operations".'}},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = run_batch(request, request.data.get('operations'))
+        except BatchError as exc:
+            return Response({'errors': exc.errors}, status=exc.status_code)
+        return Response({'results': results})
+
+# ------------------- COPY -------------------
+class CopyAPI(BoardAccessMixin, APIView):
+    """
+    POST boards|lists|cards/<id>/copy/ deep-copies the object (see
+    kanban.copying) with optional ``title``, ``attachments`` and, for
+    boards and cards, ``template``. Lists may go to another ``board`` and
+    cards to another ``list``. Responds 201 with the copy, or 202 with a
+    job to poll at copies/<job id>/ when the copy is too large to run inline.
+    """
+    kind = None
+    # kind -> (target parameter, target model)
+    targets = {'board': (None, None), 'list': ('board', Board), 'card': ('list', List)}
+
+    def post(self, request, id):
+        model, serializer_class, tree_queryset = RESOURCE_TREES[self.kind]
+        target_param, target_model = self.targets[self.kind]
+        source = self.get_board_object(model.objects.only('id'), pk=id)
+        serializer = CopySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        options = dict(serializer.validated_data)
+        targets = {'board': options.pop('board', None), 'list': options.pop('list', None)}
+        target_id = targets.get(target_param)
+        if target_id is not None:
+            self.check_parent(target_model, target_id)
+        if self.kind == 'list':
+            options.pop('template')
+        result = start_copy(request.user, self.kind, source.pk, target_id, **options)
+        if isinstance(result, CopyJob):
+            return Response(CopyJobSerializer(result).data, status=status.HTTP_202_ACCEPTED)
+        return Response(serializer_class(tree_queryset().get(pk=result.pk)).data, status=status.HTTP_201_CREATED)
+
+class CopyJobAPI(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, id):
+        job = get_object_or_404(CopyJob, pk=id, user=request.user)
+        return Response(CopyJobSerializer(job).data)
+
+# ------------------- ARCHIVE -------------------
+class ArchiveAPI(BoardAccessMixin, APIView):
+    """
+    POST boards|lists|cards/<id>/archive/ hides the object (a list together
+    with its cards) and POST .../restore/ brings it back with its tree; see
+    kanban.archive. Boards need the admin role. GET boards/<id>/archive/
+    lists the board's archived lists and cards.
+    """
+    kind = None
+    restore = False
+
+    def get(self, request, id):
+        if self.kind != 'board' or self.restore:
+            return self.http_method_not_allowed(request)
+        check_board(request, id)
+        lists = List.all_objects.filter(board_id=id, archived_at__isnull=False).order_by('-archived_at', '-id')
+        cards = Card.all_objects.filter(list__board_id=id, archived_at__isnull=False).order_by('-archived_at', '-id')
+        return Response({
+            'lists': [{**compact(list_obj), 'archived_at': list_obj.archived_at} for list_obj in lists],
+            'cards': [{**compact(card), 'archived_at': card.archived_at} for card in prefetch_compact(cards)],
+        })
+
+    def post(self, request, id):
+        model, serializer_class, tree_queryset = RESOURCE_TREES[self.kind]
+        minimum = 'admin' if self.kind == 'board' else 'member'
+        if not self.restore:
+            obj = load_with_board(model, pk=id)
+            check_board(request, obj.access_board_id, minimum)
+            archive.archive(self.kind, obj, obj.access_board_id)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        obj = load_with_board(model.all_objects.filter(archived_at__isnull=False), pk=id)
+        if self.kind == 'board':
+            check_archived_board(request, obj.pk, minimum)
+        else:
+            check_board(request, obj.access_board_id, minimum)
+        try:
+            restored = archive.restore(self.kind, obj, obj.access_board_id)
+        except archive.ArchiveError as exc:
+            return Response({'detail': str(exc)}, status=exc.status_code)
+        return Response(serializer_class(tree_queryset().get(pk=restored.pk)).data)
+
+# ------------------- EXPORT / IMPORT -------------------
+class BoardExportAPI(APIView):
+    """
+    GET boards/<id>/export/ streams one board, and boards/export/ all of the
+    user's boards, as NDJSON (see kanban.transfer); ?archive=true sends a
+    zip with the attachment files instead.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, id=None):
+        if id is not None:
+            check_board(request, id)
+            ids, filename = [id], f'board-{id}'
+        else:
+            ids, filename = board_ids(request), 'boards'
+        if request.query_params.get('archive') == 'true':
+            response = StreamingHttpResponse(export_zip(ids), content_type='application/zip')
+            filename += '.zip'
+        else:
+            response = StreamingHttpResponse(export_ndjson(ids), content_type='application/x-ndjson')
+            filename += '.ndjson'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class BoardImportAPI(APIView):
+    """
+    POST boards/import/ with an export as ``file``, or as a completed
+    resumable ``upload`` for exports too large for one request. The user
+    owns the imported boards and is credited with their comments and
+    attachments; other accounts named in the file are ignored (only the
+    import_boards command matches them). Responds 201 with the summaries.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [UserBucketThrottle]
+    throttle_scope = 'uploads'
+
+    def post(self, request):
+        too_large = _reject_large_body(request)
+        if too_large:
+            return too_large
+        upload_id = request.data.get('upload')
+        try:
+            if upload_id:
+                upload = get_object_or_404(Upload, pk=upload_id, user=request.user)
+                if not upload.complete:
+                    return Response({'detail': 'Upload is not complete.'}, status=status.HTTP_409_CONFLICT)
+                with open(partial_path(upload), 'rb') as source:
+                    imported = import_file(source, request.user)
+                upload.delete()
+                discard_partial(upload)
+            else:
+                file_obj = request.FILES.get('file')
+                if not file_obj:
+                    return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+                imported = import_file(file_obj, request.user)
+        except TransferError as exc:
+            return Response({'detail': str(exc)}, status=exc.status_code)
+        boards = board_summary_queryset(Board.objects.filter(pk__in=imported)).order_by('id')
+        return Response(BoardSummarySerializer(boards, many=True).data, status=status.HTTP_201_CREATED)
+
+# ------------------- SEARCH -------------------
+class SearchAPI(APIView):
+    """
+    Ranked search over cards, comments and checklist items on the user's
+    boards: GET search/?q=...[&board=<id>][&page_size=N]. Each hit carries
+    an HTML-escaped ``highlight`` with matches wrapped in <mark>; the next
+    page is advertised in a Link header.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'detail': 'q required.'}, status=status.HTTP_400_BAD_REQUEST)
         board_id = request.query_params.get('board')
-        lists = List.objects.filter(board_id=board_id) if board_id else List.objects.all()
-        serializer = ListSerializer(lists, many=True)
-        return Response(serializer.data)
+        offset = request.query_params.get('offset', '0')
+        if (board_id is not None and not board_id.isdigit()) or not offset.isdigit():
+            return Response({'detail': 'board and offset must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = KeysetPagination().get_page_size(request)
+        offset = int(offset)
+        hits = search(request.user, query, board_id=board_id and int(board_id), limit=page_size + 1, offset=offset)
+        headers = {}
+        if len(hits) > page_size:
+            hits = hits[:page_size]
+            next_url = replace_query_param(request.build_absolute_uri(), 'offset', offset + page_size)
+            headers['Link'] = f'<{next_url}>; rel="next"'
+        return Response(hits, headers=headers)
+
+# ------------------- LIST -------------------
+class ListAPI(BoardAccessMixin, APIView):
+
+    def get(self, request):
+        lists = filter_lists(list_tree_queryset(), request.query_params, board_ids(request))
+        return paginate(request, lists, ListSerializer, ('order', 'id'))
 
     def post(self, request):
         serializer = ListSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            check_board(request, serializer.validated_data['board'].pk)
+            list_obj = serializer.save()
+            record_change(list_obj.board_id, 'list', 'created', list_obj)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def patch(self, request, id=None):
         list_id = id or request.data.get("id")
-        list_obj = get_object_or_404(List, id=list_id)
+        list_obj = self.get_board_object(List, id=list_id)
         serializer = ListSerializer(list_obj, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            if 'board' in serializer.validated_data:
+                check_board(request, serializer.validated_data['board'].pk)
+            list_obj = serializer.save()
+            record_change(list_obj.board_id, 'list', 'updated', list_obj)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def put(self, request, id=None):
         list_id = id or request.data.get("id")
-        list_obj = get_object_or_404(List, id=list_id)
+        list_obj = self.get_board_object(List, id=list_id)
         serializer = ListSerializer(list_obj, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            check_board(request, serializer.validated_data['board'].pk)
+            list_obj = serializer.save()
+            record_change(list_obj.board_id, 'list', 'updated', list_obj)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -99,46 +378,99 @@ class ListAPI(APIView):
         list_id = id or request.data.get('id') or request.query_params.get('id')
         if not list_id:
             return Response({'detail': 'List id required.'}, status=status.HTTP_400_BAD_REQUEST)
-        list_obj = get_object_or_404(List, pk=list_id)
-        list_obj.delete()
+        list_obj = self.get_board_object(List, pk=list_id)
+        archive.delete('list', list_obj, list_obj.board_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class ListMoveAPI(BoardAccessMixin, APIView):
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({'detail': 'Expected an object with "moves".'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = MoveSerializer(data=request.data.get('moves'), many=True, allow_empty=False, max_length=500)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        moves = serializer.validated_data
+        lists = List.objects.filter(pk__in=[m['id'] for m in moves], board_id__in=board_ids(request)).in_bulk()
+        if len(lists) != len({m['id'] for m in moves}):
+            return Response({'detail': 'List not found.'}, status=status.HTTP_404_NOT_FOUND)
+        for move in moves:
+            move['parent'] = lists[move['id']].board_id
+        try:
+            changed = apply_moves(List, Board, 'board_id', moves, lists, {m['parent'] for m in moves})
+        except MoveError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        data = [{'id': l.id, 'board': l.board_id, 'order': l.order} for l in changed]
+        for board_id in {row['board'] for row in data}:
+            record_changes(board_id, 'list', 'updated', [row for row in data if row['board'] == board_id],
+                           event_type='lists.moved')
+        return Response(data)
+
 # ------------------- CARD -------------------
-class CardAPI(APIView):
-    permission_classes = [IsAuthenticated]
+def _record_board_change(source_boards):
+    """
+    Log cards that moved to another board (``source_boards``: card id ->
+    board it left) as deleted there and created in full on the new board,
+    so delta clients of both boards stay consistent.
+    """
+    cards = Card.objects.filter(pk__in=source_boards).annotate(target_board_id=F('list__board_id'))
+    removed, created = defaultdict(list), defaultdict(list)
+    for card in prefetch_compact(cards.order_by('order', 'id')):
+        removed[source_boards[card.pk]].append({'id': card.pk})
+        created[card.target_board_id].append(compact(card))
+    for board_id, rows in removed.items():
+        record_changes(board_id, 'card', 'deleted', rows)
+    for board_id, rows in created.items():
+        record_changes(board_id, 'card', 'created', rows)
+
+def _record_card_update(card, source_board_id):
+    if board_id_for(card) == source_board_id:
+        record_change(source_board_id, 'card', 'updated', card)
+    else:
+        _record_board_change({card.pk: source_board_id})
+
+class CardAPI(BoardAccessMixin, APIView):
 
     def get(self, request, id=None):
         if id is not None:
-            card = get_object_or_404(Card, id=id)
+            card = self.get_board_object(card_tree_queryset(), id=id)
             serializer = CardSerializer(card)
             return Response(serializer.data)
-        list_id = request.query_params.get('list')
-        cards = Card.objects.filter(list_id=list_id) if list_id else Card.objects.all()
-        serializer = CardSerializer(cards, many=True)
-        return Response(serializer.data)
+        cards = filter_cards(card_tree_queryset(), request.query_params, board_ids(request))
+        return paginate(request, cards, CardSerializer, ('order', 'id'))
 
     def post(self, request):
         serializer = CardSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            check_board(request, serializer.validated_data['list'].board_id)
+            card = serializer.save()
+            record_change(board_id_for(card), 'card', 'created', card)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def put(self, request, id=None):
         card_id = id or request.data.get("id")
-        card = get_object_or_404(Card, id=card_id)
+        card = self.get_board_object(Card, id=card_id)
         serializer = CardSerializer(card, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            if 'list' in serializer.validated_data:
+                check_board(request, serializer.validated_data['list'].board_id)
+            source_board_id = board_id_for(card)
+            card = serializer.save()
+            _record_card_update(card, source_board_id)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def patch(self, request, id=None):
         card_id = id or request.data.get("id")
-        card = get_object_or_404(Card, id=card_id)
+        card = self.get_board_object(Card, id=card_id)
         serializer = CardSerializer(card, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            if 'list' in serializer.validated_data:
+                check_board(request, serializer.validated_data['list'].board_id)
+            source_board_id = board_id_for(card)
+            card = serializer.save()
+            _record_card_update(card, source_board_id)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -146,24 +478,62 @@ class CardAPI(APIView):
         card_id = id or request.data.get('id') or request.query_params.get('id')
         if not card_id:
             return Response({'detail': 'Card id required.'}, status=status.HTTP_400_BAD_REQUEST)
-        card = get_object_or_404(Card, pk=card_id)
-        card.delete()
+        card = self.get_board_object(Card, pk=card_id)
+        archive.delete('card', card, card.access_board_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class CardMoveAPI(BoardAccessMixin, APIView):
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({'detail': 'Expected an object with "moves".'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = CardMoveSerializer(data=request.data.get('moves'), many=True, allow_empty=False, max_length=500)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        moves = serializer.validated_data
+        boards = board_ids(request)
+        cards = (
+            Card.objects.filter(pk__in=[m['id'] for m in moves], list__board_id__in=boards)
+            .annotate(source_board_id=F('list__board_id')).in_bulk()
+        )
+        target_ids = {m['list'] for m in moves}
+        targets = set(List.objects.filter(pk__in=target_ids, board_id__in=boards).values_list('pk', flat=True))
+        if len(cards) != len({m['id'] for m in moves}) or targets != target_ids:
+            return Response({'detail': 'Card or list not found.'}, status=status.HTTP_404_NOT_FOUND)
+        for move in moves:
+            move['parent'] = move['list']
+        try:
+            changed = apply_moves(Card, List, 'list_id', moves, cards, target_ids)
+        except MoveError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        data = [{'id': c.id, 'list': c.list_id, 'order': c.order} for c in changed]
+        boards = dict(List.objects.filter(pk__in={row['list'] for row in data}).values_list('pk', 'board_id'))
+        # A board can't apply a partial update to a card it never had
+        left = {
+            row['id']: cards[row['id']].source_board_id for row in data
+            if row['id'] in cards and cards[row['id']].source_board_id != boards[row['list']]
+        }
+        for board_id in set(boards.values()):
+            rows = [row for row in data if boards[row['list']] == board_id and row['id'] not in left]
+            record_changes(board_id, 'card', 'updated', rows, event_type='cards.moved')
+        if left:
+            _record_board_change(left)
+        return Response(data)
+
 # ------------------- LABEL -------------------
-class LabelAPI(APIView):
-    permission_classes = [IsAuthenticated]
+class LabelAPI(BoardAccessMixin, APIView):
 
     def get(self, request):
-        board_id = request.query_params.get('board')
-        labels = Label.objects.filter(board_id=board_id) if board_id else Label.objects.all()
-        serializer = LabelSerializer(labels, many=True)
-        return Response(serializer.data)
+        labels = filter_labels(Label.objects.all(), request.query_params, board_ids(request))
+        return paginate(request, labels, LabelSerializer, ('id',))
 
     def post(self, request):
         serializer = LabelSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            if serializer.validated_data.get('board') is not None:
+                check_board(request, serializer.validated_data['board'].pk)
+            label = serializer.save()
+            record_change(label.board_id, 'label', 'created', label)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -171,19 +541,23 @@ class LabelAPI(APIView):
         label_id = request.data.get('id') or request.query_params.get('id')
         if not label_id:
             return Response({'detail': 'Label id required.'}, status=status.HTTP_400_BAD_REQUEST)
-        label = get_object_or_404(Label, pk=label_id)
+        label = self.get_board_object(Label, pk=label_id)
+        board_id, deleted_id = label.board_id, label.pk
+        card_ids = list(label.cards.values_list('pk', flat=True))
         label.delete()
+        # Cascaded through-rows send no m2m signal; drop the name from those cards' search text
+        reindex_cards(card_ids)
+        record_change(board_id, 'label', 'deleted', data={'id': deleted_id})
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 # ------------------- CHECKLIST -------------------
-class ChecklistAPI(APIView):
-    permission_classes = [IsAuthenticated]
+class ChecklistAPI(BoardAccessMixin, APIView):
 
     def get(self, request):
-        card_id = request.query_params.get('card')
-        checklists = Checklist.objects.filter(card_id=card_id) if card_id else Checklist.objects.all()
-        serializer = ChecklistSerializer(checklists, many=True)
-        return Response(serializer.data)
+        checklists = filter_checklists(
+            Checklist.objects.prefetch_related('items'), request.query_params, board_ids(request)
+        )
+        return paginate(request, checklists, ChecklistSerializer, ('created_at', 'id'))
 
     def post(self, request):
         data = request.data.copy()
@@ -191,7 +565,9 @@ class ChecklistAPI(APIView):
         data['card'] =  data['card']
         serializer = ChecklistSerializer(data=data)
         if serializer.is_valid():
-            serializer.save()
+            self.check_parent(Card, serializer.validated_data['card'].pk)
+            checklist = serializer.save()
+            record_change(board_id_for(checklist), 'checklist', 'created', checklist)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -199,43 +575,50 @@ class ChecklistAPI(APIView):
         checklist_id = request.data.get('id') or request.query_params.get('id')
         if not checklist_id:
             return Response({'detail': 'Checklist id required.'}, status=status.HTTP_400_BAD_REQUEST)
-        checklist = get_object_or_404(Checklist, pk=checklist_id)
+        checklist = self.get_board_object(Checklist, pk=checklist_id)
+        board_id, deleted_id = checklist.access_board_id, checklist.pk
         checklist.delete()
+        record_change(board_id, 'checklist', 'deleted', data={'id': deleted_id})
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 # ------------------- CHECKLIST ITEM -------------------
-class ChecklistItemAPI(APIView):
-    permission_classes = [IsAuthenticated]
+class ChecklistItemAPI(BoardAccessMixin, APIView):
 
     def get(self, request):
-        checklist_id = request.query_params.get('checklist')
-        items = ChecklistItem.objects.filter(checklist_id=checklist_id) if checklist_id else ChecklistItem.objects.all()
-        serializer = ChecklistItemSerializer(items, many=True)
-        return Response(serializer.data)
+        items = filter_checklist_items(ChecklistItem.objects.all(), request.query_params, board_ids(request))
+        return paginate(request, items, ChecklistItemSerializer, ('created_at', 'id'))
 
     def post(self, request):
         # checklist_id must be passed!
         serializer = ChecklistItemSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            self.check_parent(Checklist, serializer.validated_data['checklist'].pk)
+            item = serializer.save()
+            record_change(board_id_for(item), 'checklist_item', 'created', item)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def put(self, request, id=None):
         item_id = id or request.data.get("id")
-        item = get_object_or_404(ChecklistItem, id=item_id)
+        item = self.get_board_object(ChecklistItem, id=item_id)
         serializer = ChecklistItemSerializer(item, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            if 'checklist' in serializer.validated_data:
+                self.check_parent(Checklist, serializer.validated_data['checklist'].pk)
+            item = serializer.save()
+            record_change(board_id_for(item), 'checklist_item', 'updated', item)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def patch(self, request, id=None):
         item_id = id or request.data.get("id")
-        item = get_object_or_404(ChecklistItem, id=item_id)
+        item = self.get_board_object(ChecklistItem, id=item_id)
         serializer = ChecklistItemSerializer(item, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            if 'checklist' in serializer.validated_data:
+                self.check_parent(Checklist, serializer.validated_data['checklist'].pk)
+            item = serializer.save()
+            record_change(board_id_for(item), 'checklist_item', 'updated', item)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -243,25 +626,26 @@ class ChecklistItemAPI(APIView):
         item_id = id or request.data.get('id') or request.query_params.get('id')
         if not item_id:
             return Response({'detail': 'ChecklistItem id required.'}, status=status.HTTP_400_BAD_REQUEST)
-        item = get_object_or_404(ChecklistItem, pk=item_id)
+        item = self.get_board_object(ChecklistItem, pk=item_id)
+        board_id, deleted_id = item.access_board_id, item.pk
         item.delete()
+        record_change(board_id, 'checklist_item', 'deleted', data={'id': deleted_id})
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 # ------------------- COMMENT -------------------
-class CommentAPI(APIView):
-    permission_classes = [IsAuthenticated]
+class CommentAPI(BoardAccessMixin, APIView):
 
     def get(self, request):
-        card_id = request.query_params.get('card')
-        comments = Comment.objects.filter(card_id=card_id) if card_id else Comment.objects.all()
-        serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        comments = filter_comments(Comment.objects.select_related('author'), request.query_params, board_ids(request))
+        return paginate(request, comments, CommentSerializer, ('created_at', 'id'))
 
     def post(self, request):
         serializer = CommentSerializer(data=request.data)
         if serializer.is_valid():
+            self.check_parent(Card, serializer.validated_data['card'].pk)
             # Save with user as author, and return author full name
             comment = serializer.save(author=request.user)
+            record_change(board_id_for(comment), 'comment', 'created', comment)
             data = serializer.data
             data["author_name"] = f"{request.user.first_name} {request.user.last_name}".strip()
             return Response(data, status=status.HTTP_201_CREATED)
@@ -271,73 +655,321 @@ class CommentAPI(APIView):
         comment_id = request.data.get('id') or request.query_params.get('id')
         if not comment_id:
             return Response({'detail': 'Comment id required.'}, status=status.HTTP_400_BAD_REQUEST)
-        comment = get_object_or_404(Comment, pk=comment_id)
+        comment = self.get_board_object(Comment, pk=comment_id)
+        board_id, deleted_id = comment.access_board_id, comment.pk
         comment.delete()
+        record_change(board_id, 'comment', 'deleted', data={'id': deleted_id})
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 # ------------------- ATTACHMENT -------------------
-class AttachmentAPI(APIView):
-    permission_classes = [IsAuthenticated]
+class AttachmentAPI(BoardAccessMixin, APIView):
+    throttle_classes = [UserBucketThrottle]
+    throttle_scope = 'uploads'
+
+    def get_throttles(self):
+        # Listing is cheap; only uploads spend the budget
+        return super().get_throttles() if self.request.method == 'POST' else []
 
     def get(self, request):
         card_id = request.query_params.get('card')
         if not card_id:
             return Response({'detail': 'card id required'}, status=status.HTTP_400_BAD_REQUEST)
+        self.check_parent(Card, card_id)
         attachments = Attachment.objects.filter(card_id=card_id)
-        serializer = AttachmentSerializer(attachments, many=True)
+        serializer = AttachmentSerializer(attachments, many=True, context={'request': request})
         return Response(serializer.data)
 
     def post(self, request):
+        # Reject oversized bodies before the multipart parser spools them to disk
+        too_large = _reject_large_body(request)
+        if too_large:
+            return too_large
         card_id = request.data.get('card')
+        if card_id:
+            self.check_parent(Card, card_id)
+        upload_id = request.data.get('upload')
+        if card_id and upload_id:
+            return self._attach_upload(request, card_id, upload_id)
         file = request.FILES.get('file')
         if not card_id or not file:
-            return Response({'detail': 'card and file required'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'detail': 'card and file (or upload) required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            check_upload_size(request.user, file.size)
+        except UploadError as exc:
+            return Response({'detail': str(exc)}, status=exc.status_code)
         data = {'card': card_id, 'file': file}
-        serializer = AttachmentSerializer(data=data)
+        serializer = AttachmentSerializer(data=data, context={'request': request})
         if serializer.is_valid():
             serializer.save(uploaded_by=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def _attach_upload(self, request, card_id, upload_id):
+        card = get_object_or_404(Card, pk=card_id)
+        with transaction.atomic():
+            upload = get_object_or_404(Upload.objects.select_for_update(), pk=upload_id, user=request.user)
+            try:
+                name, metadata = finish_upload(upload)
+            except UploadError as exc:
+                return Response({'detail': str(exc)}, status=exc.status_code)
+            attachment = Attachment.objects.create(card=card, uploaded_by=request.user, file=name, **metadata)
+        return Response(AttachmentSerializer(attachment, context={'request': request}).data, status=status.HTTP_201_CREATED)
+
     def delete(self, request):
         attachment_id = request.data.get('id') or request.query_params.get('id')
         if not attachment_id:
             return Response({'detail': 'Attachment id required.'}, status=status.HTTP_400_BAD_REQUEST)
-        attachment = get_object_or_404(Attachment, pk=attachment_id)
-        if attachment.uploaded_by != request.user:
+        attachment = self.get_board_object(Attachment, pk=attachment_id)
+        if attachment.uploaded_by_id != request.user.pk:
             return Response({'detail': 'Not allowed.'}, status=status.HTTP_403_FORBIDDEN)
-        attachment.file.delete(save=False)
+        name = attachment.file.name
+        board_id = attachment.access_board_id
         attachment.delete()
+        bump_board(board_id)
+        if name:
+            enqueue(delete_stored_files, [name])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 class BoardImageUploadAPI(APIView):
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = [IsAuthenticated]
+    throttle_classes = [UserBucketThrottle]
+    throttle_scope = 'uploads'
 
     def post(self, request, *args, **kwargs):
+        too_large = _reject_large_body(request)
+        if too_large:
+            return too_large
+        upload_id = request.data.get('upload')
+        if upload_id:
+            with transaction.atomic():
+                upload = get_object_or_404(Upload.objects.select_for_update(), pk=upload_id, user=request.user)
+                try:
+                    path, _ = finish_upload(upload, prefix='backgrounds')
+                except UploadError as exc:
+                    return Response({'detail': str(exc)}, status=exc.status_code)
+            enqueue(generate_derivatives, path, 'background', idempotency_key=f'derivatives:{path}')
+            return Response({'url': settings.MEDIA_URL + path}, status=status.HTTP_201_CREATED)
         file_obj = request.FILES.get('file')
         if not file_obj:
             return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
-        from django.core.files.storage import default_storage
-        from django.conf import settings
-        path = default_storage.save(f'backgrounds/{file_obj.name}', file_obj)
+        try:
+            check_upload_size(request.user, file_obj.size)
+        except UploadError as exc:
+            return Response({'detail': str(exc)}, status=exc.status_code)
+        # Identical images (shared backgrounds) are stored once
+        path, _ = store_uploaded_file(file_obj, prefix='backgrounds')
+        enqueue(generate_derivatives, path, 'background', idempotency_key=f'derivatives:{path}')
         url = settings.MEDIA_URL + path
         return Response({'url': url}, status=status.HTTP_201_CREATED)
 
+# ------------------- DOWNLOADS -------------------
+def _download_user(request, attachment_id):
+    # Links can't send headers, so they carry a download token for this one attachment
+    token = request.GET.get('token')
+    if token is None:
+        return _authenticate_token(request, allow_query=False)
+    user_id = download_token_user(token, attachment_id)
+    return User.objects.filter(pk=user_id, is_active=True).first() if user_id is not None else None
+
+def attachment_download(request, id):
+    """
+    Serve an attachment to members of its board; supports Range and
+    conditional requests. Authenticates with the Authorization header or
+    the ``download_token`` from the attachment listing as ?token=.
+    """
+    user = _download_user(request, id)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    request.user = user
+    attachment = load_with_board(Attachment, pk=id)
+    if not has_role(request, attachment.access_board_id):
+        raise Http404
+    return serve_stored_file(
+        request, attachment.file.name,
+        size=attachment.size,
+        etag=attachment.checksum or None,
+        last_modified=int(attachment.uploaded_at.timestamp()),
+        content_type=attachment.content_type or None,
+        filename=attachment.original_name or None,
+        as_attachment=request.GET.get('download') == '1',
+    )
+
+PUBLIC_MEDIA_PREFIXES = ('avatars/', 'backgrounds/')
+
+def public_media(request, path):
+    """
+    Avatars, board backgrounds and their derivatives. Serves all public
+    media when DEBUG static serving is off, and derivatives in both modes.
+    """
+    if '..' in path.split('/'):
+        raise Http404
+    source = source_of(path)
+    if source is not None:
+        if not source.startswith(PUBLIC_MEDIA_PREFIXES):
+            raise Http404
+        if not default_storage.exists(path):
+            # Not generated yet: fall back to the original without caching the redirect
+            response = HttpResponseRedirect(settings.MEDIA_URL + source)
+            response['Cache-Control'] = 'no-cache'
+            return response
+        return serve_stored_file(request, path, cache_control='public, max-age=86400')
+    if not path.startswith(PUBLIC_MEDIA_PREFIXES):
+        raise Http404
+    # Backgrounds are content-addressed, so their URLs never change meaning
+    cache_control = 'public, max-age=31536000, immutable' if path.startswith('backgrounds/') else 'public, max-age=3600'
+    return serve_stored_file(request, path, cache_control=cache_control)
+
+# ------------------- UPLOADS -------------------
+def _reject_large_body(request):
+    # Multipart framing adds a little on top of the file itself
+    length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if length > settings.KANBAN_MAX_UPLOAD_SIZE + 64 * 1024:
+        return Response(
+            {'detail': f'Files are limited to {settings.KANBAN_MAX_UPLOAD_SIZE} bytes.'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+    return None
+
+class UploadAPI(APIView):
+    """
+    Resumable uploads. POST {filename, size, content_type} opens a session;
+    PATCH uploads/<id>/ with the raw chunk as the body and an Upload-Offset
+    header appends it; GET reports the offset to resume from. A complete
+    upload is attached with POST attachments/ {card, upload} or used as a
+    background with POST boards/upload-background/ {upload}.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [UserBucketThrottle]
+    # Its own budget: one file is many chunk requests
+    throttle_scope = 'upload_chunks'
+
+    def get(self, request, id):
+        upload = get_object_or_404(Upload, pk=id, user=request.user)
+        return Response(UploadSerializer(upload).data)
+
+    def post(self, request):
+        serializer = UploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            check_upload_size(request.user, serializer.validated_data['size'])
+        except UploadError as exc:
+            return Response({'detail': str(exc)}, status=exc.status_code)
+        serializer.save(user=request.user)
+        data = dict(serializer.data, chunk_size=settings.KANBAN_MAX_UPLOAD_CHUNK)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def patch(self, request, id):
+        offset = request.headers.get('Upload-Offset', request.query_params.get('offset'))
+        if offset is None or not offset.isdigit():
+            return Response({'detail': 'Upload-Offset header required.'}, status=status.HTTP_400_BAD_REQUEST)
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        with transaction.atomic():
+            upload = get_object_or_404(Upload.objects.select_for_update(), pk=id, user=request.user)
+            try:
+                # The body is read straight from the request stream, never parsed
+                append_chunk(upload, int(offset), request.stream, length)
+            except UploadError as exc:
+                return Response({'detail': str(exc), 'offset': upload.offset}, status=exc.status_code)
+        return Response(UploadSerializer(upload).data)
+
+    def delete(self, request, id):
+        upload = get_object_or_404(Upload, pk=id, user=request.user)
+        upload.delete()
+        discard_partial(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+# ------------------- EVENTS -------------------
+def _authenticate_token(request, allow_query=True):
+    # EventSource cannot set headers, so the access token may come as ?token=
+    auth = ClaimsJWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else (request.GET.get('token') if allow_query else None)
+    if not raw_token:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+async def _event_stream(board_id):
+    subscription = get_broker().subscribe(board_channel(board_id))
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event = await subscription.get(timeout=EVENT_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            yield format_sse(event)
+    finally:
+        subscription.close()
+
+async def board_events(request, id):
+    """
+    Server-Sent Events stream of change events for one board. Needs the
+    ASGI application (core.asgi) so the open connection doesn't hold a
+    worker thread.
+    """
+    user = await sync_to_async(_authenticate_token)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    request.user = user
+    if not await sync_to_async(has_role)(request, id):
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    response = StreamingHttpResponse(_event_stream(id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # Notification API views
 class NotificationListView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    pagination_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user)
+        return filter_notifications(Notification.objects.filter(user=self.request.user), self.request.query_params)
+
+def _notification_ids(request):
+    ids = request.data.get('ids')
+    if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+        return None
+    return ids
+
+
+class NotificationCountView(APIView):
+    """Unread badge count, read from the user's counter row."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({'unread': inbox.unread_count(request.user)})
+
 
 class NotificationMarkReadView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def patch(self, request, *args, **kwargs):
-        Notification.objects.filter(user=request.user, read=False).update(read=True)
-        return Response({'status': 'all marked as read'}, status=status.HTTP_200_OK)
+        # {"ids": [...]} marks those; no ids marks everything
+        ids = None
+        if 'ids' in request.data:
+            ids = _notification_ids(request)
+            if ids is None:
+                return Response({'detail': 'ids must be a list of integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        unread = inbox.mark_read(request.user, ids)
+        return Response({'status': 'marked as read', 'unread': unread}, status=status.HTTP_200_OK)
+
+
+class NotificationBatchDeleteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        ids = _notification_ids(request)
+        if ids is None:
+            return Response({'detail': 'ids must be a list of integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'unread': inbox.delete(request.user, ids)})
 
 # Notification delete API view
 from rest_framework import generics, permissions
@@ -350,3 +982,7 @@ class NotificationDeleteView(generics.DestroyAPIView):
     def get_queryset(self):
         # Only allow users to delete their own notifications
         return Notification.objects.filter(user=self.request.user)
+
+    def destroy(self, request, *args, **kwargs):
+        notification = self.get_object()
+        return Response({'unread': inbox.delete(request.user, [notification.pk])})
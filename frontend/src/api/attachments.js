@@ -5,14 +5,61 @@ export function getAttachments(cardId) {
   return API.get(`attachments/?card=${cardId}`);
 }
 
+// Files above this size go through the resumable upload API
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+
+// Send a file in chunks, resuming from the server's offset after a failure.
+// Resolves with the upload id, ready to attach.
+export async function uploadInChunks(file) {
+  const { data: upload } = await API.post("uploads/", {
+    filename: file.name,
+    size: file.size,
+    content_type: file.type,
+  });
+  let offset = 0;
+  let retries = 0;
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + upload.chunk_size);
+    try {
+      const { data } = await API.patch(`uploads/${upload.id}/`, chunk, {
+        headers: {
+          "Content-Type": "application/offset+octet-stream",
+          "Upload-Offset": String(offset),
+        },
+      });
+      offset = data.offset;
+      retries = 0;
+    } catch (error) {
+      if (retries++ >= 3) throw error;
+      const { data } = await API.get(`uploads/${upload.id}/`);
+      offset = data.offset;
+    }
+  }
+  return upload.id;
+}
+
 // Upload an attachment to a card
-export function uploadAttachment(cardId, file) {
+export async function uploadAttachment(cardId, file) {
+  if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+    const uploadId = await uploadInChunks(file);
+    return API.post("attachments/", { card: cardId, upload: uploadId });
+  }
   const formData = new FormData();
   formData.append("card", cardId);
   formData.append("file", file);
   return uploadFile("attachments/", formData);
 }
 
+// URL for viewing (or, with download=true, saving) an attachment. Links and
+// <img> tags can't send the Authorization header, so the query carries the
+// short-lived download_token that getAttachments returns for each attachment.
+export function attachmentUrl(attachment, download = false) {
+  const base = import.meta.env.VITE_API_BASE_URL;
+  const params = new URLSearchParams({ token: attachment.download_token || "" });
+  if (download) params.set("download", "1");
+  return `${base}attachments/${attachment.id}/download/?${params}`;
+}
+
 // Delete an attachment by id
 export function deleteAttachment(attachmentId) {
   return API.delete("attachments/", { data: { id: attachmentId } });
@@ -8,13 +8,24 @@ export const signup = (data) => API.post("accounts/signup/", data);
 
 // Profile
 export const getProfile = () => API.get("accounts/profile/");
+
+// Profile edits return a fresh access token carrying the updated name/avatar
+function storeAccessToken(res) {
+  const token = res.data?.access_token;
+  if (token) {
+    const storage = localStorage.getItem("access_token") ? localStorage : sessionStorage;
+    storage.setItem("access_token", token);
+  }
+  return res;
+}
+
 export const updateProfile = (data) => {
   if (data instanceof FormData) {
     return API.patch("accounts/profile/", data, {
       headers: { "Content-Type": "multipart/form-data" },
-    });
+    }).then(storeAccessToken);
   }
-  return API.patch("accounts/profile/", data);
+  return API.patch("accounts/profile/", data).then(storeAccessToken);
 };
 
 // Logout
@@ -1,10 +1,23 @@
 import API from "./index";
 
-// Get all boards
+// Get all boards (with lists/cards)
 export function getBoards() {
+  return API.get("boards/", { params: { view: "full" } });
+}
+
+// Get lightweight board tiles (counts and members only)
+export function getBoardSummaries() {
   return API.get("boards/");
 }
 
+// Search cards, comments and checklist items (optionally within one board).
+// Hits: { type, id, board, card: { id, title, list }, highlight }
+export function searchBoards(query, boardId) {
+  const params = { q: query };
+  if (boardId) params.board = boardId;
+  return API.get("search/", { params });
+}
+
 // Create a new board
 export function createBoard(data) {
   return API.post("boards/", data);
@@ -32,4 +45,48 @@ export function updateBoardMemberRole(boardId, memberId, role) {
     member_id: memberId,
     role,
   });
-}
\ No newline at end of file
+}
+// Deep-copy a board (e.g. from a template). options: { title, attachments, template }.
+// Responds 201 with the new board, or 202 with a copy job for large boards.
+export function copyBoard(boardId, options = {}) {
+  return API.post(`boards/${boardId}/copy/`, options);
+}
+
+// Poll a background copy: { status, result_id, progress: { copied, total } }
+export function getCopyJob(jobId) {
+  return API.get(`copies/${jobId}/`);
+}
+
+// Archive a board (hidden until restored) / restore it; admins only
+export function archiveBoard(boardId) {
+  return API.post(`boards/${boardId}/archive/`);
+}
+
+export function restoreBoard(boardId) {
+  return API.post(`boards/${boardId}/restore/`);
+}
+
+// Archived boards of the current user
+export function getArchivedBoards() {
+  return API.get("boards/", { params: { archived: "true" } });
+}
+
+// Archived lists and cards on a board: { lists, cards }
+export function getBoardArchive(boardId) {
+  return API.get(`boards/${boardId}/archive/`);
+}
+
+// Download one board (or all of the user's boards when boardId is omitted)
+// as NDJSON, or as a zip with the attachment files when withFiles is set
+export function exportBoards(boardId, withFiles = false) {
+  const url = boardId ? `boards/${boardId}/export/` : "boards/export/";
+  const params = withFiles ? { archive: "true" } : {};
+  return API.get(url, { params, responseType: "blob" });
+}
+
+// Import an export file; responds 201 with the new board tiles
+export function importBoards(file) {
+  const form = new FormData();
+  form.append("file", file);
+  return API.post("boards/import/", form);
+}
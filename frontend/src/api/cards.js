@@ -1,8 +1,8 @@
-import API from "./index";
+import API, { getAllPages } from "./index";
 
-// Get cards for a list
+// Get all cards for a list (every page)
 export function getCards(listId) {
-  return API.get(`cards/?list=${listId}`);
+  return getAllPages(`cards/?list=${listId}`);
 }
 
 // Create a new card
@@ -19,3 +19,29 @@ export function updateCard(cardId, data) {
 export function deleteCard(cardId) {
   return API.delete(`cards/${cardId}/`);
 }
+
+// Move/reorder cards in one request: [{ id, list, after } or { id, list, position }]
+export function moveCards(moves) {
+  return API.post("cards/move/", { moves });
+}
+
+// Apply many card/checklist/checklist item writes in one transaction, e.g.
+// [{ op: "create", type: "card", ref: "c", data: { list, title } },
+//  { op: "create", type: "checklist", data: { card: "$c", title } }]
+export function runBatch(operations) {
+  return API.post("batch/", { operations });
+}
+
+// Copy a card, or create one from a template card (options: { title, list, attachments, template })
+export function copyCard(cardId, options = {}) {
+  return API.post(`cards/${cardId}/copy/`, options);
+}
+
+// Archive a card / restore it (fails with 409 while its list is archived)
+export function archiveCard(cardId) {
+  return API.post(`cards/${cardId}/archive/`);
+}
+
+export function restoreCard(cardId) {
+  return API.post(`cards/${cardId}/restore/`);
+}
@@ -0,0 +1,27 @@
+import API from "./index";
+
+// Subscribe to a board's change events (Server-Sent Events).
+// onEvent receives { type, board, version, data }; returns an unsubscribe function.
+export function subscribeToBoard(boardId, onEvent) {
+  const token = localStorage.getItem("access_token") || sessionStorage.getItem("access_token");
+  const base = import.meta.env.VITE_API_BASE_URL;
+  const source = new EventSource(`${base}boards/${boardId}/events/?token=${encodeURIComponent(token || "")}`);
+  const handler = (message) => onEvent(JSON.parse(message.data));
+  source.onmessage = handler;
+  [
+    "board.updated", "board.deleted",
+    "list.created", "list.updated", "list.deleted", "lists.moved",
+    "card.created", "card.updated", "card.deleted", "cards.moved",
+    "comment.created", "comment.deleted",
+    "checklist.created", "checklist.deleted",
+    "label.created", "label.deleted",
+    "checklist_item.created", "checklist_item.updated", "checklist_item.deleted",
+    "resync",
+  ].forEach((type) => source.addEventListener(type, handler));
+  return () => source.close();
+}
+
+// Changes since a known board version: { version, changes } or { version, snapshot }
+export function getBoardChanges(boardId, since) {
+  return API.get(`boards/${boardId}/changes/`, { params: { since } });
+}
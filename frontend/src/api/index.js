@@ -28,3 +28,22 @@ export function uploadFile(url, formData) {
     headers: { 'Content-Type': 'multipart/form-data' },
   });
 }
+
+// GET every page of a paginated collection by following the Link rel="next"
+// header; resolves to the first response with data holding all rows
+export async function getAllPages(url, config = {}) {
+  const first = await API.get(url, config);
+  const rows = [...first.data];
+  let next = nextLink(first.headers.link);
+  while (next) {
+    const page = await API.get(next);
+    rows.push(...page.data);
+    next = nextLink(page.headers.link);
+  }
+  return { ...first, data: rows };
+}
+
+function nextLink(header) {
+  const match = header && header.match(/<([^>]+)>;\s*rel="next"/);
+  return match ? match[1] : null;
+}
@@ -1,7 +1,7 @@
-import API from "./index";
+import API, { getAllPages } from "./index";
 
-// Get all lists for a board
-export const getLists = (boardId) => API.get(`lists/?board=${boardId}`);
+// Get all lists for a board (every page)
+export const getLists = (boardId) => getAllPages(`lists/?board=${boardId}`);
 
 // Create a list
 export const createList = (data) => API.post("lists/", data);
@@ -11,3 +11,13 @@ export const updateList = (id, data) => API.patch(`lists/${id}/`, data);
 
 // Delete a list
 export const deleteList = (id) => API.delete(`lists/${id}/`);
+
+// Move/reorder lists in one request: [{ id, after } or { id, position }]
+export const moveLists = (moves) => API.post("lists/move/", { moves });
+
+// Copy a list with its cards (options: { title, board, attachments })
+export const copyList = (id, options = {}) => API.post(`lists/${id}/copy/`, options);
+
+// Archive a list with its cards / restore them
+export const archiveList = (id) => API.post(`lists/${id}/archive/`);
+export const restoreList = (id) => API.post(`lists/${id}/restore/`);
@@ -1,5 +1,9 @@
 import API from "./index";
 
 export const fetchNotifications = () => API.get("/notifications/");
-export const markNotificationsAsRead = () => API.patch("/notifications/mark-read/");
-export const deleteNotification = (id) => API.delete(`/notifications/${id}/delete/`); 
\ No newline at end of file
+// Badge count: { unread }
+export const fetchUnreadCount = () => API.get("/notifications/unread-count/");
+// Without ids every notification is marked read
+export const markNotificationsAsRead = (ids) => API.patch("/notifications/mark-read/", ids ? { ids } : {});
+export const deleteNotification = (id) => API.delete(`/notifications/${id}/delete/`);
+export const deleteNotifications = (ids) => API.post("/notifications/delete/", { ids });
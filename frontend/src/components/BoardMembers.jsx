@@ -264,7 +264,7 @@ const BoardMembers = ({ boardId, onClose }) => {
                       className="flex items-center py-2 border-b last:border-b-0 border-gray-100 dark:border-slate-700"
                     >
                       <img
-                        src={getAvatarUrl(user.avatar) || "/placeholder.svg"}
+                        src={getAvatarUrl(user.avatar_thumbnail || user.avatar) || "/placeholder.svg"}
                         alt={user.first_name || "No Name"}
                         className="w-8 h-8 rounded-full object-cover mr-3 ring-2 ring-gray-200 dark:ring-slate-600"
                       />
@@ -308,7 +308,7 @@ const BoardMembers = ({ boardId, onClose }) => {
                   <div className="flex items-center justify-between p-3 bg-gray-50 dark:bg-slate-700/50 rounded-lg hover:bg-gray-100 dark:hover:bg-slate-700 transition-colors">
                     <div className="flex items-center gap-3">
                       <img
-                        src={getAvatarUrl(member.avatar) || "/placeholder.svg"}
+                        src={getAvatarUrl(member.avatar_thumbnail || member.avatar) || "/placeholder.svg"}
                         alt={member.first_name || "No Name"}
                         className="w-10 h-10 rounded-full ring-2 ring-gray-200 dark:ring-slate-600"
                       />
@@ -5,6 +5,15 @@ import useBoardStore from "../store/boardStore"
 import BoardCreationModal from "./BoardCreationModal"
 import { Plus, Calendar, Users, Star, MoreHorizontal, Trash2, Edit3, Search, Grid, List } from "lucide-react"
 
+const MEDIA_URL = import.meta.env.VITE_MEDIA_URL || ""
+
+// Board tiles use the server-generated thumbnail of uploaded backgrounds
+function backgroundThumbnailUrl(board) {
+  const thumbnail = board.background_thumbnail
+  if (!thumbnail) return board.background_theme.backgroundImage
+  return thumbnail.startsWith("http") ? thumbnail : MEDIA_URL.replace(/\/$/, "") + thumbnail
+}
+
 const BoardsPage = () => {
   const {
     getUserBoards,
@@ -65,7 +74,7 @@ const BoardsPage = () => {
   }
 
   const getCardCount = (board) => {
-    return board.lists?.reduce((total, list) => total + (list.cards?.length || 0), 0) || 0
+    return board.card_count ?? 0
   }
 
   // Filter and search boards
@@ -261,7 +270,7 @@ const BoardsPage = () => {
                       style={(() => {
                         if (board.background_theme && board.background_theme.backgroundImage) {
                           return {
-                            backgroundImage: `url(${board.background_theme.backgroundImage})`,
+                            backgroundImage: `url(${backgroundThumbnailUrl(board)})`,
                             backgroundSize: board.background_theme.backgroundSize || 'cover',
                             backgroundPosition: board.background_theme.backgroundPosition || 'center',
                             backgroundRepeat: board.background_theme.backgroundRepeat || 'no-repeat',
@@ -325,7 +334,7 @@ const BoardsPage = () => {
                         }`}
                         style={board.background_image ? { color: '#f3f4f6', position: 'relative', zIndex: 2 } : {}}
                       >
-                        <span>{board.lists?.length || 0} lists</span>
+                        <span>{board.list_count ?? 0} lists</span>
                         <span>{getCardCount(board)} cards</span>
                         <span>{board.members?.length || 0} members</span>
                       </div>
@@ -33,7 +33,7 @@ import useBoardStore from "../store/boardStore"
 import useCardStore from "../store/cardStore"
 import useChecklistStore from "../store/checklistStore"
 import { useApp } from "../context/AppContext"
-import { getAttachments, uploadAttachment, deleteAttachment } from "../api/attachments"
+import { getAttachments, uploadAttachment, deleteAttachment, attachmentUrl } from "../api/attachments"
 
 const MEDIA_URL = import.meta.env.VITE_MEDIA_URL || ""
 
@@ -115,7 +115,7 @@ const CardModal = ({ isOpen, onClose, card, listId }) => {
       id: member.id,
       name: `${member.first_name} ${member.last_name}`.trim(),
       username: member.username || member.email?.split("@")[0] || `user${member.id}`,
-      avatar: getAvatarUrl(member.avatar),
+      avatar: getAvatarUrl(member.avatar_thumbnail || member.avatar),
     })) || []
 
   useEffect(() => {
@@ -630,7 +630,7 @@ const CardModal = ({ isOpen, onClose, card, listId }) => {
                             }`}
                           >
                             <img
-                              src={getAvatarUrl(member.avatar) || "/placeholder.svg"}
+                              src={getAvatarUrl(member.avatar_thumbnail || member.avatar) || "/placeholder.svg"}
                               alt={member.first_name}
                               className="w-8 h-8 rounded-full ring-2 ring-white dark:ring-slate-700"
                             />
@@ -691,14 +691,14 @@ const CardModal = ({ isOpen, onClose, card, listId }) => {
                               {isImageFile(att.file) ? (
                                 <div className="relative h-32 bg-gray-100 dark:bg-slate-600">
                                   <img
-                                    src={att.file.startsWith("http") ? att.file : MEDIA_URL + att.file}
-                                    alt={att.file.split("/").pop()}
+                                    src={attachmentUrl(att)}
+                                    alt={att.original_name || att.file.split("/").pop()}
                                     className="w-full h-full object-cover"
                                   />
                                   <div className="absolute inset-0 bg-black/30 opacity-0 group-hover:opacity-100 transition-opacity duration-200 flex items-center justify-center">
                                     <div className="flex gap-2">
                                       <a
-                                        href={att.file.startsWith("http") ? att.file : MEDIA_URL + att.file}
+                                        href={attachmentUrl(att)}
                                         target="_blank"
                                         rel="noopener noreferrer"
                                         className="p-2 bg-white/90 rounded-lg hover:bg-white transition-colors"
@@ -706,7 +706,7 @@ const CardModal = ({ isOpen, onClose, card, listId }) => {
                                         <Eye className="w-4 h-4 text-gray-700" />
                                       </a>
                                       <a
-                                        href={att.file.startsWith("http") ? att.file : MEDIA_URL + att.file}
+                                        href={attachmentUrl(att, true)}
                                         download
                                         className="p-2 bg-white/90 rounded-lg hover:bg-white transition-colors"
                                       >
@@ -724,11 +724,11 @@ const CardModal = ({ isOpen, onClose, card, listId }) => {
                               <div className="p-4">
                                 <div className="flex items-start justify-between gap-2">
                                   <h4 className="font-semibold text-sm text-gray-900 dark:text-white truncate flex-1">
-                                    {att.file.split("/").pop()}
+                                    {att.original_name || att.file.split("/").pop()}
                                   </h4>
                                   <div className="flex gap-1 opacity-0 group-hover:opacity-100 transition-opacity">
                                     <a
-                                      href={att.file.startsWith("http") ? att.file : MEDIA_URL + att.file}
+                                      href={attachmentUrl(att, true)}
                                       download
                                       className="p-1.5 hover:bg-gray-100 dark:hover:bg-slate-600 rounded-lg transition-colors"
                                       title="Download"
@@ -46,7 +46,7 @@ const Dashboard = () => {
                 <p className="text-sm text-muted-foreground">Active Cards</p>
                 <p className="text-2xl font-bold">
                   {boards.reduce(
-                    (total, board) => total + board.lists.reduce((listTotal, list) => listTotal + list.cards.length, 0),
+                    (total, board) => total + (board.card_count ?? 0),
                     0,
                   )}
                 </p>
@@ -62,13 +62,7 @@ const Dashboard = () => {
               <div>
                 <p className="text-sm text-muted-foreground">Completed</p>
                 <p className="text-2xl font-bold">
-                  {boards.reduce((total, board) => {
-                    const doneList = board.lists.find(
-                      (list) =>
-                        list.title.toLowerCase().includes("done") || list.title.toLowerCase().includes("completed"),
-                    )
-                    return total + (doneList ? doneList.cards.length : 0)
-                  }, 0)}
+                  {boards.reduce((total, board) => total + (board.done_count ?? 0), 0)}
                 </p>
               </div>
               <div className="w-12 h-12 bg-purple-100 dark:bg-purple-900 rounded-lg flex items-center justify-center">
@@ -98,8 +92,8 @@ const Dashboard = () => {
                   <h3 className="font-medium mb-2 group-hover:text-primary transition-colors">{board.title}</h3>
                   <p className="text-sm text-muted-foreground mb-3 line-clamp-2">{board.description}</p>
                   <div className="flex items-center justify-between text-xs text-muted-foreground">
-                    <span>{board.lists.length} lists</span>
-                    <span>{board.lists.reduce((total, list) => total + list.cards.length, 0)} cards</span>
+                    <span>{board.list_count ?? 0} lists</span>
+                    <span>{board.card_count ?? 0} cards</span>
                   </div>
                 </div>
               </Link>
@@ -139,8 +133,8 @@ const Dashboard = () => {
                     <h3 className="font-medium mb-2 group-hover:text-primary transition-colors">{board.title}</h3>
                     <p className="text-sm text-muted-foreground mb-3 line-clamp-2">{board.description}</p>
                     <div className="flex items-center justify-between text-xs text-muted-foreground">
-                      <span>{board.lists.length} lists</span>
-                      <span>{board.lists.reduce((total, list) => total + list.cards.length, 0)} cards</span>
+                      <span>{board.list_count ?? 0} lists</span>
+                      <span>{board.card_count ?? 0} cards</span>
                     </div>
                   </div>
                 </Link>
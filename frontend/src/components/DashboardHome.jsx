@@ -23,25 +23,14 @@ const DashboardHome = () => {
 
   // Calculate comprehensive stats
   const totalCards = boards.reduce(
-    (total, board) => total + board.lists.reduce((listTotal, list) => listTotal + list.cards.length, 0),
+    (total, board) => total + (board.card_count ?? 0),
     0,
   )
 
-  const completedCards = boards.reduce((total, board) => {
-    const doneList = board.lists.find(
-      (list) => list.title.toLowerCase().includes("done") || list.title.toLowerCase().includes("completed"),
-    )
-    return total + (doneList ? doneList.cards.length : 0)
-  }, 0)
+  // Counts come with the board summaries (cards in "done"/"completed" lists, past due dates)
+  const completedCards = boards.reduce((total, board) => total + (board.done_count ?? 0), 0)
 
-  const overdueCards = boards.reduce((total, board) => {
-    return (
-      total +
-      board.lists.reduce((listTotal, list) => {
-        return listTotal + list.cards.filter((card) => card.dueDate && new Date(card.dueDate) < new Date()).length
-      }, 0)
-    )
-  }, 0)
+  const overdueCards = boards.reduce((total, board) => total + (board.overdue_count ?? 0), 0)
 
   const totalMembers = boards.reduce((total, board) => {
     const uniqueMembers = new Set()
@@ -173,11 +162,11 @@ const DashboardHome = () => {
                       <div className="flex items-center gap-4 mt-1">
                         <span className="text-sm text-gray-500 dark:text-slate-400 flex items-center gap-1">
                           <div className="w-3 h-3 bg-gray-400 dark:bg-slate-500 rounded" />
-                          {board.lists.reduce((total, list) => total + list.cards.length, 0)} cards
+                          {board.card_count ?? 0} cards
                         </span>
                         <span className="text-sm text-gray-500 dark:text-slate-400 flex items-center gap-1">
                           <Users className="w-3 h-3" />
-                          {board.lists.length} lists
+                          {board.list_count ?? 0} lists
                         </span>
                       </div>
                     </div>
@@ -292,8 +281,8 @@ const DashboardHome = () => {
                       {board.description || "No description"}
                     </p>
                     <div className="flex items-center justify-between text-xs text-gray-500 dark:text-slate-400">
-                      <span>{board.lists.length} lists</span>
-                      <span>{board.lists.reduce((total, list) => total + list.cards.length, 0)} cards</span>
+                      <span>{board.list_count ?? 0} lists</span>
+                      <span>{board.card_count ?? 0} cards</span>
                     </div>
                   </div>
                 </Link>
@@ -341,8 +330,8 @@ const DashboardHome = () => {
                       {board.description || "No description"}
                     </p>
                     <div className="flex items-center justify-between text-xs text-gray-500 dark:text-slate-400">
-                      <span>{board.lists.length} lists</span>
-                      <span>{board.lists.reduce((total, list) => total + list.cards.length, 0)} cards</span>
+                      <span>{board.list_count ?? 0} lists</span>
+                      <span>{board.card_count ?? 0} cards</span>
                     </div>
                   </div>
                 </Link>
@@ -8,7 +8,7 @@ import BoardMembers from "./BoardMembers"
 import NotificationCenter from "./NotificationCenter"
 import { Sun, Moon, Search, Menu, User, LogOut, Users, Bell, Settings, Loader2 } from "lucide-react"
 import API from "../api"
-import { fetchNotifications, markNotificationsAsRead as markReadAPI, deleteNotification } from "../api/notifications"
+import { fetchNotifications, fetchUnreadCount, markNotificationsAsRead as markReadAPI, deleteNotification } from "../api/notifications"
 
 const MEDIA_URL = import.meta.env.VITE_MEDIA_URL || ""
 
@@ -69,10 +69,14 @@ const Header = () => {
   // Fetch notifications from backend
   useEffect(() => {
     if (isAuthenticated) {
+      fetchUnreadCount()
+        .then(res => setUnreadCount(res.data.unread))
+        .catch(err => {
+          console.error("Failed to fetch unread count:", err)
+        })
       fetchNotifications()
         .then(res => {
           setNotifications(res.data)
-          setUnreadCount(res.data.filter(n => !n.read).length)
         })
         .catch(err => {
           console.error("Failed to fetch notifications:", err)
@@ -152,9 +156,9 @@ const Header = () => {
 
   const handleRemoveNotification = async (id) => {
     try {
-      await deleteNotification(id)
+      const res = await deleteNotification(id)
       setNotifications((prev) => prev.filter((n) => n.id !== id))
-      setUnreadCount((prev) => Math.max(0, prev - 1))
+      setUnreadCount(res.data.unread)
     } catch (error) {
       console.error("Failed to delete notification:", error)
     }
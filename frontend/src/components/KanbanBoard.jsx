@@ -7,6 +7,8 @@ import { Plus, Palette } from "lucide-react"
 import useBoardStore from "../store/boardStore"
 import useListStore from "../store/listStore"
 import useCardStore from "../store/cardStore"
+import { moveCards } from "../api/cards"
+import { moveLists } from "../api/lists"
 import KanbanList from "./KanbanList"
 import KanbanCard from "./KanbanCard"
 import AddListForm from "./AddListForm"
@@ -31,8 +33,8 @@ const KanbanBoard = ({ onCardClick }) => {
   }, [id, boards, setCurrentBoard])
 
   // ✅ THE FIX: Pull all from the Zustand list store
-  const { lists, fetchLists, setLists, updateList } = useListStore()
-  const { cards, setCardsForList, updateCard } = useCardStore()
+  const { lists, fetchLists, setLists } = useListStore()
+  const { cards, setCardsForList } = useCardStore()
 
   const [activeCard, setActiveCard] = useState(null)
   const [activeList, setActiveList] = useState(null)
@@ -81,8 +83,8 @@ const KanbanBoard = ({ onCardClick }) => {
         const updatedCard = { ...activeCard, list: overListId }
         setCardsForList && setCardsForList(overListId, [updatedCard, ...newListCards])
 
-        // Persist to backend
-        await updateCard(activeCard.id, { list: overListId })
+        // Persist to backend (one row touched server-side)
+        await moveCards([{ id: activeCard.id, list: overListId, position: 0 }])
         return
       }
     }
@@ -97,7 +99,7 @@ const KanbanBoard = ({ onCardClick }) => {
     newLists.splice(newIndex, 0, moved)
     const orderedLists = newLists.map((list, idx) => ({ ...list, order: idx }))
     setLists(orderedLists)
-    await Promise.all(orderedLists.map((list) => updateList(list.id, { order: list.order })))
+    await moveLists([{ id: moved.id, position: newIndex }])
   }
 
   const handleThemeChange = async (theme) => {
@@ -127,7 +127,7 @@ const KanbanCard = ({ card, onClick, isDragging = false }) => {
             {assignedMembers.slice(0, 3).map((member) => (
               <img
                 key={member.id}
-                src={getAvatarUrl(member.avatar) || "/placeholder.svg"}
+                src={getAvatarUrl(member.avatar_thumbnail || member.avatar) || "/placeholder.svg"}
                 alt={`${(member.first_name || "") + " " + (member.last_name || "")}`.trim() || member.email || "User"}
                 className="w-5 h-5 rounded-full ring-2 ring-white dark:ring-slate-700 hover:z-10 transition-transform hover:scale-110"
                 title={`${(member.first_name || "") + " " + (member.last_name || "")}`.trim() || member.email || "User"}
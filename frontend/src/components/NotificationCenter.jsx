@@ -173,8 +173,8 @@ const NotificationCenter = ({ notifications, onClose, onMarkAsRead, onRemove, on
             <div className="divide-y divide-gray-100 dark:divide-slate-700">
               {filteredNotifications.map((notification) => {
                 const handleClick = () => {
-                  if (onNotificationClick && notification.card_id && notification.board_id) {
-                    onNotificationClick(notification.card_id, notification.board_id)
+                  if (onNotificationClick && notification.card && notification.board) {
+                    onNotificationClick(notification.card, notification.board)
                   }
                 }
                 return (
@@ -1,7 +1,7 @@
 "use client"
 
 import { createContext, useContext, useReducer, useEffect, useCallback } from "react"
-import { getBoards, createBoard, updateBoard, deleteBoard } from "../api/boards"
+import { getBoardSummaries, createBoard, updateBoard, deleteBoard } from "../api/boards"
 import { getLists, createList, updateList, deleteList } from "../api/lists"
 import { getCards, createCard, updateCard, deleteCard } from "../api/cards"
 import { getComments, createComment, deleteComment } from "../api/comments"
@@ -356,7 +356,8 @@ export function AppProvider({ children }) {
       dispatch({ type: ACTIONS.SET_ERROR, payload: { key: "boards", value: null } })
 
       try {
-        const response = await getBoards()
+        // Tiles only; lists and cards are fetched for the open board
+        const response = await getBoardSummaries()
         dispatch({ type: ACTIONS.SET_BOARDS, payload: response.data })
         return response.data
       } catch (error) {
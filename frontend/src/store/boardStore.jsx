@@ -1,7 +1,7 @@
 // src/store/boardStore.jsx
 import { create } from "zustand";
 import {
-  getBoards,
+  getBoardSummaries,
   createBoard,
   updateBoard,
   deleteBoard,
@@ -12,9 +12,9 @@ const useBoardStore = create((set, get) => ({
   boards: [],
   currentBoardId: null,
 
-  // Fetch all boards
+  // Fetch board tiles (counts and members); the open board loads its own lists and cards
   fetchBoards: async () => {
-    const res = await getBoards();
+    const res = await getBoardSummaries();
     set({ boards: res.data });
   },
 
@@ -48,7 +48,7 @@ const useBoardStore = create((set, get) => ({
   editBoard: async (boardId, data) => {
     const res = await updateBoard(boardId, data);
     set((state) => ({
-      boards: state.boards.map((b) => (b.id === boardId ? res.data : b)),
+      boards: state.boards.map((b) => (b.id === boardId ? { ...b, ...res.data } : b)),
       currentBoardId: state.currentBoardId === boardId ? boardId : state.currentBoardId,
     }));
     return res.data;